@@ -0,0 +1,276 @@
+"""
+End-to-end and per-component benchmarks on a recorded walk.
+
+    python -m benchmarks.run_benchmarks WALK_DIR [--output report.json]
+        [--baseline old.json --tolerance 0.2] [--speed 1.0]
+        [--depth-backend midas_small]
+
+Runs without Pi hardware: frames, NMEA and timing come from a walk
+recorded with `python main.py --record DIR`. Exits with status 1 when a
+latency percentile regressed past the baseline by more than `tolerance`,
+so CI can gate on it.
+"""
+import argparse
+import json
+import resource
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from distance_estimation.distance_estimator import DEPTH_BACKEND, DistanceEstimator
+from gps_reader import GPSReader
+from navigation.route_planner import Route, RoutePlanner
+from object_detection.yolo_detector import YOLODetector
+from sensors.camera import ReplayCamera
+from sensors.clock import ReplayClock
+from sensors.gps import NMEA_FILE, read_nmea_log
+from tracking.object_tracker import ObjectTracker
+from utils.frame_buffer import FrameRing
+from utils.pipeline import FramePacket, StageStats, StagedPipeline
+from utils.helpers import log
+
+# Metrics compared against a baseline (lower is better)
+GATED_METRICS = ("p50_ms", "p95_ms")
+# Depth Pro is slow on CPU; cap the frames the model sees in the component run
+DEPTH_MAX_FRAMES = 30
+# Route tracking: passes over the recorded GPS track
+ROUTE_PASSES = 20
+
+
+class ResourceMeter:
+    """CPU time and memory of this process over one benchmark."""
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = self._cpu_seconds()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_sec = time.perf_counter() - self._wall
+        self.cpu_sec = self._cpu_seconds() - self._cpu
+
+    @staticmethod
+    def _cpu_seconds() -> float:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+
+    @staticmethod
+    def rss_mb() -> float:
+        try:
+            with open("/proc/self/statm") as f:
+                pages = int(f.read().split()[1])
+            return pages * resource.getpagesize() / 2 ** 20
+        except OSError:
+            return 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "wall_sec": self.wall_sec,
+            "cpu_percent": 100.0 * self.cpu_sec / max(self.wall_sec, 1e-9),
+            "rss_mb": self.rss_mb(),
+            # Linux reports ru_maxrss in KiB
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        }
+
+
+def timed(stats: StageStats, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    stats.record((time.perf_counter() - start) * 1000.0)
+    return result
+
+
+def stats_dict(stats: StageStats) -> Dict[str, float]:
+    d = stats.as_dict()
+    return {k: d[k] for k in ("count", "avg_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")}
+
+
+# --- component benchmarks ---------------------------------------------------
+
+
+def bench_models(walk: Path, depth_backend: str = DEPTH_BACKEND) -> Dict[str, dict]:
+    """YOLODetector, DistanceEstimator and ObjectTracker on every frame, unpaced."""
+    camera = ReplayCamera(walk)
+    frames = FrameRing(camera.height, camera.width)
+    yolo = YOLODetector()
+    # No latency budget and no depth cache: measure the backend itself on
+    # every frame, never its fallback or a cache hit
+    depth = DistanceEstimator(backend=depth_backend, use_depth_cache=False, budget_ms=float("inf"))
+    tracker = ObjectTracker()
+
+    detect_stats, depth_stats, track_stats = StageStats("detect"), StageStats("depth"), StageStats("track")
+    results = {}
+
+    with ResourceMeter() as meter:
+        for i in range(len(camera)):
+            frame = camera.capture(frames)
+            detections = timed(detect_stats, yolo.detect, frame)
+            if i < DEPTH_MAX_FRAMES:
+                obstacle_info = timed(depth_stats, depth.estimate_distance, frame, detections)
+                timed(track_stats, tracker.update, obstacle_info, time.perf_counter())
+            frames.release(frame)
+
+    results["detector"] = {**stats_dict(detect_stats), "fps": detect_stats.count / max(meter.wall_sec, 1e-9)}
+    results["depth"] = stats_dict(depth_stats)
+    results["tracker"] = stats_dict(track_stats)
+    results["models_resources"] = meter.as_dict()
+    return results
+
+
+def bench_route(walk: Path) -> Dict[str, dict]:
+    """RoutePlanner matching along the recorded GPS track."""
+    gps = GPSReader(port=None)
+    fixes = []
+    gps.subscribe(fixes.append)
+    for _, line in read_nmea_log(walk / NMEA_FILE):
+        gps.feed_line(line)
+
+    positions = [(f.lat, f.lon, f.speed_knots, f.course_deg) for f in fixes]
+    if len(positions) < 2:
+        return {}
+
+    # The walked track itself serves as the route
+    lats = [p[0] for p in positions]
+    lons = [p[1] for p in positions]
+    planner = RoutePlanner(use_cache=False)
+    # Matching only; no reroute trees
+    planner.local_router = None
+    planner.set_route(Route(lats, lons, [{"text": "Arrive", "sign": 4, "interval": [len(lats) - 1] * 2}]))
+
+    stats = StageStats("route")
+    with ResourceMeter() as meter:
+        for _ in range(ROUTE_PASSES):
+            planner.set_route(planner.route)
+            for pos in positions:
+                timed(stats, planner.get_next_instruction, pos)
+    return {"route_tracker": stats_dict(stats), "route_resources": meter.as_dict()}
+
+
+# --- end to end -------------------------------------------------------------
+
+
+def bench_pipeline(walk: Path, speed: float, depth_backend: str = DEPTH_BACKEND) -> Dict[str, dict]:
+    """
+    The vision pipeline as main.py runs it, fed by the replayed camera at
+    `speed`: per-stage percentiles, frame-to-alert latency and FPS.
+    """
+    camera = ReplayCamera(walk)
+    camera.clock = ReplayClock(float(camera.times[0]) if len(camera) else 0.0, speed)
+    frames = FrameRing(camera.height, camera.width)
+    yolo = YOLODetector()
+    depth = DistanceEstimator(backend=depth_backend)
+    tracker = ObjectTracker()
+
+    alert_stats = StageStats("frame_to_alert")
+    delivered = []
+    lock = threading.Lock()
+
+    def capture():
+        frame = camera.capture(frames)
+        if frame is None:
+            return None
+        return FramePacket(frame_id=frame.frame_id, frame=frame, captured_at=time.perf_counter())
+
+    def detect(packet):
+        packet.detections = yolo.detect(packet.frame)
+        return packet
+
+    def estimate(packet):
+        packet.obstacle_info = depth.estimate_distance(packet.frame, packet.detections)
+        return packet
+
+    def decide(packet):
+        packet.tracks = tracker.update(packet.obstacle_info, packet.captured_at)
+        return packet
+
+    def sink(packet):
+        with lock:
+            delivered.append(packet.frame_id)
+            if any(track.alert_level() is not None for track in packet.tracks):
+                alert_stats.record((time.perf_counter() - packet.captured_at) * 1000.0)
+
+    pipeline = StagedPipeline(
+        source=capture,
+        stages=[("detect", detect), ("depth", estimate), ("decision", decide)],
+        sink=sink,
+        release=lambda packet: frames.release(packet.frame),
+    )
+
+    with ResourceMeter() as meter:
+        pipeline.start()
+        pipeline.source_finished.wait()
+        # Let the frames in flight drain
+        time.sleep(1.0)
+        pipeline.stop()
+
+    results = {f"pipeline_{name}": stats_dict(s) for name, s in pipeline.stats.items()}
+    results["pipeline_end_to_end"] = stats_dict(pipeline.latency)
+    results["pipeline_frame_to_alert"] = stats_dict(alert_stats)
+    results["pipeline_throughput"] = {
+        "frames_in": len(camera),
+        "frames_out": len(delivered),
+        "fps": len(delivered) / max(meter.wall_sec, 1e-9),
+        "dropped": sum(s.dropped for s in pipeline.stats.values()),
+    }
+    results["pipeline_resources"] = meter.as_dict()
+    return results
+
+
+# --- regression gate --------------------------------------------------------
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, metrics in report.items():
+        old = baseline.get(name)
+        if not isinstance(old, dict):
+            continue
+        for key in GATED_METRICS:
+            if key in metrics and old.get(key):
+                if metrics[key] > old[key] * (1.0 + tolerance):
+                    regressions.append(f"{name}.{key}: {old[key]:.1f} -> {metrics[key]:.1f} ms")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("walk", type=Path, help="directory recorded with main.py --record")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--speed", type=float, default=1.0, help="camera replay speed for the pipeline run")
+    parser.add_argument("--skip", nargs="*", default=(), choices=("models", "route", "pipeline"))
+    parser.add_argument("--depth-backend", default=DEPTH_BACKEND, help="depth_pro, midas_small, depth_anything_small or geometry")
+    args = parser.parse_args(argv)
+
+    report = {}
+    if "models" not in args.skip:
+        log("Benchmark: models")
+        report.update(bench_models(args.walk, args.depth_backend))
+    if "route" not in args.skip and (args.walk / NMEA_FILE).exists():
+        log("Benchmark: route tracker")
+        report.update(bench_route(args.walk))
+    if "pipeline" not in args.skip:
+        log("Benchmark: pipeline")
+        report.update(bench_pipeline(args.walk, args.speed, args.depth_backend))
+
+    for name, metrics in report.items():
+        values = ", ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in metrics.items())
+        print(f"{name:28s} {values}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
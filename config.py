@@ -2,6 +2,10 @@
 GRAPHHOPPER_API_URL = "http://localhost:8989/route"
 GRAPHHOPPER_PROFILE = "foot"  # Use "foot" for pedestrian routing
 
+# Routing engine: "graphhopper" (server above) or "offline" (in-process A*
+# over the graph built with `python -m navigation.osm_client <extract>`)
+ROUTING_ENGINE = "graphhopper"
+
 # Default coordinates (Bangalore, India)
 DEFAULT_START_LAT = 12.9716
 DEFAULT_START_LON = 77.5946
@@ -47,6 +51,16 @@ AUDIO_GUIDANCE = {
     'announce_street_names': True
 }
 
+# Persistent route / geocode cache (navigation/route_cache.py)
+ROUTE_CACHE = {
+    'path': 'navigation_cache.sqlite3',
+    'cell_deg': 0.0005,  # ~50 m origin/destination cells
+    'route_ttl_sec': 7 * 24 * 3600,
+    'geocode_ttl_sec': 90 * 24 * 3600,
+    'max_routes': 200,
+    'max_geocodes': 500
+}
+
 # Error handling
 MAX_RETRIES = 3
 TIMEOUT_SECONDS = 30
@@ -0,0 +1,191 @@
+"""
+Camera intrinsics and depth-scale calibration, stored in CALIBRATION_PATH.
+
+    # Intrinsics from ~15 photos of a printed chessboard (inner corners)
+    python -m distance_estimation.calibration intrinsics IMG... --board 9x6 --square 0.025
+
+    # Scale/shift that makes a depth backend metric, from frames with an
+    # object at a measured distance: [{"image": ..., "bbox": [x1, y1, x2, y2],
+    # "distance_m": 2.5}, ...]
+    python -m distance_estimation.calibration depth SAMPLES.json --backend midas_small
+"""
+import argparse
+import json
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CALIBRATION_PATH = Path("camera_calibration.json")
+
+# Range a relative backend may report after alignment (m)
+MIN_DEPTH_M = 0.1
+MAX_DEPTH_M = 100.0
+
+
+@dataclass
+class CameraCalibration:
+    """
+    Pinhole intrinsics at the (width, height) they were measured at, plus
+    per-backend depth alignment: backend name -> (scale, shift).
+    """
+
+    width: int
+    height: int
+    fx: float
+    fy: float
+    cx: float
+    cy: float
+    dist_coeffs: List[float] = field(default_factory=list)
+    depth: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+
+    def focal_length_px(self, width: int, height: int) -> float:
+        """Mean focal length, rescaled to a frame of another size."""
+        return 0.5 * (self.fx * width / self.width + self.fy * height / self.height)
+
+    def save(self, path: Path = CALIBRATION_PATH):
+        path.write_text(json.dumps(asdict(self), indent=2))
+
+    @classmethod
+    def load(cls, path: Path = CALIBRATION_PATH) -> Optional["CameraCalibration"]:
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text())
+        data["depth"] = {name: tuple(v) for name, v in data.get("depth", {}).items()}
+        return cls(**data)
+
+
+def to_metric(raw, alignment: Tuple[float, float], metric: bool):
+    """
+    Applies a backend's (scale, shift). Metric backends are corrected
+    directly; relative ones predict inverse depth, so the aligned value
+    is 1 / distance.
+    """
+    scale, shift = alignment
+    aligned = scale * np.asarray(raw, dtype=np.float32) + shift
+    if metric:
+        return aligned
+    return 1.0 / np.clip(aligned, 1.0 / MAX_DEPTH_M, 1.0 / MIN_DEPTH_M)
+
+
+def fit_depth_alignment(
+    raw: Sequence[float], distances_m: Sequence[float], metric: bool
+) -> Tuple[float, float]:
+    """
+    Least-squares (scale, shift) such that scale * raw + shift matches
+    the measured distance (metric backends) or its inverse (relative).
+    """
+    raw = np.asarray(raw, dtype=np.float64)
+    target = np.asarray(distances_m, dtype=np.float64)
+    if len(raw) < 2:
+        raise ValueError("Depth calibration needs at least two samples")
+    if not metric:
+        target = 1.0 / target
+
+    a = np.stack([raw, np.ones_like(raw)], axis=1)
+    (scale, shift), *_ = np.linalg.lstsq(a, target, rcond=None)
+    return float(scale), float(shift)
+
+
+def calibrate_intrinsics(
+    images: Sequence[np.ndarray],
+    board: Tuple[int, int] = (9, 6),
+    square_m: float = 0.025,
+) -> CameraCalibration:
+    """OpenCV chessboard calibration; `board` counts inner corners."""
+    import cv2
+
+    pattern = np.zeros((board[0] * board[1], 3), np.float32)
+    pattern[:, :2] = np.mgrid[0:board[0], 0:board[1]].T.reshape(-1, 2) * square_m
+
+    object_points, image_points = [], []
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+    for img in images:
+        grey = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        found, corners = cv2.findChessboardCorners(grey, board)
+        if not found:
+            continue
+        corners = cv2.cornerSubPix(grey, corners, (11, 11), (-1, -1), criteria)
+        object_points.append(pattern)
+        image_points.append(corners)
+
+    if len(image_points) < 3:
+        raise ValueError(f"Chessboard found in {len(image_points)} images; need at least 3")
+
+    h, w = images[0].shape[:2]
+    _, matrix, dist, _, _ = cv2.calibrateCamera(object_points, image_points, (w, h), None, None)
+    return CameraCalibration(
+        width=w,
+        height=h,
+        fx=float(matrix[0, 0]),
+        fy=float(matrix[1, 1]),
+        cx=float(matrix[0, 2]),
+        cy=float(matrix[1, 2]),
+        dist_coeffs=[float(v) for v in dist.ravel()],
+    )
+
+
+def calibrate_depth(
+    samples: List[dict], backend: str, calibration: CameraCalibration
+) -> Tuple[float, float]:
+    """
+    Runs `backend` on each sample image and fits its raw value inside the
+    sample's bbox to the measured distance.
+    """
+    import cv2
+
+    from distance_estimation.distance_estimator import DistanceEstimator
+
+    estimator = DistanceEstimator(
+        backend=backend, use_depth_cache=False, calibration=calibration, require_alignment=False
+    )
+    raw, distances = [], []
+    for sample in samples:
+        rgb = cv2.cvtColor(cv2.imread(sample["image"]), cv2.COLOR_BGR2RGB)
+        raw.append(estimator.raw_depth(rgb, tuple(sample["bbox"])))
+        distances.append(float(sample["distance_m"]))
+    return fit_depth_alignment(raw, distances, estimator.backend.metric)
+
+
+def main(argv=None) -> int:
+    import cv2
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path, default=CALIBRATION_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    intr = sub.add_parser("intrinsics", help="camera matrix from chessboard photos")
+    intr.add_argument("images", nargs="+")
+    intr.add_argument("--board", default="9x6", help="inner corners, COLSxROWS")
+    intr.add_argument("--square", type=float, default=0.025, help="square side (m)")
+
+    depth = sub.add_parser("depth", help="scale/shift making a depth backend metric")
+    depth.add_argument("samples", type=Path)
+    depth.add_argument("--backend", default="midas_small")
+
+    args = parser.parse_args(argv)
+    existing = CameraCalibration.load(args.output)
+
+    if args.command == "intrinsics":
+        cols, rows = (int(v) for v in args.board.lower().split("x"))
+        images = [cv2.imread(p) for p in args.images]
+        calib = calibrate_intrinsics([img for img in images if img is not None], (cols, rows), args.square)
+        if existing is not None:
+            calib.depth = existing.depth
+        print(f"fx={calib.fx:.1f} fy={calib.fy:.1f} cx={calib.cx:.1f} cy={calib.cy:.1f} at {calib.width}x{calib.height}")
+    else:
+        if existing is None:
+            print("Calibrate intrinsics first (depth samples need the focal length)")
+            return 1
+        calib = existing
+        calib.depth[args.backend] = calibrate_depth(json.loads(args.samples.read_text()), args.backend, calib)
+        print(f"{args.backend}: scale={calib.depth[args.backend][0]:.5f} shift={calib.depth[args.backend][1]:.5f}")
+
+    calib.save(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import torch
+
+from object_detection.yolo_detector import Detection
+
+# Model files relative to this file:
+# distance_estimation/
+#   models/
+#     midas_v21_small_256.onnx
+#     depth_anything_vits14.onnx
+MODELS_DIR = Path(__file__).resolve().parent / "models"
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# Small relative-depth models exported to ONNX. Both predict affine-
+# invariant inverse depth; input (height, width) as exported (Depth
+# Anything needs multiples of 14, 252x336 keeps the camera's 3:4)
+ONNX_MODELS = {
+    "midas_small": {"file": "midas_v21_small_256.onnx", "input_size": (256, 256)},
+    "depth_anything_small": {"file": "depth_anything_vits14.onnx", "input_size": (252, 336)},
+}
+
+# Typical (height, width) in metres of RELEVANT_CLASSES, for the
+# pinhole estimate d = f * size / pixels
+CLASS_SIZES_M = {
+    "person": (1.70, 0.50),
+    "car": (1.50, 1.80),
+    "bus": (3.00, 2.55),
+    "truck": (3.00, 2.50),
+    "bicycle": (1.05, 0.60),
+    "motorcycle": (1.10, 0.80),
+}
+DEFAULT_SIZE_M = CLASS_SIZES_M["person"]
+# A bbox within this many pixels of the top/bottom edge is cut off
+EDGE_MARGIN_PX = 2.0
+
+
+class DepthBackend:
+    """
+    One monocular depth model. infer() returns an (H, W) map in frame
+    coordinates: metres if `metric`, otherwise relative inverse depth
+    (larger = closer), made metric with a calibrated scale/shift.
+    """
+
+    name = ""
+    metric = False
+    # Batched square crops with a per-crop focal length (DEPTH_MODE "roi")
+    supports_roi = False
+
+    def infer(self, frame, rgb: np.ndarray, f_px: float) -> np.ndarray:
+        raise NotImplementedError
+
+    def infer_crops(self, crops: np.ndarray, f_px: Sequence[float]) -> np.ndarray:
+        """(N, S, S, 3) RGB crops -> (N, S, S) maps."""
+        raise NotImplementedError
+
+
+class DepthProBackend(DepthBackend):
+    """Apple Depth Pro: metric, accurate, ViT-L sized (slow on CPU)."""
+
+    name = "depth_pro"
+    metric = True
+    supports_roi = True
+
+    def __init__(self, device: torch.device):
+        import depth_pro
+
+        self.device = device
+        model, self.transform = depth_pro.create_model_and_transforms()
+        self.model = model.to(device)
+        self.model.eval()
+
+    @staticmethod
+    def _normalize(rgb: np.ndarray) -> torch.Tensor:
+        # Same as the Depth Pro transform ([0, 255] -> [-1, 1]) without
+        # the PIL round-trip; leading dims are kept, channels moved first
+        t = torch.from_numpy(np.ascontiguousarray(rgb))
+        return t.movedim(-1, -3).float().div_(127.5).sub_(1.0)
+
+    def infer(self, frame, rgb: np.ndarray, f_px: float) -> np.ndarray:
+        from utils.frame_buffer import PreprocessedFrame
+
+        if isinstance(frame, PreprocessedFrame):
+            img_tensor = frame.depth_input().to(self.device)
+        else:
+            img_tensor = self._normalize(rgb).to(self.device)
+
+        with torch.no_grad():
+            prediction = self.model.infer(img_tensor, f_px=f_px)
+            return prediction["depth"].squeeze().cpu().numpy()
+
+    def infer_crops(self, crops: np.ndarray, f_px: Sequence[float]) -> np.ndarray:
+        n, size = crops.shape[:2]
+        batch = self._normalize(crops).to(self.device)
+        f_px_t = torch.tensor(list(f_px), device=self.device).view(-1, 1, 1, 1)
+
+        with torch.no_grad():
+            prediction = self.model.infer(batch, f_px=f_px_t)
+            return prediction["depth"].reshape(n, size, size).cpu().numpy()
+
+
+class OnnxDepthBackend(DepthBackend):
+    """
+    MiDaS-small / Depth-Anything-small on ONNX Runtime (CPU). Tens of ms
+    on a Pi, but relative: needs a depth calibration to give metres.
+    """
+
+    metric = False
+
+    def __init__(self, name: str, model_path: Optional[Path] = None, threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        if name not in ONNX_MODELS:
+            raise ValueError(f"Unknown ONNX depth model: {name}")
+        spec = ONNX_MODELS[name]
+        path = Path(model_path) if model_path is not None else MODELS_DIR / spec["file"]
+        if not path.exists():
+            raise FileNotFoundError(f"Depth model not found at {path}.")
+
+        options = ort.SessionOptions()
+        if threads is not None:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        self.name = name
+        self.input_size: Tuple[int, int] = spec["input_size"]
+        self._mean = np.array(IMAGENET_MEAN, dtype=np.float32) * 255.0
+        self._inv_std = 1.0 / (np.array(IMAGENET_STD, dtype=np.float32) * 255.0)
+
+    def infer(self, frame, rgb: np.ndarray, f_px: float) -> np.ndarray:
+        h, w = rgb.shape[:2]
+        ih, iw = self.input_size
+
+        small = cv2.resize(rgb, (iw, ih), interpolation=cv2.INTER_AREA)
+        blob = ((small.astype(np.float32) - self._mean) * self._inv_std).transpose(2, 0, 1)[None]
+        out = self.session.run(None, {self.input_name: np.ascontiguousarray(blob)})[0]
+
+        # Back to frame coordinates so bboxes index it directly
+        disparity = out.reshape(out.shape[-2:]).astype(np.float32)
+        return cv2.resize(disparity, (w, h), interpolation=cv2.INTER_LINEAR)
+
+
+def make_backend(name: str, device: Optional[torch.device] = None) -> Optional[DepthBackend]:
+    """The backend called `name`; None for "geometry" (no model)."""
+    if name == "geometry":
+        return None
+    if name == "depth_pro":
+        return DepthProBackend(device or torch.device("cpu"))
+    if name in ONNX_MODELS:
+        return OnnxDepthBackend(name)
+    raise ValueError(f"Unknown depth backend: {name}")
+
+
+class GeometricEstimator:
+    """
+    Distance from apparent size and known class sizes (pinhole model:
+    d = f * real size / size in pixels). No model, microseconds per box.
+
+    A box cut off at the top or bottom of the frame looks too short, i.e.
+    too far away; those take the nearer of the height and width estimates.
+    """
+
+    def __init__(self, sizes: Dict[str, Tuple[float, float]] = CLASS_SIZES_M):
+        self.sizes = sizes
+
+    def distance(self, det: Detection, f_px: float, frame_height: int) -> float:
+        x1, y1, x2, y2 = det.bbox
+        real_h, real_w = self.sizes.get(det.class_name, DEFAULT_SIZE_M)
+
+        distance = f_px * real_h / max(y2 - y1, 1.0)
+        if y1 <= EDGE_MARGIN_PX or y2 >= frame_height - EDGE_MARGIN_PX:
+            distance = min(distance, f_px * real_w / max(x2 - x1, 1.0))
+        return float(distance)
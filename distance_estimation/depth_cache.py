@@ -0,0 +1,134 @@
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from object_detection.yolo_detector import Detection
+
+# Full depth inference at least every N frames
+REFRESH_EVERY_N_FRAMES = 5
+# ...and never trust a depth map older than this (seconds)
+MAX_DEPTH_AGE_SEC = 1.0
+# Mean absolute grey-level difference (0-255) on a thumbnail that counts as a new scene
+SCENE_CHANGE_THRESHOLD = 12.0
+# Anything estimated closer than this always gets a fresh depth pass
+NEAR_OVERRIDE_M = 1.0
+# Minimum IoU to treat a detection as the same object as in the cached frame
+MATCH_IOU = 0.3
+
+THUMB_SIZE = (32, 24)  # (w, h)
+
+
+def _iou(a: tuple, b: tuple) -> float:
+    ax1, ay1, ax2, ay2 = a
+    bx1, by1, bx2, by2 = b
+    iw = max(0.0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0.0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _area(bbox: tuple) -> float:
+    x1, y1, x2, y2 = bbox
+    return max(1.0, (x2 - x1) * (y2 - y1))
+
+
+class TemporalDepthCache:
+    """
+    Remembers the last full depth pass so Depth Pro does not have to run
+    on every frame.
+
+    A new pass is requested when the cache is older than the frame/time
+    budget, when the scene changes (thumbnail difference or a different
+    set of detected classes), or when something was last seen closer
+    than `near_override_m`. In between, distances are re-used from the
+    cached detections and rescaled by bbox size change (pinhole model:
+    apparent size ~ 1 / distance).
+    """
+
+    def __init__(
+        self,
+        refresh_every: int = REFRESH_EVERY_N_FRAMES,
+        max_age_sec: float = MAX_DEPTH_AGE_SEC,
+        scene_change_threshold: float = SCENE_CHANGE_THRESHOLD,
+        near_override_m: float = NEAR_OVERRIDE_M,
+        match_iou: float = MATCH_IOU,
+    ):
+        self.refresh_every = refresh_every
+        self.max_age_sec = max_age_sec
+        self.scene_change_threshold = scene_change_threshold
+        self.near_override_m = near_override_m
+        self.match_iou = match_iou
+
+        self.depth_map: Optional[np.ndarray] = None
+        self._thumb: Optional[np.ndarray] = None
+        self._entries: List[Tuple[Detection, float]] = []
+        self._classes: Counter = Counter()
+        self._stored_at = 0.0
+        self._frames_since = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _thumbnail(rgb: np.ndarray) -> np.ndarray:
+        if rgb.ndim == 3:
+            rgb = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        return cv2.resize(rgb, THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def needs_refresh(self, rgb: np.ndarray, detections: List[Detection]) -> bool:
+        if self._thumb is None:
+            return True
+        if self._frames_since + 1 >= self.refresh_every:
+            return True
+        if time.monotonic() - self._stored_at > self.max_age_sec:
+            return True
+        if any(dist < self.near_override_m for _, dist in self._entries):
+            return True
+        if Counter(d.class_name for d in detections) != self._classes:
+            return True
+
+        diff = np.abs(self._thumbnail(rgb) - self._thumb).mean()
+        return diff > self.scene_change_threshold
+
+    def store(
+        self,
+        rgb: np.ndarray,
+        depth_map: Optional[np.ndarray],
+        results: List[Tuple[Detection, float]],
+    ):
+        self.depth_map = depth_map
+        self._thumb = self._thumbnail(rgb)
+        self._entries = list(results)
+        self._classes = Counter(det.class_name for det, _ in results)
+        self._stored_at = time.monotonic()
+        self._frames_since = 0
+        self.misses += 1
+
+    def estimate(self, det: Detection) -> Optional[float]:
+        """
+        Distance for `det` derived from the cached pass, or None if no
+        cached detection matches it well enough.
+        """
+        best_iou = 0.0
+        best: Optional[Tuple[Detection, float]] = None
+        for cached_det, dist in self._entries:
+            if cached_det.class_id != det.class_id:
+                continue
+            iou = _iou(cached_det.bbox, det.bbox)
+            if iou > best_iou:
+                best_iou, best = iou, (cached_det, dist)
+
+        if best is None or best_iou < self.match_iou:
+            return None
+
+        cached_det, dist = best
+        scale = np.sqrt(_area(cached_det.bbox) / _area(det.bbox))
+        return float(dist * scale)
+
+    def mark_reused(self):
+        self._frames_since += 1
+        self.hits += 1
@@ -1,78 +1,293 @@
+import time
+
 import torch
 import cv2
 import numpy as np
-from PIL import Image
-import depth_pro
 from typing import List, Tuple
 
 from object_detection.yolo_detector import Detection
+from distance_estimation.calibration import CameraCalibration, to_metric
+from distance_estimation.depth_backends import ONNX_MODELS, GeometricEstimator, make_backend
+from distance_estimation.depth_cache import TemporalDepthCache
+from utils.frame_buffer import PreprocessedFrame, as_rgb
+from utils.metrics import METRICS
 
 OBSTACLE_DISTANCE_THRESHOLD = 2.0  
 
+# "depth_pro": metric, accurate, heavy. "midas_small" / "depth_anything_small":
+# ONNX, fast, relative (needs `python -m distance_estimation.calibration depth`).
+# "geometry": bbox height and known class sizes only, no model.
+DEPTH_BACKEND = "depth_pro"
+
+# "full": one depth pass over the whole frame
+# "roi":  one batched pass over padded, square crops around each detection
+DEPTH_MODE = "full"
+ROI_PADDING = 0.15      # extra context around each bbox (fraction of its size)
+ROI_SIZE = 384          # side of each crop fed to the model (px)
+# Tunable cap on crops per batch (not yet benchmarked): with more
+# detections than this, one full-frame pass is used instead
+ROI_MAX_CROPS = 4
+# Depth is the median over the central part of the bbox (fraction per axis),
+# not a single center pixel that may land on background or a reflection
+INNER_BOX_FRACTION = 0.5
+
+# Compute saturated: while the model pass (smoothed) is slower than this
+# (ms), distances come from geometry, re-trying the model every Nth call.
+# Per backend; none for depth_pro, which takes seconds per frame on a Pi
+# and would otherwise run on only every GEOMETRY_PROBE_EVERY-th frame
+DEPTH_BUDGET_MS = {"midas_small": 400.0, "depth_anything_small": 400.0}
+GEOMETRY_PROBE_EVERY = 10
+LATENCY_SMOOTHING = 0.2
+
 
 class DistanceEstimator:
-    def __init__(self, use_gpu: bool = False):
-        
+    def __init__(
+        self,
+        use_gpu: bool = False,
+        depth_cache: TemporalDepthCache | None = None,
+        use_depth_cache: bool = True,
+        mode: str = DEPTH_MODE,
+        backend: str = DEPTH_BACKEND,
+        calibration: CameraCalibration | None = None,
+        budget_ms: float | None = None,
+        require_alignment: bool = True,
+    ):
+        """
+        budget_ms: model latency above which geometry takes over
+        (default: DEPTH_BUDGET_MS for the backend, else no limit).
+        require_alignment: refuse a relative backend without a calibrated
+        scale/shift (off only for calibration itself).
+        """
+
         if use_gpu and torch.cuda.is_available():
             self.device = torch.device("cuda")
         else:
             self.device = torch.device("cpu")
 
-        self.model, self.transform = self._load_depth_pro()
+        # Intrinsics and depth scale/shift, if the camera was calibrated
+        self.calibration = calibration if calibration is not None else CameraCalibration.load()
+        self.geometry = GeometricEstimator()
         self._cached_f_px: float | None = None  
 
-    def _load_depth_pro(self):
-       
-        model, transform = depth_pro.create_model_and_transforms()
-        model = model.to(self.device)
-        model.eval()
-        return model, transform
+        # Raw backend output -> metres (relative models are unusable without
+        # it, so they are not even loaded)
+        self.alignment = None
+        if self.calibration is not None:
+            self.alignment = self.calibration.depth.get(backend)
+        if backend in ONNX_MODELS and self.alignment is None and require_alignment:
+            raise ValueError(
+                f"Depth backend {backend} is not calibrated: run "
+                f"`python -m distance_estimation.calibration depth` or use \"geometry\""
+            )
+        self.backend = make_backend(backend, self.device)
+
+        # Re-use depth between frames instead of running the model every time
+        if depth_cache is None and use_depth_cache and self.backend is not None:
+            depth_cache = TemporalDepthCache()
+        self.depth_cache = depth_cache
+
+        if mode not in ("full", "roi"):
+            raise ValueError(f"Unknown depth mode: {mode}")
+        if mode == "roi" and self.backend is not None and not self.backend.supports_roi:
+            raise ValueError(f"Depth backend {self.backend.name} does not support ROI mode")
+        self.mode = mode
+
+        self.budget_ms = DEPTH_BUDGET_MS.get(backend, float("inf")) if budget_ms is None else budget_ms
+        self.model_ms = 0.0
+        self._calls_since_probe = 0
+
+    @property
+    def uses_model(self) -> bool:
+        return self.backend is not None and (self.backend.metric or self.alignment is not None)
 
     def _get_focal_length_px(self, height: int, width: int) -> float:
       
         if self._cached_f_px is None:
-            self._cached_f_px = float(max(height, width))
+            if self.calibration is not None:
+                self._cached_f_px = self.calibration.focal_length_px(width, height)
+            else:
+                # Uncalibrated: roughly a 53 degree horizontal field of view
+                self._cached_f_px = float(max(height, width))
         return self._cached_f_px
 
+    def warmup(self, frame):
+        """
+        One untimed, uncached pass in the configured mode over `frame`
+        (e.g. a black one), so the first real frame runs at full speed.
+        """
+        if not self.uses_model:
+            return
+        rgb = as_rgb(frame)
+        if self.mode == "roi":
+            h, w = rgb.shape[:2]
+            self._infer_roi_depths(rgb, [Detection("warmup", -1, 0.0, (0, 0, w, h))])
+        else:
+            self._infer_depth_map(frame, rgb)
+
+    def raw_depth(self, rgb: np.ndarray, bbox: tuple) -> float:
+        """Uncalibrated backend output inside `bbox` (for calibration)."""
+        h, w = rgb.shape[:2]
+        raw = self.backend.infer(rgb, rgb, self._get_focal_length_px(h, w))
+        return self._sample_depth(raw, bbox)
+
+    @METRICS.timed("depth_estimate")
     def estimate_distance(
         self,
-        frame: np.ndarray,
+        frame: np.ndarray | PreprocessedFrame,
         detections: List[Detection],
         max_detections: int | None = None,
+        prefer_geometry: bool = False,
     ) -> List[Tuple[Detection, float, bool]]:
-       
+        """
+        prefer_geometry: skip the model for this frame (e.g. while the
+        CPU is thermally throttled); the depth cache is still used.
+        """
         if not detections:
             return []
 
         if max_detections is not None:
             detections = detections[:max_detections]
 
-        h, w = frame.shape[:2]
+        # Plain BGR arrays are converted once here; PreprocessedFrame is free
+        rgb = as_rgb(frame)
+        if not self.uses_model:
+            return self._estimate_geometric(rgb, detections)
+
+        cache = self.depth_cache
+        if cache is not None and not cache.needs_refresh(rgb, detections):
+            results = self._estimate_from_cache(detections)
+            # Hard override: never rely on re-used depth for something close
+            if results is not None and all(
+                dist >= cache.near_override_m for _, dist, _ in results
+            ):
+                cache.mark_reused()
+                return results
+
+        if prefer_geometry or self._saturated():
+            METRICS.counter("depth_geometry_fallbacks").inc()
+            return self._estimate_geometric(rgb, detections)
+
+        start = time.perf_counter()
+        if self.mode == "roi" and len(detections) <= ROI_MAX_CROPS:
+            depth_map = None
+            distances = self._infer_roi_depths(rgb, detections)
+        else:
+            depth_map = self._infer_depth_map(frame, rgb)
+            distances = [self._sample_depth(depth_map, det.bbox) for det in detections]
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        self.model_ms += LATENCY_SMOOTHING * (elapsed_ms - self.model_ms)
+
+        results = [self._make_result(det, dist) for det, dist in zip(detections, distances)]
+
+        if cache is not None:
+            cache.store(rgb, depth_map, list(zip(detections, distances)))
+
+        return results
+
+    def _saturated(self) -> bool:
+        """True while the model is over budget, except on every Nth (probe) call."""
+        if self.model_ms <= self.budget_ms:
+            return False
+        self._calls_since_probe += 1
+        if self._calls_since_probe >= GEOMETRY_PROBE_EVERY:
+            self._calls_since_probe = 0
+            return False
+        return True
+
+    def _estimate_geometric(
+        self, rgb: np.ndarray, detections: List[Detection]
+    ) -> List[Tuple[Detection, float, bool]]:
+        h, w = rgb.shape[:2]
         f_px = self._get_focal_length_px(h, w)
+        return [self._make_result(det, self.geometry.distance(det, f_px, h)) for det in detections]
 
-        img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        pil_img = Image.fromarray(img_rgb)
+    def _to_metric(self, raw: np.ndarray) -> np.ndarray:
+        if self.alignment is None:
+            return raw
+        return to_metric(raw, self.alignment, self.backend.metric)
 
-        img_tensor = self.transform(pil_img).to(self.device)
+    def _infer_depth_map(self, frame, rgb: np.ndarray) -> np.ndarray:
+        h, w = rgb.shape[:2]
+        f_px = self._get_focal_length_px(h, w)
+        return self._to_metric(self.backend.infer(frame, rgb, f_px))
 
-        with torch.no_grad():
-            prediction = self.model.infer(img_tensor, f_px=f_px)
-            depth_map = prediction["depth"].squeeze().cpu().numpy()  
+    def _infer_roi_depths(self, img_rgb: np.ndarray, detections: List[Detection]) -> List[float]:
+        """
+        Runs the model once over a batch of square crops, one per detection.
+        Each crop is padded around its bbox and resized to ROI_SIZE; the
+        focal length is rescaled per crop so the depth stays metric.
+        """
+        h, w = img_rgb.shape[:2]
+        f_px = self._get_focal_length_px(h, w)
 
-        dh, dw = depth_map.shape
-        results: List[Tuple[Detection, float, bool]] = []
+        crops = []
+        crop_f_px = []
+        crop_boxes = []
 
         for det in detections:
             x1, y1, x2, y2 = det.bbox
-            center_x = (x1 + x2) / 2.0
-            center_y = (y1 + y2) / 2.0
+            side = max(x2 - x1, y2 - y1) * (1.0 + 2.0 * ROI_PADDING)
+            side = int(np.ceil(max(side, 16.0)))
+            sx1 = int(round((x1 + x2 - side) / 2.0))
+            sy1 = int(round((y1 + y2 - side) / 2.0))
+            sx2, sy2 = sx1 + side, sy1 + side
 
-            cx = int(np.clip(center_x, 0, dw - 1))
-            cy = int(np.clip(center_y, 0, dh - 1))
+            crop = img_rgb[max(sy1, 0):min(sy2, h), max(sx1, 0):min(sx2, w)]
+            pad = (max(0, -sy1), max(0, sy2 - h), max(0, -sx1), max(0, sx2 - w))
+            if any(pad):
+                crop = cv2.copyMakeBorder(crop, *pad, cv2.BORDER_REPLICATE)
+            crops.append(cv2.resize(crop, (ROI_SIZE, ROI_SIZE), interpolation=cv2.INTER_LINEAR))
 
-            distance_m = float(depth_map[cy, cx])  
-            is_obstacle = distance_m < OBSTACLE_DISTANCE_THRESHOLD
+            scale = ROI_SIZE / side
+            crop_f_px.append(f_px * scale)
+            crop_boxes.append(
+                ((x1 - sx1) * scale, (y1 - sy1) * scale, (x2 - sx1) * scale, (y2 - sy1) * scale)
+            )
 
-            results.append((det, distance_m, is_obstacle))
+        depth_maps = self._to_metric(self.backend.infer_crops(np.stack(crops), crop_f_px))
+        return [self._sample_depth(dm, box) for dm, box in zip(depth_maps, crop_boxes)]
+
+    @staticmethod
+    def _sample_depth(depth_map: np.ndarray, bbox: tuple) -> float:
+        """
+        Median depth over the inner INNER_BOX_FRACTION of the bbox.
+        """
+        dh, dw = depth_map.shape
+        x1, y1, x2, y2 = bbox
+        center_x = (x1 + x2) / 2.0
+        center_y = (y1 + y2) / 2.0
+        half_w = (x2 - x1) * INNER_BOX_FRACTION / 2.0
+        half_h = (y2 - y1) * INNER_BOX_FRACTION / 2.0
+
+        ix1 = int(np.clip(center_x - half_w, 0, dw - 1))
+        ix2 = int(np.clip(center_x + half_w, 0, dw - 1)) + 1
+        iy1 = int(np.clip(center_y - half_h, 0, dh - 1))
+        iy2 = int(np.clip(center_y + half_h, 0, dh - 1)) + 1
+
+        return float(np.median(depth_map[iy1:iy2, ix1:ix2]))
+
+    def _estimate_from_cache(
+        self, detections: List[Detection]
+    ) -> List[Tuple[Detection, float, bool]] | None:
+        """
+        Distances from the cached pass, or None if some detection cannot be
+        resolved from it (new object and no full depth map in ROI mode).
+        """
+        cache = self.depth_cache
+        results: List[Tuple[Detection, float, bool]] = []
+
+        for det in detections:
+            distance_m = cache.estimate(det)
+            if distance_m is None:
+                if cache.depth_map is None:
+                    return None
+                # New object in an unchanged scene: read the cached depth map
+                distance_m = self._sample_depth(cache.depth_map, det.bbox)
+            results.append(self._make_result(det, distance_m))
 
         return results
+
+    @staticmethod
+    def _make_result(det: Detection, distance_m: float) -> Tuple[Detection, float, bool]:
+        is_obstacle = distance_m < OBSTACLE_DISTANCE_THRESHOLD
+        return det, distance_m, is_obstacle
@@ -1,38 +1,281 @@
 from gpiozero import PWMOutputDevice
+import re
 import time
 import threading
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
 
+import numpy as np
+
+from utils.helpers import position_bins
+
+MOTOR_PINS = {"left": 17, "right": 27, "center": 22}
+
+# Scheduler tick while a ramp is playing (seconds)
+RAMP_STEP_SEC = 0.02
+
+# Distance rhythm: pulse gap shrinks linearly from RHYTHM_MAX_GAP_MS at
+# RHYTHM_FAR_M to RHYTHM_MIN_GAP_MS at RHYTHM_NEAR_M
+RHYTHM_NEAR_M = 0.5
+RHYTHM_FAR_M = 3.0
+RHYTHM_MIN_GAP_MS = 60
+RHYTHM_MAX_GAP_MS = 600
+RHYTHM_PULSE_MS = 80
+
+# Spatial mode: steady duty cycle per motor from the nearest obstacle in
+# its third of the view, MIN_DUTY at SPATIAL_FAR_M up to 1.0 at SPATIAL_NEAR_M
+SPATIAL_NEAR_M = 0.5
+SPATIAL_FAR_M = 3.0
+MIN_DUTY = 0.2
+# Levels not refreshed within this time fall back to off (stalled vision);
+# the hold is LEVEL_HOLD_INTERVALS decision intervals, but at least
+# LEVEL_TIMEOUT_SEC, so slow vision does not make the motors flicker
+LEVEL_TIMEOUT_SEC = 0.5
+LEVEL_HOLD_INTERVALS = 3.0
+SPATIAL_MOTORS = ("left", "center", "right")
+
+
+def level_hold(interval: float) -> float:
+    """How long steady levels last when refreshed every `interval` seconds."""
+    return max(LEVEL_TIMEOUT_SEC, LEVEL_HOLD_INTERVALS * interval)
+
+
+class Segment(NamedTuple):
+    start: float      # duty cycle 0..1 at the beginning
+    end: float        # duty cycle at the end (== start for a flat pulse)
+    duration: float   # seconds
+
+
+Pattern = Tuple[Segment, ...]
+
+
+def parse_pattern(spec: str) -> Pattern:
+    """
+    Pattern language, whitespace separated:
+        "1@300"      full power for 300 ms
+        "0@100"      off for 100 ms
+        "0.2>1@400"  ramp from 20 % to 100 % over 400 ms
+        "*2"         repeat everything so far twice
+    e.g. "1@300 0@100 *2" is two long buzzes.
+    """
+    segments = []
+    for token in spec.split():
+        if token.startswith("*"):
+            segments = segments * int(token[1:])
+            continue
+        match = re.fullmatch(r"([\d.]+)(?:>([\d.]+))?@(\d+)", token)
+        if match is None:
+            raise ValueError(f"Bad haptic pattern token: {token!r}")
+        start = float(match.group(1))
+        end = float(match.group(2)) if match.group(2) is not None else start
+        segments.append(Segment(start, end, int(match.group(3)) / 1000.0))
+    return tuple(segments)
+
+
+# Named patterns and their priority (a higher one supersedes a lower one)
+PATTERNS: Dict[str, Pattern] = {
+    "strong": parse_pattern("1@300 0@100 *2"),
+    "short": parse_pattern("1@150"),
+    "ramp": parse_pattern("0.2>1@400"),
+}
+PRIORITIES = {"strong": 2, "short": 1, "ramp": 1}
+
+
+def distance_rhythm(distance_m: float, intensity: float = 1.0, repeats: int = 3) -> Pattern:
+    """
+    Parking-sensor style pulses: the closer the obstacle, the faster.
+    """
+    span = RHYTHM_FAR_M - RHYTHM_NEAR_M
+    t = min(max((distance_m - RHYTHM_NEAR_M) / span, 0.0), 1.0)
+    gap = RHYTHM_MIN_GAP_MS + t * (RHYTHM_MAX_GAP_MS - RHYTHM_MIN_GAP_MS)
+    on = Segment(intensity, intensity, RHYTHM_PULSE_MS / 1000.0)
+    off = Segment(0.0, 0.0, gap / 1000.0)
+    return (on, off) * repeats
+
+
+def spatial_levels(bboxes, distances, frame_width: int) -> np.ndarray:
+    """
+    (3,) left/center/right duty cycles for all obstacles in one frame:
+    each third takes the strongest (nearest) obstacle that covers it.
+    """
+    distances = np.asarray(distances, dtype=np.float32).reshape(-1)
+    if distances.size == 0:
+        return np.zeros(3, dtype=np.float32)
+
+    closeness = (SPATIAL_FAR_M - distances) / (SPATIAL_FAR_M - SPATIAL_NEAR_M)
+    closeness = np.clip(closeness, 0.0, 1.0)
+    duty = np.where(distances < SPATIAL_FAR_M, MIN_DUTY + (1.0 - MIN_DUTY) * closeness, 0.0)
+
+    covered = position_bins(bboxes, frame_width)
+    return np.where(covered, duty[:, None], 0.0).max(axis=0)
+
+
+class _MotorState:
+    """
+    What one motor is playing, the single pattern waiting behind it and
+    the steady level it returns to in between.
+    """
+
+    __slots__ = ("pattern", "priority", "started", "pending", "level", "level_until")
 
-class HapticFeedback:
     def __init__(self):
-       
-        self.left = PWMOutputDevice(17)
-        self.right = PWMOutputDevice(27)
-        self.center = PWMOutputDevice(22)
+        self.pattern: Optional[Pattern] = None
+        self.priority = 0
+        self.started = 0.0
+        self.pending: Optional[Tuple[Pattern, int]] = None
+        self.level = 0.0
+        self.level_until = 0.0
+
+
+class HapticFeedback:
+    """
+    Vibration motors driven by one scheduler thread.
+
+    Callers submit patterns; the thread renders them to PWM duty cycles.
+    Per motor there is at most one playing and one pending pattern:
+    a pattern of equal or higher priority replaces the playing one
+    immediately, a lower one waits (replacing any older pending pattern),
+    and re-requesting the pattern already playing is a no-op.
+    Between patterns a motor holds its steady level (set_levels), which the
+    spatial mode refreshes every frame.
+
+    Pass `pin_factory` (e.g. gpiozero.pins.mock.MockFactory(pin_class=
+    MockPWMPin)) to run without GPIO hardware.
+    """
+
+    def __init__(self, pin_factory=None, pins: Dict[str, int] = MOTOR_PINS):
+        self.motors: Dict[str, PWMOutputDevice] = {
+            name: PWMOutputDevice(pin, pin_factory=pin_factory) for name, pin in pins.items()
+        }
+        self.left = self.motors.get("left")
+        self.right = self.motors.get("right")
+        self.center = self.motors.get("center")
+
+        self._state = {name: _MotorState() for name in self.motors}
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="haptics", daemon=True)
+        self._thread.start()
+
+    # --- public API ---------------------------------------------------------
 
     def vibrate_left(self, level: str):
-        threading.Thread(target=self._vibrate, args=(self.left, level), daemon=True).start()
+        self.play("left", level)
 
     def vibrate_right(self, level: str):
-        threading.Thread(target=self._vibrate, args=(self.right, level), daemon=True).start()
+        self.play("right", level)
 
     def vibrate_center(self, level: str):
-        threading.Thread(target=self._vibrate, args=(self.center, level), daemon=True).start()
-
-    def _vibrate(self, motor: PWMOutputDevice, level: str):
-        if level == "strong":
-            for _ in range(2):
-                motor.value = 1.0
-                time.sleep(0.3)
-                motor.value = 0
-                time.sleep(0.1)
-
-        elif level == "short":
-            motor.value = 1.0
-            time.sleep(0.15)
-            motor.value = 0
+        self.play("center", level)
+
+    def vibrate_distance(self, motor: str, distance_m: float, intensity: float = 1.0, priority: int = 1):
+        self.play(motor, distance_rhythm(distance_m, intensity), priority)
+
+    def set_levels(self, levels: Mapping[str, float], hold: float = LEVEL_TIMEOUT_SEC):
+        """
+        Continuous intensities (duty cycle 0..1) per motor, valid for
+        `hold` seconds unless refreshed. Patterns play on top of them.
+        """
+        until = time.monotonic() + hold
+        with self._cond:
+            for name, level in levels.items():
+                state = self._state[name]
+                state.level = float(level)
+                state.level_until = until
+            self._cond.notify()
+
+    def set_spatial(self, bboxes, distances, frame_width: int, hold: float = LEVEL_TIMEOUT_SEC):
+        """Spatial mode: left/center/right levels from all obstacles in view."""
+        levels = spatial_levels(bboxes, distances, frame_width)
+        self.set_levels(dict(zip(SPATIAL_MOTORS, levels.tolist())), hold)
+
+    def play(self, motor: str, pattern, priority: Optional[int] = None):
+        """
+        Queues `pattern` (a name from PATTERNS, a pattern string or a tuple
+        of Segments) on `motor`, subject to the priority rules above.
+        """
+        if isinstance(pattern, str):
+            if priority is None:
+                priority = PRIORITIES.get(pattern, 1)
+            pattern = PATTERNS[pattern] if pattern in PATTERNS else parse_pattern(pattern)
+        if priority is None:
+            priority = 1
+
+        with self._cond:
+            state = self._state[motor]
+            if state.pattern == pattern:
+                return
+            if state.pattern is None or priority >= state.priority:
+                state.pattern, state.priority, state.started = pattern, priority, time.monotonic()
+            elif state.pending is None or priority >= state.pending[1]:
+                state.pending = (pattern, priority)
+            self._cond.notify()
 
     def stop_all(self):
-        self.left.value = 0
-        self.right.value = 0
-        self.center.value = 0
+        with self._cond:
+            for state in self._state.values():
+                state.pattern = None
+                state.pending = None
+                state.level = 0.0
+            self._cond.notify()
+        for motor in self.motors.values():
+            motor.value = 0
+
+    def close(self):
+        self.stop_all()
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+        for motor in self.motors.values():
+            motor.close()
+
+    # --- scheduler thread ---------------------------------------------------
+
+    @staticmethod
+    def _sample(pattern: Pattern, elapsed: float) -> Tuple[Optional[float], float, bool]:
+        """
+        (duty cycle or None when finished, seconds until it changes, ramping)
+        """
+        for seg in pattern:
+            if elapsed < seg.duration:
+                if seg.start == seg.end:
+                    return seg.start, seg.duration - elapsed, False
+                value = seg.start + (seg.end - seg.start) * elapsed / seg.duration
+                return value, seg.duration - elapsed, True
+            elapsed -= seg.duration
+        return None, 0.0, False
+
+    def _run(self):
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                wait = None
+
+                for name, state in self._state.items():
+                    value, remaining, ramping = None, None, False
+                    if state.pattern is not None:
+                        value, remaining, ramping = self._sample(state.pattern, now - state.started)
+                        if value is None:
+                            # Finished: start the pending pattern, if any
+                            state.pattern = None
+                            if state.pending is not None:
+                                state.pattern, state.priority = state.pending
+                                state.started = now
+                                state.pending = None
+                                value, remaining, ramping = self._sample(state.pattern, 0.0)
+
+                    if value is None:
+                        # No pattern: hold the steady level until it expires
+                        if state.level > 0 and now >= state.level_until:
+                            state.level = 0.0
+                        value = state.level
+                        remaining = state.level_until - now if state.level > 0 else None
+
+                    if self.motors[name].value != value:
+                        self.motors[name].value = value
+                    if remaining is not None:
+                        step = min(remaining, RAMP_STEP_SEC) if ramping else remaining
+                        wait = step if wait is None else min(wait, step)
+
+                # Idle: sleep until the next request; busy: until the next change
+                self._cond.wait(timeout=wait)
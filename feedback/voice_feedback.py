@@ -1,39 +1,216 @@
+import hashlib
+import pyaudio
 import pyttsx3
 import threading
 import queue
 import time
+import wave
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from utils.metrics import METRICS
+
+SPEECH_RATE = 150
+
+# Rendered phrases are kept as WAV files here, so alerts are ready at boot
+PHRASE_CACHE_DIR = Path("tts_cache")
+# In-memory PCM cache bound (phrases)
+MAX_CACHED_PHRASES = 128
+
+# Playback buffer: the longest a preempted phrase keeps sounding
+# (512 frames at espeak's 22050 Hz is ~23 ms)
+BUFFER_FRAMES = 512
+DEFAULT_SAMPLE_RATE = 22050
+
+# Priority of background pre-rendering (after every on-demand phrase)
+PRECACHE_PRIORITY = 3
+
+
+class Clip(NamedTuple):
+    pcm: bytes
+    rate: int
+    channels: int
+    sample_width: int
+
+
+def _phrase_path(text: str) -> Path:
+    digest = hashlib.sha1(f"{SPEECH_RATE}|{text}".encode("utf-8")).hexdigest()
+    return PHRASE_CACHE_DIR / f"{digest}.wav"
+
+
+def _read_wav(path: Path) -> Clip:
+    with wave.open(str(path), "rb") as wav:
+        return Clip(
+            pcm=wav.readframes(wav.getnframes()),
+            rate=wav.getframerate(),
+            channels=wav.getnchannels(),
+            sample_width=wav.getsampwidth(),
+        )
 
 
 class VoiceFeedback:
+    """
+    Prioritized speech output with a pre-rendered phrase cache.
+
+    pyttsx3 is only used on the synth thread, to render text to WAV (once
+    per phrase; results persist in PHRASE_CACHE_DIR). A separate player
+    thread streams PCM to a PyAudio output in BUFFER_FRAMES chunks, so an
+    interrupting phrase cuts the current one off within one buffer.
+    Cached alerts therefore start without any TTS work.
+    """
+
     def __init__(self):
         self.engine = pyttsx3.init()
-        self.engine.setProperty("rate", 150)
+        self.engine.setProperty("rate", SPEECH_RATE)
+        PHRASE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+        self.audio = pyaudio.PyAudio()
+        self._stream = None
+        self._stream_format = None
+        self._open_stream(Clip(b"", DEFAULT_SAMPLE_RATE, 1, 2))
+
+        self._cache: "OrderedDict[str, Clip]" = OrderedDict()
+        self._cache_lock = threading.Lock()
 
-        self.queue: "queue.PriorityQueue[tuple[int, int, str]]" = queue.PriorityQueue()
+        # (priority, counter, text, generation, play, queued_at)
+        self._render_queue: "queue.PriorityQueue[tuple]" = queue.PriorityQueue()
+        # (priority, counter, text, generation, clip, queued_at)
+        self.queue: "queue.PriorityQueue[tuple]" = queue.PriorityQueue()
 
         self._counter = 0
+        # Bumped by every interrupt; older queued or playing phrases are dropped
+        self._generation = 0
 
         self._last_spoken_text: str | None = None
         self._last_spoken_time: float = 0.0
-        self._dedupe_window_sec: float = 2.0  
-        
-        self.worker = threading.Thread(target=self._run, daemon=True)
-        self.worker.start()
+        self._dedupe_window_sec: float = 2.0
 
         self._lock = threading.Lock()
 
+        self.synth_worker = threading.Thread(target=self._synth_run, name="tts-synth", daemon=True)
+        self.worker = threading.Thread(target=self._run, name="tts-player", daemon=True)
+        self.synth_worker.start()
+        self.worker.start()
+
     def _priority_value(self, priority: str) -> int:
-       
         mapping = {"high": 0, "normal": 1, "low": 2}
         return mapping.get(priority, 1)
 
+    def _next_counter(self) -> int:
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    # --- phrase cache -------------------------------------------------------
+
+    def cached(self, text: str) -> Optional[Clip]:
+        with self._cache_lock:
+            clip = self._cache.get(text)
+            if clip is not None:
+                self._cache.move_to_end(text)
+                return clip
+
+        path = _phrase_path(text)
+        if not path.exists():
+            return None
+        try:
+            clip = _read_wav(path)
+        except Exception:
+            return None
+        self._remember(text, clip)
+        return clip
+
+    def _remember(self, text: str, clip: Clip):
+        with self._cache_lock:
+            self._cache[text] = clip
+            self._cache.move_to_end(text)
+            while len(self._cache) > MAX_CACHED_PHRASES:
+                self._cache.popitem(last=False)
+
+    def precache(self, phrases: Iterable[str]):
+        """
+        Renders phrases in the background (e.g. alerts at startup, the
+        instructions of a newly planned route).
+        """
+        for text in dict.fromkeys(phrases):
+            if text and self.cached(text) is None:
+                self._render_queue.put((PRECACHE_PRIORITY, self._next_counter(), text, 0, False, 0.0))
+
+    def _render(self, text: str) -> Optional[Clip]:
+        path = _phrase_path(text)
+        tmp = path.with_suffix(".tmp.wav")
+        try:
+            with METRICS.timer("tts_render"):
+                self.engine.save_to_file(text, str(tmp))
+                self.engine.runAndWait()
+            tmp.replace(path)
+            clip = _read_wav(path)
+        except Exception:
+            return None
+        self._remember(text, clip)
+        return clip
+
+    # --- worker threads -----------------------------------------------------
+
+    def _synth_run(self):
+        while True:
+            priority_value, counter, text, generation, play, queued_at = self._render_queue.get()
+            if play and generation < self._generation:
+                continue
+
+            clip = self.cached(text) or self._render(text)
+            if not play:
+                continue
+            if clip is None:
+                # Rendering to a file is unsupported by this driver; speak
+                # directly (not preemptible)
+                try:
+                    self.engine.say(text)
+                    self.engine.runAndWait()
+                except Exception:
+                    pass
+                continue
+            self.queue.put((priority_value, counter, text, generation, clip, queued_at))
+
+    def _open_stream(self, clip: Clip):
+        fmt = (clip.rate, clip.channels, clip.sample_width)
+        if fmt == self._stream_format:
+            return
+        if self._stream is not None:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
+            except Exception:
+                pass
+        self._stream = self.audio.open(
+            format=self.audio.get_format_from_width(clip.sample_width),
+            channels=clip.channels,
+            rate=clip.rate,
+            output=True,
+            frames_per_buffer=BUFFER_FRAMES,
+        )
+        self._stream_format = fmt
+
     def _run(self):
-            while True:
-            priority_value, _, text = self.queue.get()  
+        while True:
+            priority_value, _, text, generation, clip, queued_at = self.queue.get()
+            if generation < self._generation:
+                METRICS.counter("tts_dropped").inc()
+                continue
 
+            # speak() -> first buffer, by priority (cached phrases skip rendering)
+            METRICS.histogram("tts_latency", priority=priority_value).observe(
+                (time.perf_counter() - queued_at) * 1000.0
+            )
             try:
-                self.engine.say(text)
-                self.engine.runAndWait()
+                self._open_stream(clip)
+                step = BUFFER_FRAMES * clip.channels * clip.sample_width
+                for start in range(0, len(clip.pcm), step):
+                    if generation < self._generation:
+                        METRICS.counter("tts_preempted").inc()
+                        break
+                    self._stream.write(clip.pcm[start:start + step])
             except Exception:
                 pass
 
@@ -41,7 +218,7 @@ class VoiceFeedback:
                 self._last_spoken_text = text
                 self._last_spoken_time = time.time()
 
-            time.sleep(0.05)  
+    # --- public API ---------------------------------------------------------
 
     def speak(
         self,
@@ -50,7 +227,6 @@ class VoiceFeedback:
         interrupt: bool = False,
         allow_repeat: bool = False,
     ):
-       
         now = time.time()
 
         if not allow_repeat:
@@ -59,24 +235,34 @@ class VoiceFeedback:
                     self._last_spoken_text == text
                     and (now - self._last_spoken_time) < self._dedupe_window_sec
                 ):
-                    return  
+                    METRICS.counter("tts_deduped").inc()
+                    return
+
         if interrupt:
-            
-            try:
-                self.engine.stop()
-            except Exception:
-                pass
+            # Cuts the playing phrase at the next buffer and voids everything
+            # queued before this call
+            with self._lock:
+                self._generation += 1
 
-           
-            try:
-                while True:
-                    self.queue.get_nowait()
-            except queue.Empty:
-                pass
+        generation = self._generation
+        counter = self._next_counter()
+        priority_value = self._priority_value(priority)
 
-        with self._lock:
-            self._counter += 1
-            counter = self._counter
+        queued_at = time.perf_counter()
+        clip = self.cached(text)
+        if clip is not None:
+            self.queue.put((priority_value, counter, text, generation, clip, queued_at))
+        else:
+            METRICS.counter("tts_cache_misses").inc()
+            self._render_queue.put((priority_value, counter, text, generation, True, queued_at))
 
-        priority_value = self._priority_value(priority)
-        self.queue.put((priority_value, counter, text))
+    def close(self):
+        with self._lock:
+            self._generation += 1
+        try:
+            if self._stream is not None:
+                self._stream.stop_stream()
+                self._stream.close()
+            self.audio.terminate()
+        except Exception:
+            pass
@@ -1,57 +1,183 @@
 import vosk
 import json
 import pyaudio
+import queue
+import threading
 import time
-from typing import Optional
+from collections import deque
+from typing import Callable, Deque, List, NamedTuple, Optional
+
+import numpy as np
+
+from utils.pipeline import LatestQueue, PipelineClosed
+
+# Capture: 100 ms chunks (1600 frames at 16 kHz), ~5 s of audio buffered
+CHUNK_MS = 100
+RING_SECONDS = 5.0
+
+# Energy VAD: speech when chunk RMS exceeds both an absolute floor and a
+# multiple of the running noise estimate
+VAD_MIN_RMS = 300.0
+VAD_NOISE_RATIO = 3.0
+NOISE_SMOOTHING = 0.05
+# Minimum statistics: the floor is never below the quietest chunk of the
+# last few seconds, speech or not, so a lasting rise in background noise
+# (traffic, wind) cannot hold the VAD in "speech" forever
+NOISE_WINDOW_CHUNKS = 50
+# An utterance longer than this is cut off and the noise floor re-seeded
+MAX_UTTERANCE_SEC = 10.0
+# Chunks of audio fed before the onset and after the end of speech
+PRE_ROLL_CHUNKS = 3
+HANGOVER_CHUNKS = 6
+# Unread commands kept for get_command(); older ones are dropped
+COMMAND_QUEUE_SIZE = 8
+
+# Spoken phrase -> command name, recognized with a restricted grammar
+COMMANDS = {
+    "repeat": "repeat",
+    "say again": "repeat",
+    "where am i": "where_am_i",
+    "stop navigation": "stop_navigation",
+}
+
+
+class VoiceEvent(NamedTuple):
+    kind: str        # "partial", "final" or "command"
+    text: str        # transcript (command name for "command")
+    mode: str        # "command" or "destination"
+    timestamp: float # time.monotonic()
 
 
 class VoiceInput:
+    """
+    Microphone capture and Vosk recognition on background threads.
+
+    The capture thread only reads the device into a ring of chunks; the
+    recognizer thread runs an energy VAD and feeds Kaldi only while
+    someone is speaking. Outside of listen_for_destination() the
+    recognizer is in "command" mode with a small grammar (COMMANDS), so
+    voice commands work while navigation runs. Partial and final
+    transcripts and recognized commands are published to subscribers;
+    commands are also queued for get_command().
+    """
+
     def __init__(
         self,
         model_path: str = "models/vosk-model-small-en-us-0.15",
         rate: int = 16000,
-        chunk_size: int = 4000,
+        chunk_size: Optional[int] = None,
+        grammar: Optional[str] = None,
+        stream=None,
+        wrap_stream: Optional[Callable] = None,
     ):
-       
         self.model = vosk.Model(model_path)
         self.rate = rate
-        self.chunk_size = chunk_size
-
-        self.audio = pyaudio.PyAudio()
-        self.stream = self.audio.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=self.rate,
-            input=True,
-            frames_per_buffer=8000,
-        )
+        self.chunk_size = chunk_size or rate * CHUNK_MS // 1000
+
+        # grammar: JSON phrase list (e.g. Gazetteer.vosk_grammar()) that
+        # restricts destination recognition to known places
+        if grammar:
+            self.recognizer = vosk.KaldiRecognizer(self.model, self.rate, grammar)
+        else:
+            self.recognizer = vosk.KaldiRecognizer(self.model, self.rate)
+        command_grammar = json.dumps(sorted(COMMANDS) + ["[unk]"])
+        self.command_recognizer = vosk.KaldiRecognizer(self.model, self.rate, command_grammar)
+
+        # stream: optional stand-in for the microphone; wrap_stream(stream)
+        # can intercept the real one (sensors.audio for both)
+        self.audio = None
+        if stream is None:
+            self.audio = pyaudio.PyAudio()
+            stream = self.audio.open(
+                format=pyaudio.paInt16,
+                channels=1,
+                rate=self.rate,
+                input=True,
+                frames_per_buffer=self.chunk_size,
+            )
+            if wrap_stream is not None:
+                stream = wrap_stream(stream)
+        self.stream = stream
         self.stream.start_stream()
 
-        self.recognizer = vosk.KaldiRecognizer(self.model, self.rate)
+        ring_chunks = int(RING_SECONDS * 1000 / CHUNK_MS)
+        self._ring = LatestQueue(maxsize=ring_chunks)
+
+        self._mode = "command"
+        self._destinations: "queue.Queue[str]" = queue.Queue()
+        self._commands: "queue.Queue[VoiceEvent]" = queue.Queue(maxsize=COMMAND_QUEUE_SIZE)
+        self._subscribers: List[Callable[[VoiceEvent], None]] = []
+        self._sub_lock = threading.Lock()
+
+        self.noise_rms = VAD_MIN_RMS / VAD_NOISE_RATIO
+        self._levels: Deque[float] = deque(maxlen=NOISE_WINDOW_CHUNKS)
+        self.partial = ""
+        self.speaking = False
+
+        self._running = threading.Event()
+        self._running.set()
+        self._capture_thread = threading.Thread(target=self._capture, name="voice-capture", daemon=True)
+        self._recognizer_thread = threading.Thread(target=self._recognize, name="voice-recognizer", daemon=True)
+        self._capture_thread.start()
+        self._recognizer_thread.start()
+
+    # --- public API ---------------------------------------------------------
 
     def listen_for_destination(
         self,
         prompt_text: str = "Where do you want to go?",
         timeout: Optional[float] = 10.0,
     ) -> str:
-        
-        print(prompt_text)  
+        """
+        Switches to destination mode until one utterance is recognized.
+        Returns the transcript, or "" on timeout.
+        """
+        print(prompt_text)
 
-        start_time = time.time()
+        while not self._destinations.empty():
+            self._destinations.get_nowait()
+
+        self._mode = "destination"
+        try:
+            return self._destinations.get(timeout=timeout)
+        except queue.Empty:
+            return ""
+        finally:
+            self._mode = "command"
+
+    def get_command(self, timeout: Optional[float] = 0.0) -> Optional[VoiceEvent]:
+        """
+        Next recognized command, or None. Blocks up to `timeout` seconds
+        (forever for None).
+        """
+        try:
+            if timeout == 0.0:
+                return self._commands.get_nowait()
+            return self._commands.get(timeout=timeout)
+        except queue.Empty:
+            return None
 
-        while True:
-            if timeout is not None and (time.time() - start_time) > timeout
-                return ""
+    def subscribe(self, callback: Callable[[VoiceEvent], None]) -> Callable[[], None]:
+        """
+        Calls `callback(event)` on the recognizer thread for every partial,
+        final and command event. Returns a function that unsubscribes.
+        """
+        with self._sub_lock:
+            self._subscribers.append(callback)
 
-            data = self.stream.read(self.chunk_size, exception_on_overflow=False)
+        def unsubscribe():
+            with self._sub_lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
 
-            if self.recognizer.AcceptWaveform(data):
-                result = json.loads(self.recognizer.Result())
-                text = result.get("text", "").strip()
-                if text:
-                    return text
+        return unsubscribe
 
     def close(self):
+        self._running.clear()
+        self._ring.close()
+        for thread in (self._capture_thread, self._recognizer_thread):
+            thread.join(timeout=2.0)
+
         try:
             if self.stream is not None:
                 self.stream.stop_stream()
@@ -64,3 +190,119 @@ class VoiceInput:
                 self.audio.terminate()
         except Exception:
             pass
+
+    # --- capture thread -----------------------------------------------------
+
+    def _capture(self):
+        while self._running.is_set():
+            try:
+                data = self.stream.read(self.chunk_size, exception_on_overflow=False)
+            except Exception:
+                time.sleep(0.1)
+                continue
+            # Oldest audio is dropped if recognition falls behind
+            self._ring.put(data)
+
+    # --- recognizer thread --------------------------------------------------
+
+    def _is_speech(self, data: bytes) -> bool:
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+        self._levels.append(rms)
+        if len(self._levels) == self._levels.maxlen:
+            self.noise_rms = max(self.noise_rms, min(self._levels))
+        speech = rms > max(VAD_MIN_RMS, self.noise_rms * VAD_NOISE_RATIO)
+        if not speech:
+            self.noise_rms += NOISE_SMOOTHING * (rms - self.noise_rms)
+        return speech
+
+    def _reseed_noise(self):
+        """Restarts the noise floor from the quietest recent chunk."""
+        if self._levels:
+            self.noise_rms = min(self._levels)
+
+    def _recognize(self):
+        pre_roll: Deque[bytes] = deque(maxlen=PRE_ROLL_CHUNKS)
+        recognizer = None
+        mode = self._mode
+        silent_chunks = 0
+        speech_chunks = 0
+        max_chunks = int(MAX_UTTERANCE_SEC * 1000 / CHUNK_MS)
+
+        while self._running.is_set():
+            try:
+                data = self._ring.get(timeout=0.5)
+            except TimeoutError:
+                continue
+            except PipelineClosed:
+                break
+
+            speech = self._is_speech(data)
+
+            if recognizer is None:
+                if not speech:
+                    pre_roll.append(data)
+                    continue
+                # Onset: the mode is fixed for the whole utterance
+                mode = self._mode
+                recognizer = self.recognizer if mode == "destination" else self.command_recognizer
+                self.speaking = True
+                silent_chunks = 0
+                speech_chunks = 0
+                for chunk in pre_roll:
+                    recognizer.AcceptWaveform(chunk)
+                pre_roll.clear()
+
+            silent_chunks = 0 if speech else silent_chunks + 1
+            speech_chunks += 1
+
+            if recognizer.AcceptWaveform(data):
+                self._handle_final(json.loads(recognizer.Result()), mode)
+            else:
+                partial = json.loads(recognizer.PartialResult()).get("partial", "")
+                if partial and partial != self.partial:
+                    self.partial = partial
+                    self._publish(VoiceEvent("partial", partial, mode, time.monotonic()))
+
+            too_long = speech_chunks >= max_chunks
+            if silent_chunks > HANGOVER_CHUNKS or too_long:
+                # End of utterance: flush Kaldi and go back to idle
+                self._handle_final(json.loads(recognizer.FinalResult()), mode)
+                recognizer = None
+                self.speaking = False
+                if too_long:
+                    # Most likely noise the floor has not caught up with
+                    self._reseed_noise()
+
+    def _handle_final(self, result: dict, mode: str):
+        text = result.get("text", "").replace("[unk]", "").strip()
+        self.partial = ""
+        if not text:
+            return
+
+        now = time.monotonic()
+        self._publish(VoiceEvent("final", text, mode, now))
+
+        if mode == "destination":
+            self._destinations.put(text)
+            return
+
+        command = COMMANDS.get(text)
+        if command is not None:
+            event = VoiceEvent("command", command, mode, now)
+            if self._commands.full():
+                try:
+                    self._commands.get_nowait()
+                except queue.Empty:
+                    pass
+            self._commands.put_nowait(event)
+            self._publish(event)
+
+    def _publish(self, event: VoiceEvent):
+        with self._sub_lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception:
+                continue
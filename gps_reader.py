@@ -1,55 +1,256 @@
 import serial
 import pynmea2
+import threading
 import time
+from typing import Callable, List, NamedTuple, Optional
+
+from utils.metrics import METRICS
+
+# A fix older than this is treated as lost (seconds)
+FIX_MAX_AGE_SEC = 3.0
+
+GPS_PORT = "/dev/ttyUSB0"
+GPS_BAUD = 9600
+
+
+def open_serial(port=GPS_PORT, baud=GPS_BAUD):
+    """The receiver's serial port, or None if it cannot be opened."""
+    try:
+        return serial.Serial(port, baud, timeout=1)
+    except Exception:
+        return None
+
+
+class GPSFix(NamedTuple):
+    lat: float
+    lon: float
+    speed_knots: float
+    course_deg: float
+    hdop: float | None
+    timestamp: float  # time.monotonic() when the fix was received
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.timestamp
 
 
 class GPSReader:
-    def __init__(self, port="/dev/ttyUSB0", baud=9600):
-        try:
-            self.ser = serial.Serial(port, baud, timeout=1)
-        except Exception:
-            self.ser = None
+    """
+    Reads the receiver's NMEA stream on a background thread and keeps the
+    latest fix, so callers never block on serial I/O.
+
+    Any talker is accepted ($GP, $GN, $GL, $GA, ...): GGA supplies position,
+    fix quality and HDOP, RMC supplies speed and course. Sentences with
+    the same UTC time are merged into one fix, published once every
+    sentence type the receiver sends has arrived for that epoch.
+
+    `ser` replaces the serial port with any object offering read(n),
+    in_waiting and close() (see sensors.gps for recording and replay);
+    port=None without `ser` means no receiver (feed_line() only).
+    """
 
-    def get_current_position(self, timeout: float = 2.0):
+    def __init__(self, port=GPS_PORT, baud=GPS_BAUD, max_fix_age: float = FIX_MAX_AGE_SEC, ser=None):
+        self.ser = ser
+        if self.ser is None and port is not None:
+            self.ser = open_serial(port, baud)
+
+        self.max_fix_age = max_fix_age
+
+        # Replaced as a whole on every update, so readers always see a
+        # consistent snapshot without taking a lock
+        self._latest: Optional[GPSFix] = None
+        self._speed = 0.0
+        self._course = 0.0
+        self._hdop: float | None = None
+        # Last fix already counted as timed out
+        self._expired: Optional[GPSFix] = None
+
+        # Epoch being merged: UTC time, sentence types seen, all valid
+        self._epoch = None
+        self._epoch_sentences: set = set()
+        self._epoch_valid = True
+        self._epoch_published = False
+        # Sentence types this receiver sends each epoch
+        self._sentence_types: set = set()
+        self._lat = self._lon = 0.0
+
+        self._subscribers: List[Callable[[GPSFix], None]] = []
+        self._sub_lock = threading.Lock()
+        self._fix_event = threading.Event()
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        if self.ser is not None:
+            self._running.set()
+            self._thread = threading.Thread(target=self._run, name="gps-reader", daemon=True)
+            self._thread.start()
+
+    # --- public API ---------------------------------------------------------
+
+    def get_current_position(self, timeout: float = 0.0):
         """
         Returns:
             (lat, lon, speed_knots, course_deg)
-            OR None if no GPS fix or timeout
+            OR None if there is no recent fix
+
+        Returns immediately from the cached fix. `timeout` only applies
+        before the first fix arrives (e.g. at startup).
         """
+        fix = self.latest_fix(timeout)
+        if fix is None:
+            return None
+        return fix.lat, fix.lon, fix.speed_knots, fix.course_deg
+
+    def latest_fix(self, timeout: float = 0.0) -> Optional[GPSFix]:
+        if self._latest is None and timeout > 0 and self.ser is not None:
+            self._fix_event.wait(timeout)
 
-        if self.ser is None:
+        fix = self._latest
+        if fix is None:
             return None
+        if fix.age > self.max_fix_age:
+            # Counted once per lost fix, however often it is asked for
+            if fix is not self._expired:
+                self._expired = fix
+                METRICS.counter("gps_timeouts").inc()
+            return None
+        return fix
+
+    def subscribe(self, callback: Callable[[GPSFix], None]) -> Callable[[], None]:
+        """
+        Calls `callback(fix)` on the reader thread for every new fix.
+        Returns a function that removes the subscription.
+        """
+        with self._sub_lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._sub_lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
 
-        start = time.time()
-        lat = lon = speed = course = None
+        return unsubscribe
 
-        while time.time() - start < timeout:
+    def close(self):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        try:
+            if self.ser is not None:
+                self.ser.close()
+        except Exception:
+            pass
+
+    # --- reader thread ------------------------------------------------------
+
+    def _run(self):
+        buffer = b""
+        while self._running.is_set():
             try:
-                line = self.ser.readline().decode("ascii", errors="replace").strip()
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+            except Exception:
+                time.sleep(0.5)
+                continue
+
+            if not chunk:
+                continue
+
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for raw in lines:
+                self.feed_line(raw.decode("ascii", errors="replace").strip())
+
+            # A receiver spewing garbage without newlines must not grow this
+            if len(buffer) > 1024:
+                buffer = b""
+
+    def feed_line(self, line: str):
+        """
+        Parses one NMEA sentence and updates the cached fix.
+        Public so recorded NMEA logs can be replayed without a serial port.
+        """
+        if len(line) < 7 or line[0] != "$":
+            return
 
-                # Parse GPGGA for coordinates + fix
-                if line.startswith("$GPGGA"):
-                    msg = pynmea2.parse(line)
+        sentence = line[3:6]
+        if sentence not in ("GGA", "RMC"):
+            return
 
-                    # If GPS has no fix, skip
-                    if msg.gps_qual == 0:  # 0 = invalid fix
-                        continue
+        try:
+            with METRICS.timer("gps_parse"):
+                msg = pynmea2.parse(line)
+        except Exception:
+            METRICS.counter("gps_bad_sentences").inc()
+            return
 
-                    lat = msg.latitude
-                    lon = msg.longitude
+        if sentence == "GGA":
+            # 0 = invalid fix
+            valid = bool(msg.gps_qual)
+            if valid:
+                try:
+                    self._hdop = float(msg.horizontal_dil)
+                except (TypeError, ValueError):
+                    self._hdop = None
+        else:
+            # 'A' = valid, 'V' = receiver warning
+            valid = getattr(msg, "status", "A") == "A"
+            if valid:
+                self._speed = getattr(msg, "spd_over_ground", 0) or 0
+                self._course = getattr(msg, "true_course", 0) or 0
 
-                # Parse GPRMC for speed + heading
-                elif line.startswith("$GPRMC"):
-                    msg = pynmea2.parse(line)
-                    speed = getattr(msg, "spd_over_ground", 0) or 0
-                    course = getattr(msg, "true_course", 0) or 0
+        self._merge(sentence, getattr(msg, "timestamp", None), valid, msg)
+
+    def _merge(self, sentence: str, epoch, valid: bool, msg):
+        """
+        Collects the sentences of one epoch; publishes a single fix once
+        all sentence types seen so far have arrived, if none was invalid.
+        Sentences without a time are published on their own.
+        """
+        if epoch is None:
+            if valid:
+                self._publish(msg.latitude, msg.longitude)
+            return
 
-                # If we got at least valid lat/lon, return
-                if lat is not None and lon is not None:
-                    return lat, lon, speed or 0, course or 0
+        if epoch != self._epoch:
+            if self._epoch_sentences and not self._epoch_published and self._epoch_valid:
+                # The receiver stopped sending a sentence type
+                self._sentence_types = set(self._epoch_sentences)
+            self._epoch = epoch
+            self._epoch_sentences = set()
+            self._epoch_valid = True
+            self._epoch_published = False
 
+        self._sentence_types.add(sentence)
+        self._epoch_sentences.add(sentence)
+        self._epoch_valid = self._epoch_valid and valid
+        if valid:
+            self._lat, self._lon = msg.latitude, msg.longitude
+
+        if (
+            self._epoch_valid
+            and not self._epoch_published
+            and self._epoch_sentences >= self._sentence_types
+        ):
+            self._epoch_published = True
+            self._publish(self._lat, self._lon)
+
+    def _publish(self, lat: float, lon: float):
+        fix = GPSFix(
+            lat=lat,
+            lon=lon,
+            speed_knots=float(self._speed),
+            course_deg=float(self._course),
+            hdop=self._hdop,
+            timestamp=time.monotonic(),
+        )
+        self._latest = fix
+        self._fix_event.set()
+        METRICS.counter("gps_fixes").inc()
+
+        with self._sub_lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(fix)
             except Exception:
                 continue
-
-        # Timeout → no fix
-        return None
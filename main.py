@@ -1,60 +1,286 @@
-import threading
+import argparse
+import asyncio
 import signal
 import sys
+import threading
 import time
+from typing import TYPE_CHECKING, Optional
 
-from picamera2 import Picamera2
+import numpy as np
 
-from object_detection.yolo_detector import YOLODetector
-from distance_estimation.distance_estimator import DistanceEstimator
-from feedback.haptic_feedback import HapticFeedback
-from feedback.voice_feedback import VoiceFeedback
-from feedback.voice_input import VoiceInput
+# Imported before the other project modules: boot milestones are measured
+# from here (after interpreter start-up and numpy)
+from utils.startup import StagedLoader, milestone
+from feedback.haptic_feedback import HapticFeedback, level_hold
 from navigation.route_planner import RoutePlanner
-from gps_reader import GPSReader
+from navigation.position_filter import PositionFilter
+from navigation.gazetteer import PLACES_PATH, Gazetteer
+from gps_reader import GPSReader, open_serial
 from utils.helpers import log
+from utils.metrics import METRICS, MetricsServer
+from utils.pipeline import FramePacket, StagedPipeline
+from utils.adaptive_scheduler import AdaptiveScheduler
+from utils.inference_workers import WorkerUnavailable
+from utils.event_bus import (
+    EventBus,
+    FrameProcessed,
+    GPSFixEvent,
+    ObstacleAlert,
+    VoiceCommand,
+    cancel_tasks,
+    supervise,
+)
+
+# torch, ultralytics, depth_pro, cv2, vosk and pyttsx3 are only imported
+# by the loader threads, so the process reaches its first cue quickly
+if TYPE_CHECKING:
+    from feedback.voice_input import VoiceInput
+    from sensors.camera import FrameSource
+
+# How often per-stage timings and event counts are logged (seconds)
+PIPELINE_STATS_INTERVAL = 10.0
+
+# Spatial haptics: continuous left/center/right intensity from every
+# tracked obstacle instead of one-shot center pulses
+SPATIAL_HAPTICS = True
+
+# Run YOLO and Depth Pro in their own processes, pinned to their own
+# cores (utils/inference_workers.py); frames go through shared memory
+PROCESS_WORKERS = False
+
+# Time left for the shutdown message to play before exiting (seconds)
+SHUTDOWN_SPEECH_SEC = 1.5
+
+# Replays: how often the end of the recording is checked for, and how
+# long the last frames get to drain through the pipeline (seconds)
+REPLAY_POLL_SEC = 0.5
+REPLAY_DRAIN_SEC = 1.0
+
+# Fixed phrases rendered ahead of time so they play without TTS latency
+ALERT_PHRASES = (
+    "Obstacle ahead, stop!",
+    "Obstacle nearby.",
+    "Off route. Recalculating.",
+    "Navigation stopped.",
+    "No active route.",
+    "GPS position not available.",
+    "Obstacle detection unavailable.",
+    "Shutting down.",
+)
+
+
+def load_gazetteer():
+    """Offline place names, if a places.json has been built."""
+    return Gazetteer.load() if PLACES_PATH.exists() else None
+
+
+def destination_grammar(gazetteer):
+    return gazetteer.vosk_grammar() if gazetteer else None
+
+
+# --- component factories (run on the loader's threads) ------------------------
+
+
+def default_camera():
+    from sensors.camera import PicameraSource
+
+    # Lower resolution → faster inference.
+    return PicameraSource(320, 240)
+
+
+def voice_input_factory(gazetteer, **kwargs):
+    def load():
+        from feedback.voice_input import VoiceInput
+
+        return VoiceInput(grammar=destination_grammar(gazetteer), **kwargs)
+
+    return load
+
+
+def load_voice_feedback():
+    from feedback.voice_feedback import VoiceFeedback
+
+    return VoiceFeedback()
+
+
+def load_yolo():
+    from object_detection.yolo_detector import YOLODetector
+
+    return YOLODetector()
+
+
+def load_depth():
+    from distance_estimation.distance_estimator import DistanceEstimator
+
+    return DistanceEstimator()
+
+
+def start_yolo_worker(frames):
+    from utils.inference_workers import RemoteDetector
+
+    return RemoteDetector(frames)
+
+
+def start_depth_worker(frames):
+    from utils.inference_workers import RemoteDistanceEstimator
+
+    return RemoteDistanceEstimator(frames)
 
 
 class BlindNavigationSystem:
-    def __init__(self):
-        # --- Camera setup (Picamera2) ---
-        self.camera = Picamera2()
-        # Lower resolution → faster inference
-        config = self.camera.create_preview_configuration(main={"size": (320, 240)})
-        self.camera.configure(config)
-        self.camera.start()
+    """
+    Wires sensors, models and feedback together.
+
+    Every device can be injected (see make_devices), so the same system
+    runs on the Pi, records a walk, or replays one on a desktop.
+
+    Boot is staged: TTS, Vosk, the camera and both vision models load
+    concurrently on a StagedLoader. The destination dialogue starts as
+    soon as speech is ready, and the obstacle pipeline as soon as the
+    camera and models are (see start_vision), whichever comes first.
+    """
+
+    def __init__(
+        self,
+        camera: "FrameSource" = None,
+        gps: GPSReader = None,
+        voice_input=None,
+        haptic: HapticFeedback = None,
+        metrics_socket: str = None,
+        process_workers: bool = PROCESS_WORKERS,
+        stop_at_source_end: bool = False,
+    ):
+        """
+        voice_input: a VoiceInput, or a zero-argument factory for one
+        (loaded in the background like the default).
+        stop_at_source_end: shut down once the camera runs out of frames
+        (replays).
+        """
+        # Offline place names: resolve spoken destinations and constrain Vosk
+        self.gazetteer = load_gazetteer()
+
+        # --- Slow components, loaded concurrently ---
+        # The camera first: the model warm-ups need its frame size
+        self.loader = StagedLoader()
+        self.loader.submit("camera", (lambda: camera) if camera is not None else default_camera)
+        self.loader.submit("voice", load_voice_feedback)
+        if voice_input is None:
+            voice_input = voice_input_factory(self.gazetteer)
+        self.loader.submit("voice_input", voice_input if callable(voice_input) else (lambda: voice_input))
+        self.process_workers = process_workers
+        self.frames = None
+        self._frames_lock = threading.Lock()
+        if process_workers:
+            # Worker processes warm up themselves before reporting ready
+            self.loader.submit("yolo", lambda: start_yolo_worker(self._frame_ring()))
+            self.loader.submit("depth", lambda: start_depth_worker(self._frame_ring()))
+        else:
+            self.loader.submit("yolo", load_yolo, warmup=lambda yolo: yolo.warmup(self._warmup_frame()))
+            self.loader.submit("depth", load_depth, warmup=lambda depth: depth.warmup(self._warmup_frame()))
+
+        # Set as their loads complete
+        self.camera: "FrameSource" = None
+        self.yolo = None
+        self.depth = None
+        self.tracker = None
+        self.voice = None
+        self.voice_input: "VoiceInput" = None
 
         # --- Core modules ---
-        self.yolo = YOLODetector()
-        self.depth = DistanceEstimator()
-        self.haptic = HapticFeedback()
-        self.voice = VoiceFeedback()
-        self.voice_input = VoiceInput()
-        self.gps = GPSReader()
+        self.haptic = haptic or HapticFeedback()
+        self.gps = gps or GPSReader()
+        # Smoothed, dead-reckoned position for turn checks between fixes
+        self.position_filter = PositionFilter()
+        self.gps.subscribe(self.position_filter.update)
         self.route_planner = None
 
-        self.running = True
+        # Frame rate / resolution / detector cadence from speed, scene, thermals
+        self.scheduler = AdaptiveScheduler()
+        self.vision_plan = self.scheduler.vision_plan()
+        self._next_capture = 0.0
+        self.gps.subscribe(lambda fix: self.scheduler.update_speed(fix.speed_knots))
+
         self.current_step = None
 
-        # Graceful Ctrl+C
-        signal.signal(signal.SIGINT, self.shutdown)
+        # Created on the event loop in main()
+        self.bus: EventBus = None
+        self._stop: asyncio.Event = None
+        self.exit_code = 0
+        self.stop_at_source_end = stop_at_source_end
+        self._unsubscribe = []
+        self._protected = False
+
+        # Prometheus text on 127.0.0.1:9108/metrics (and optionally a Unix socket)
+        self.metrics_socket = metrics_socket
+        self.metrics_server: MetricsServer = None
+
+        # capture → detect → depth → decision, one worker per stage; results
+        # go onto the event bus
+        self.pipeline = StagedPipeline(
+            source=self._capture_frame,
+            stages=[
+                ("detect", self._detect_stage),
+                ("depth", self._depth_stage),
+                ("decision", self._decision_stage),
+            ],
+            sink=lambda packet: self.bus.publish_threadsafe(FrameProcessed(packet)),
+            # Frame slots are reused only after their packet is done
+            release=lambda packet: self.frames.release(packet.frame),
+            # Prediction-only packets (detector skipped) never push a real
+            # detection out of the queue in front of a busy depth stage
+            low_priority=lambda packet: packet.detections is None,
+        )
+
+    def _frame_ring(self):
+        """
+        Preallocated frames shared by YOLO and depth, created once the
+        camera size is known; in shared memory for worker processes.
+        """
+        from utils.frame_buffer import FrameRing, SharedFrameRing
+
+        with self._frames_lock:
+            if self.frames is None:
+                camera = self.loader.result("camera")
+                ring = SharedFrameRing if self.process_workers else FrameRing
+                # Worker processes preprocess their own view of each slot
+                self.frames = ring(camera.height, camera.width, preprocess=not self.process_workers)
+            return self.frames
+
+    def _warmup_frame(self):
+        """A black frame in the camera's size, preprocessed like a real one."""
+        from utils.frame_buffer import FrameRing
 
-    def startup(self):
+        camera = self.loader.result("camera")
+        ring = FrameRing(camera.height, camera.width, size=1)
+        return ring.write(np.zeros((camera.height, camera.width, 3), dtype=np.uint8))
+
+    async def startup(self) -> bool:
+        """
+        Asks for a destination and plans the route.
+        Returns False if the system cannot navigate.
+        """
         log("Initializing system...")
+        self.voice = await self.loader.wait("voice")
+        self.voice.speak("System starting.", priority="normal", allow_repeat=True)
+        # Rendered behind the cue (pre-rendering has the lowest priority)
+        self.voice.precache(ALERT_PHRASES)
+
+        self.voice_input = await self.loader.wait("voice_input")
         self.voice.speak(
-            "System starting. Where do you want to go?",
+            "Where do you want to go?",
             priority="normal",
             allow_repeat=True,
         )
+        milestone("first_prompt")
 
-        destination = self.voice_input.listen_for_destination()
+        destination = await asyncio.to_thread(self.voice_input.listen_for_destination)
         if not destination:
             self.voice.speak(
                 "No destination heard. Exiting.",
                 priority="normal",
                 allow_repeat=True,
             )
-            sys.exit(1)
+            return False
 
         self.voice.speak(
             f"Navigating to {destination}",
@@ -62,7 +288,8 @@ class BlindNavigationSystem:
             allow_repeat=True,
         )
 
-        current_pos = self.gps.get_current_position()
+        # The reader thread may not have a fix yet right after boot
+        current_pos = await asyncio.to_thread(self.gps.get_current_position, 2.0)
         if not current_pos:
             self.voice.speak(
                 "GPS not available. Exiting.",
@@ -70,121 +297,482 @@ class BlindNavigationSystem:
                 interrupt=True,
                 allow_repeat=True,
             )
-            sys.exit(1)
+            return False
 
-        self.route_planner = RoutePlanner()
-        self.route_planner.plan_route(current_pos, destination)
+        self.route_planner = RoutePlanner(
+            geocoder=self.gazetteer.resolve if self.gazetteer else None
+        )
+        route = await asyncio.to_thread(self.route_planner.plan_route, current_pos, destination)
+        if route is None:
+            self.voice.speak(
+                "Could not find a route. Exiting.",
+                priority="high",
+                interrupt=True,
+                allow_repeat=True,
+            )
+            return False
+        self.voice.precache(step.instruction for step in route.steps)
         self.current_step = self.route_planner.get_next_instruction(current_pos)
 
         log("Startup complete.")
+        return True
 
-    def vision_loop(self):
+    async def start_vision(self):
         """
-        Continuous camera monitoring for obstacle detection.
-        Center motor vibrates for any obstacle.
+        Starts the obstacle pipeline once the camera and both models are
+        loaded and warmed up, without waiting for the destination
+        dialogue. Stops the system if vision cannot start.
         """
-        while self.running:
-            frame = self.camera.capture_array()  # NumPy array (H, W, 3)
-
-            # YOLO detections
-            detections = self.yolo.detect(frame)
+        try:
+            self.voice = await self.loader.wait("voice")
+            self.camera = await self.loader.wait("camera")
+            self.yolo = await self.loader.wait("yolo")
+            self.depth = await self.loader.wait("depth")
+        except Exception as e:
+            log(f"Obstacle detection failed to start: {e}")
+            if self.voice is not None:
+                self.voice.speak(
+                    "Obstacle detection unavailable.",
+                    priority="high",
+                    interrupt=True,
+                    allow_repeat=True,
+                )
+            self.exit_code = 1
+            self._stop.set()
+            return
+
+        # Cheap once the detector module is loaded
+        from tracking.object_tracker import ObjectTracker
+
+        self._frame_ring()
+        self.tracker = ObjectTracker()
+        self.pipeline.start()
+        milestone("vision_ready")
+
+    # --- vision pipeline (worker threads) -------------------------------------
+
+    def _capture_frame(self) -> Optional[FramePacket]:
+        self.vision_plan = self.scheduler.vision_plan()
+        delay = self._next_capture - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_capture = time.perf_counter() + self.vision_plan.frame_interval
+
+        frame = self.camera.capture(self.frames)
+        if frame is None:
+            # Every slot still held by a slower stage
+            METRICS.counter("frames_dropped", stage="capture").inc()
+            return None
+        return FramePacket(
+            frame_id=frame.frame_id,
+            frame=frame,
+            captured_at=time.perf_counter(),
+        )
 
-            # Depth estimation for each detection
-            obstacle_info = self.depth.estimate_distance(frame, detections)
+    def _detect_stage(self, packet: FramePacket) -> FramePacket:
+        # Skipped frames are covered by tracker prediction; never skip while
+        # something is inside the alert envelope
+        plan = self.vision_plan
+        if packet.frame_id % plan.detect_every and not self.tracker.needs_detection():
+            packet.detections = None
+            return packet
 
-            if obstacle_info:
-                # Pick the closest object
-                closest = min(obstacle_info, key=lambda x: x[1])
-                det, dist, is_obstacle = closest
+        try:
+            packet.detections = self.yolo.detect(packet.frame, scale=plan.resolution_scale)
+        except WorkerUnavailable:
+            # Worker process restarting: bridge with tracker prediction
+            packet.detections = None
+        return packet
+
+    def _depth_stage(self, packet: FramePacket) -> FramePacket:
+        if packet.detections is not None:
+            try:
+                # Throttled CPU: class-size geometry instead of the depth model
+                packet.obstacle_info = self.depth.estimate_distance(
+                    packet.frame,
+                    packet.detections,
+                    prefer_geometry=self.vision_plan.reason == "throttled",
+                )
+            except WorkerUnavailable:
+                packet.detections = None
+        return packet
+
+    def _decision_stage(self, packet: FramePacket) -> FramePacket:
+        """
+        Updates the tracker; feedback happens in obstacle_task.
+        """
+        if packet.detections is None:
+            packet.tracks = self.tracker.predict(packet.captured_at)
+        else:
+            packet.tracks = self.tracker.update(packet.obstacle_info, packet.captured_at)
 
-                if is_obstacle:
-                    # Only center vibrates for any obstacle
-                    if dist < 0.7:
-                        self.haptic.vibrate_center("strong")
-                        self.voice.speak(
-                            "Obstacle ahead, stop!",
-                            priority="high",
-                            interrupt=True,
-                            allow_repeat=False,
-                        )
-                    elif dist < 1.5:
-                        self.haptic.vibrate_center("short")
-                        self.voice.speak(
-                            "Obstacle nearby.",
-                            priority="normal",
-                            interrupt=False,
-                            allow_repeat=False,
-                        )
+        hazard = any(track.alert_level() is not None for track in packet.tracks)
+        self.scheduler.update_scene(len(packet.tracks), hazard=hazard)
+        return packet
 
-            # ~10 FPS
-            time.sleep(0.1)
+    # --- event-loop tasks -----------------------------------------------------
 
-    def navigation_loop(self):
+    async def obstacle_task(self):
         """
-        Periodically checks GPS and route; gives turn-by-turn instructions.
+        Turns processed frames into haptic levels and typed alerts.
+        In spatial mode every track drives the motor of its third of the
+        view; otherwise the center motor pulses for any obstacle.
         """
-        while self.running:
-            pos = self.gps.get_current_position()
+        last_captured = None
+        with self.bus.subscribe(FrameProcessed, maxsize=1) as frames:
+            async for event in frames:
+                if not self._protected:
+                    self._protected = True
+                    milestone("first_protected_frame")
+
+                # Levels must outlast the gap to the next decision, planned or
+                # observed, or the motors flicker when vision runs slowly
+                interval = self.vision_plan.frame_interval
+                if last_captured is not None:
+                    interval = max(interval, event.packet.captured_at - last_captured)
+                last_captured = event.packet.captured_at
+
+                # Tracks only coasting on prediction no longer drive feedback
+                tracks = [track for track in event.packet.tracks if not track.stale]
+
+                if SPATIAL_HAPTICS:
+                    bboxes = [track.bbox for track in tracks]
+                    distances = [track.distance for track in tracks]
+                    self.haptic.set_spatial(
+                        bboxes, distances, event.packet.frame.shape[1], hold=level_hold(interval)
+                    )
 
-            if pos and self.current_step:
-                if self.route_planner.is_approaching_turn(pos, self.current_step):
-                    instr = self.current_step.instruction
+                for level in ("stop", "warn"):
+                    ids = tuple(track.track_id for track in tracks if track.alert_level() == level)
+                    if ids:
+                        await self.bus.publish(ObstacleAlert(level, ids))
+                        break
+
+    async def alert_task(self):
+        with self.bus.subscribe(ObstacleAlert, maxsize=4, policy="block") as alerts:
+            async for alert in alerts:
+                if alert.level == "stop":
+                    self.haptic.vibrate_center("strong")
+                    self.voice.speak(
+                        "Obstacle ahead, stop!",
+                        priority="high",
+                        interrupt=True,
+                        allow_repeat=False,
+                    )
+                else:
+                    if not SPATIAL_HAPTICS:
+                        self.haptic.vibrate_center("short")
                     self.voice.speak(
-                        instr,
+                        "Obstacle nearby.",
                         priority="normal",
                         interrupt=False,
-                        allow_repeat=True,
+                        allow_repeat=False,
                     )
 
-                    # Optional: use left/right haptics for turns
-                    text = instr.lower()
-                    if "left" in text:
-                        self.haptic.vibrate_left("short")
-                    elif "right" in text:
-                        self.haptic.vibrate_right("short")
-
-                self.current_step = self.route_planner.get_next_instruction(pos)
-
-            time.sleep(1.0)
-
-    def run(self):
-        self.startup()
+    async def navigation_task(self):
+        """
+        Gives turn-by-turn instructions. Runs on every GPS fix and, between
+        fixes, on the scheduler's interval from the dead-reckoned position.
+        """
+        with self.bus.subscribe(GPSFixEvent, maxsize=1) as fixes:
+            while True:
+                await fixes.get(timeout=self.scheduler.navigation_interval())
+                pos = self.position_filter.position()
+                if pos and self.current_step:
+                    await self._navigation_tick(pos)
+
+    async def _navigation_tick(self, pos):
+        if self.route_planner.is_approaching_turn(pos, self.current_step):
+            instr = self.current_step.instruction
+            self.voice.speak(
+                instr,
+                priority="normal",
+                interrupt=False,
+                allow_repeat=True,
+            )
 
-        vision_thread = threading.Thread(target=self.vision_loop, daemon=True)
-        nav_thread = threading.Thread(target=self.navigation_loop, daemon=True)
+            # Optional: use left/right haptics for turns
+            text = instr.lower()
+            if "left" in text:
+                self.haptic.vibrate_left("short")
+            elif "right" in text:
+                self.haptic.vibrate_right("short")
 
-        vision_thread.start()
-        nav_thread.start()
+        self.current_step = self.route_planner.get_next_instruction(pos)
 
-        vision_thread.join()
-        nav_thread.join()
+        if self.route_planner.is_off_route():
+            self.voice.speak(
+                "Off route. Recalculating.",
+                priority="high",
+                interrupt=False,
+                allow_repeat=False,
+            )
+            # May fall back to the routing server
+            route = await asyncio.to_thread(self.route_planner.reroute, pos)
+            if route is not None:
+                self.voice.precache(step.instruction for step in route.steps)
+                self.current_step = self.route_planner.get_next_instruction(pos)
+                # The new route's first step, announced once
+                if self.current_step and self.route_planner.is_approaching_turn(pos, self.current_step):
+                    self.voice.speak(
+                        self.current_step.instruction,
+                        priority="normal",
+                        interrupt=False,
+                        allow_repeat=True,
+                    )
 
-    def shutdown(self, signum, frame):
-        self.running = False
+    async def command_task(self):
+        """
+        Handles voice commands recognized while navigating.
+        """
+        with self.bus.subscribe(VoiceCommand, maxsize=4, policy="block") as commands:
+            async for event in commands:
+                if event.command == "repeat":
+                    text = self.current_step.instruction if self.current_step else "No active route."
+                    self.voice.speak(text, priority="normal", interrupt=True, allow_repeat=True)
+
+                elif event.command == "where_am_i":
+                    self.voice.speak(self._describe_position(), priority="normal", interrupt=True, allow_repeat=True)
+
+                elif event.command == "stop_navigation":
+                    # Obstacle detection keeps running; only guidance stops
+                    self.current_step = None
+                    self.voice.speak("Navigation stopped.", priority="normal", interrupt=True, allow_repeat=True)
+
+    def _describe_position(self) -> str:
+        pos = self.position_filter.position()
+        if pos is None:
+            return "GPS position not available."
+
+        step = self.current_step
+        if step is None:
+            return "No active route."
+
+        parts = []
+        if step.street_name:
+            parts.append(f"Heading for {step.street_name}.")
+        remaining = self.route_planner.distance_to_step(pos, step)
+        if remaining is not None:
+            parts.append(f"{step.instruction} in {max(0, round(remaining))} meters.")
+        return " ".join(parts) or step.instruction
+
+    async def replay_task(self):
+        """Stops the system once a finite camera source (a replay) ends."""
+        while not self.pipeline.source_finished.is_set():
+            await asyncio.sleep(REPLAY_POLL_SEC)
+        await asyncio.sleep(REPLAY_DRAIN_SEC)
+        log("Replay finished")
+        self._stop.set()
+
+    async def stats_task(self):
+        while True:
+            await asyncio.sleep(PIPELINE_STATS_INTERVAL)
+            log(self.pipeline.summary())
+            log(self.bus.summary())
+            log(METRICS.summary())
+
+    # --- lifecycle ------------------------------------------------------------
+
+    def _connect_sources(self):
+        """Publishes GPS fixes and voice commands from their threads onto the bus."""
+        self._unsubscribe.append(
+            self.gps.subscribe(lambda fix: self.bus.publish_threadsafe(GPSFixEvent(fix)))
+        )
 
-        # Stop camera
-        self.camera.stop()
+        def on_voice(event):
+            if event.kind == "command":
+                self.bus.publish_threadsafe(VoiceCommand(event.text, event.timestamp))
+
+        self._unsubscribe.append(self.voice_input.subscribe(on_voice))
+
+    async def main(self) -> int:
+        self.bus = EventBus()
+        self.metrics_server = MetricsServer(unix_path=self.metrics_socket)
+        self._stop = asyncio.Event()
+
+        # Signals only set an event; shutdown runs on the loop, not in the handler
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stop.set)
+
+        # Obstacle feedback runs from the first processed frame, also
+        # during the destination dialogue
+        vision = asyncio.create_task(self.start_vision(), name="vision")
+        vision.add_done_callback(self._vision_done)
+        protection = [
+            asyncio.create_task(self.obstacle_task(), name="obstacles"),
+            asyncio.create_task(self.alert_task(), name="alerts"),
+        ]
+        watchers = []
+        if self.stop_at_source_end:
+            watchers.append(asyncio.create_task(self.replay_task(), name="replay"))
+
+        startup = asyncio.create_task(self.startup(), name="startup")
+        stopper = asyncio.create_task(self._stop.wait(), name="stop")
+        await asyncio.wait([startup, stopper] + protection, return_when=asyncio.FIRST_COMPLETED)
+        if self._safety_failed(protection) or self._stop.is_set() or not self._started(startup):
+            await cancel_tasks([startup, stopper, vision] + protection + watchers)
+            await self.shutdown()
+            return self.exit_code if self._stop.is_set() else 1
+
+        self._connect_sources()
+
+        # Guidance, commands and stats are restarted when they crash
+        tasks = [
+            asyncio.create_task(supervise("navigation", self.navigation_task), name="navigation"),
+            asyncio.create_task(supervise("commands", self.command_task), name="commands"),
+            asyncio.create_task(supervise("stats", self.stats_task), name="stats"),
+        ]
+
+        # Run until a signal arrives or obstacle feedback dies
+        await asyncio.wait(protection + [stopper], return_when=asyncio.FIRST_COMPLETED)
+        self._safety_failed(protection)
+        await cancel_tasks(protection + tasks + watchers + [stopper, vision])
+        await self.shutdown()
+        return self.exit_code
+
+    def _safety_failed(self, protection) -> bool:
+        """True (and a failing exit code) if an obstacle feedback task ended."""
+        ended = [task for task in protection if task.done()]
+        for task in ended:
+            error = None if task.cancelled() else task.exception()
+            log(f"Safety task {task.get_name()} ended ({error!r}); shutting down")
+        if ended:
+            self.exit_code = 1
+        return bool(ended)
+
+    def _vision_done(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is None:
+            return
+        log(f"Obstacle detection failed to start: {task.exception()!r}")
+        self.exit_code = 1
+        self._stop.set()
+
+    @staticmethod
+    def _started(startup: asyncio.Task) -> bool:
+        try:
+            return startup.result()
+        except Exception as e:
+            log(f"Startup failed: {e}")
+            return False
+
+    async def shutdown(self):
+        log("Shutting down...")
+
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self.bus.close()
+        # Loads still queued are dropped; components that did load are
+        # closed below, ones that finish later by _close_late
+        await asyncio.to_thread(self.loader.close, self._close_late)
+
+        # Stop vision workers before the camera goes away
+        await asyncio.to_thread(self.pipeline.stop)
+        camera = self.loader.loaded("camera")
+        if camera is not None:
+            camera.stop()
+        if self.process_workers:
+            for name in ("yolo", "depth"):
+                worker = self.loader.loaded(name)
+                if worker is not None:
+                    await asyncio.to_thread(worker.close)
+            if self.frames is not None:
+                self.frames.close()
 
         # Stop motors
-        self.haptic.stop_all()
+        self.haptic.close()
 
-        # 🔥 Close microphone audio stream (VERY IMPORTANT)
-        try:
-            self.voice_input.close()
-        except Exception:
-            pass  # ignore errors safely
+        await asyncio.to_thread(self.gps.close)
+        voice_input = self.loader.loaded("voice_input")
+        if voice_input is not None:
+            await asyncio.to_thread(voice_input.close)
 
         # Speak shutdown message
-        self.voice.speak(
-            "Shutting down.",
-            priority="low",
-            interrupt=False,
-            allow_repeat=True,
+        voice = self.loader.loaded("voice")
+        if voice is not None:
+            voice.speak(
+                "Shutting down.",
+                priority="low",
+                interrupt=True,
+                allow_repeat=True,
+            )
+            await asyncio.sleep(SHUTDOWN_SPEECH_SEC)
+            voice.close()
+
+        log(METRICS.summary())
+        self.metrics_server.close()
+
+    def _close_late(self, name: str, component):
+        """Closes a component whose load only finished after shutdown."""
+        if name == "camera":
+            component.stop()
+        elif name in ("voice", "voice_input") or (self.process_workers and name in ("yolo", "depth")):
+            component.close()
+
+    def run(self) -> int:
+        return asyncio.run(self.main())
+
+
+def make_devices(record=None, replay=None, speed: float = 1.0) -> dict:
+    """
+    Sensor/actuator objects for BlindNavigationSystem:
+    record=DIR wraps the real devices with recorders, replay=DIR feeds a
+    recorded walk back (GPIO on gpiozero's mock pins). Empty dict = defaults.
+    Vosk is returned as a factory, so it still loads in the background.
+    """
+    if replay is not None:
+        from gpiozero.pins.mock import MockFactory, MockPWMPin
+        from sensors.walk import WalkReplay
+
+        walk = WalkReplay(replay, speed)
+        devices = {"haptic": HapticFeedback(pin_factory=MockFactory(pin_class=MockPWMPin))}
+        camera = walk.camera()
+        if camera is not None:
+            devices["camera"] = camera
+        serial_port = walk.gps_serial()
+        devices["gps"] = GPSReader(port=None, ser=serial_port)
+        stream = walk.audio_stream()
+        if stream is not None:
+            devices["voice_input"] = voice_input_factory(load_gazetteer(), stream=stream)
+        return devices
+
+    if record is not None:
+        from sensors.walk import WalkRecorder
+
+        recorder = WalkRecorder(record)
+        voice_input_rate = 16000
+        voice_input = voice_input_factory(
+            load_gazetteer(),
+            wrap_stream=lambda stream: recorder.audio_stream(stream, voice_input_rate),
         )
+        serial_port = open_serial()
+        return {
+            "camera": recorder.camera(default_camera()),
+            "gps": GPSReader(port=None, ser=recorder.gps_serial(serial_port) if serial_port else None),
+            "voice_input": voice_input,
+        }
 
-        sys.exit(0)
+    return {}
 
 
 if __name__ == "__main__":
-    system = BlindNavigationSystem()
-    system.run()
+    parser = argparse.ArgumentParser(description="Blind navigation assistant")
+    parser.add_argument("--record", metavar="DIR", help="record camera, GPS and audio of this walk")
+    parser.add_argument("--replay", metavar="DIR", help="run on a recorded walk instead of the sensors")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed (0 = unpaced)")
+    parser.add_argument("--metrics-socket", metavar="PATH", help="also serve metrics on this Unix socket")
+    parser.add_argument(
+        "--process-workers",
+        action="store_true",
+        default=PROCESS_WORKERS,
+        help="run YOLO and depth in pinned worker processes",
+    )
+    args = parser.parse_args()
+
+    system = BlindNavigationSystem(
+        **make_devices(args.record, args.replay, args.speed),
+        metrics_socket=args.metrics_socket,
+        process_workers=args.process_workers,
+        stop_at_source_end=args.replay is not None,
+    )
+    sys.exit(system.run())
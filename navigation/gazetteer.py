@@ -0,0 +1,255 @@
+import json
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from navigation.osm_client import GRAPH_DIR, OsmPlace, haversine_m
+
+PLACES_PATH = GRAPH_DIR / "places.json"
+
+# Minimum fuzzy score (0..1) for a spoken name to resolve at all
+MIN_MATCH_SCORE = 0.45
+# Ranking: score - DISTANCE_WEIGHT * min(distance / DISTANCE_SCALE_M, 1)
+DISTANCE_WEIGHT = 0.15
+DISTANCE_SCALE_M = 5000.0
+
+# Recognizer grammar: only places worth navigating to, the most important
+# (then nearest) first, capped to keep the decoding graph small
+GRAMMAR_MAX_PHRASES = 2000
+# Importance per OSM key (lower first); keys not listed, e.g. building,
+# are left out of the grammar
+GRAMMAR_KEY_RANK = {
+    "place": 0, "railway": 0, "public_transport": 0,
+    "amenity": 1, "tourism": 1,
+    "leisure": 2, "shop": 2,
+    "highway": 3,
+}
+# Streets named as destinations; minor ones are mostly noise
+GRAMMAR_HIGHWAYS = {"trunk", "primary", "secondary", "tertiary", "pedestrian"}
+
+# Phrases people put in front of a destination
+LEADING_PHRASES = ("take me to", "navigate to", "go to", "i want to go to", "to", "the")
+
+# Vosk writes numbers as words and spells abbreviations letter by letter
+NUMBER_WORDS = {
+    "0": "zero", "1": "one", "2": "two", "3": "three", "4": "four", "5": "five",
+    "6": "six", "7": "seven", "8": "eight", "9": "nine", "10": "ten",
+    "1st": "first", "2nd": "second", "3rd": "third", "4th": "fourth", "5th": "fifth",
+    "6th": "sixth", "7th": "seventh", "8th": "eighth", "9th": "ninth", "10th": "tenth",
+}
+ABBREVIATIONS = {
+    "st": "street", "rd": "road", "stn": "station", "jn": "junction", "jct": "junction",
+    "hosp": "hospital", "opp": "opposite", "&": "and",
+}
+
+# Letter names Vosk emits for spelled-out abbreviations ("em gee road")
+LETTER_NAMES = {
+    "bee": "b", "dee": "d", "ee": "e", "ef": "f", "gee": "g", "aitch": "h",
+    "jay": "j", "kay": "k", "el": "l", "em": "m", "en": "n", "pee": "p",
+    "ar": "r", "es": "s", "tee": "t", "vee": "v", "ex": "x",
+}
+
+# Spelling -> sound classes, applied in order (longest patterns first)
+_PHONETIC_RULES = (
+    ("ph", "f"), ("bh", "b"), ("dh", "d"), ("gh", "g"), ("kh", "k"), ("th", "t"),
+    ("sh", "s"), ("ch", "c"), ("ck", "k"), ("aa", "a"), ("ee", "i"), ("oo", "u"),
+    ("q", "k"), ("c", "k"), ("z", "s"), ("w", "v"), ("y", "i"), ("x", "ks"),
+)
+
+
+class PlaceMatch(NamedTuple):
+    name: str
+    lat: float
+    lon: float
+    kind: str
+    score: float          # fuzzy name similarity, 0..1
+    distance_m: float | None
+
+
+def spoken_form(name: str) -> str:
+    """
+    How Vosk would transcribe a place name: lower case, no punctuation,
+    digits as words, all-caps abbreviations as separate letters.
+    """
+    words = []
+    for token in re.findall(r"[A-Za-z]+|\d+(?:st|nd|rd|th)?|&", name):
+        if token.isupper() and 1 < len(token) <= 4:
+            words.extend(token.lower())
+            continue
+        token = token.lower()
+        token = NUMBER_WORDS.get(token, ABBREVIATIONS.get(token, token))
+        words.append(token)
+    return " ".join(words)
+
+
+def phonetic_key(text: str) -> str:
+    """
+    Coarse sound-alike key: spaces removed (Vosk often splits or joins
+    unfamiliar names), similar consonants merged, inner vowels dropped.
+    """
+    key = text.replace(" ", "")
+    for src, dst in _PHONETIC_RULES:
+        key = key.replace(src, dst)
+    if not key:
+        return key
+    key = key[0] + re.sub(r"[aeiou]", "", key[1:])
+    return re.sub(r"(.)\1+", r"\1", key)
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"$${text}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _strip_leading(query: str) -> str:
+    changed = True
+    while changed:
+        changed = False
+        for phrase in LEADING_PHRASES:
+            if query.startswith(phrase + " "):
+                query = query[len(phrase) + 1:]
+                changed = True
+    return query
+
+
+class Gazetteer:
+    """
+    Offline place-name index built from the same OSM extract as the
+    pedestrian graph.
+
+    Names are indexed by trigrams of both their spoken form and their
+    phonetic key, so typical Vosk mistakes ("kora mangala" for
+    Koramangala, "em gee" spellings, split compounds) still match.
+    Candidates are ranked by similarity and distance from the user.
+    """
+
+    def __init__(self, places: Iterable[OsmPlace]):
+        self.places: List[OsmPlace] = list(places)
+        self.spoken: List[str] = [spoken_form(p.name) for p in self.places]
+        self.lat = np.array([p.lat for p in self.places], dtype=np.float64)
+        self.lon = np.array([p.lon for p in self.places], dtype=np.float64)
+
+        self._plain: List[Set[str]] = []
+        self._sound: List[Set[str]] = []
+        self._index: Dict[str, List[int]] = defaultdict(list)
+        for i, spoken in enumerate(self.spoken):
+            plain = trigrams(spoken.replace(" ", ""))
+            sound = {"~" + g for g in trigrams(phonetic_key(spoken))}
+            self._plain.append(plain)
+            self._sound.append(sound)
+            for g in plain | sound:
+                self._index[g].append(i)
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    @classmethod
+    def load(cls, path: Path = PLACES_PATH) -> "Gazetteer":
+        data = json.loads(Path(path).read_text())
+        return cls(OsmPlace(*row) for row in data["places"])
+
+    def save(self, path: Path = PLACES_PATH):
+        rows = [list(p) for p in self.places]
+        Path(path).write_text(json.dumps({"places": rows}, separators=(",", ":")))
+
+    def search(self, query: str, near=None, limit: int = 5) -> List[PlaceMatch]:
+        """
+        Best matches for a transcript; `near` is (lat, lon, ...) or None.
+        """
+        query = _strip_leading(spoken_form(query))
+        query = " ".join(LETTER_NAMES.get(w, w) for w in query.split())
+        if not query:
+            return []
+
+        q_plain = trigrams(query.replace(" ", ""))
+        q_sound = {"~" + g for g in trigrams(phonetic_key(query))}
+
+        counts: Dict[int, int] = defaultdict(int)
+        for g in q_plain | q_sound:
+            for i in self._index.get(g, ()):
+                counts[i] += 1
+        if not counts:
+            return []
+
+        ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        scores = np.array(
+            [
+                max(
+                    len(q_plain & self._plain[i]) / len(q_plain | self._plain[i]),
+                    len(q_sound & self._sound[i]) / len(q_sound | self._sound[i]),
+                )
+                for i in ids
+            ]
+        )
+
+        if near is not None:
+            dist = haversine_m(near[0], near[1], self.lat[ids], self.lon[ids])
+            rank = scores - DISTANCE_WEIGHT * np.minimum(dist / DISTANCE_SCALE_M, 1.0)
+        else:
+            dist = None
+            rank = scores
+
+        order = np.argsort(-rank)[:limit]
+        return [
+            PlaceMatch(
+                name=self.places[ids[k]].name,
+                lat=self.places[ids[k]].lat,
+                lon=self.places[ids[k]].lon,
+                kind=self.places[ids[k]].kind,
+                score=float(scores[k]),
+                distance_m=float(dist[k]) if dist is not None else None,
+            )
+            for k in order
+        ]
+
+    def resolve(self, query: str, near=None) -> Optional[Tuple[float, float]]:
+        """
+        Coordinates of the best match, or None if nothing is close enough.
+        Signature matches RoutePlanner's `geocoder` hook.
+        """
+        for match in self.search(query, near, limit=5):
+            if match.score >= MIN_MATCH_SCORE:
+                return match.lat, match.lon
+        return None
+
+    def vosk_grammar(
+        self,
+        extra_phrases: Sequence[str] = (),
+        near=None,
+        limit: int = GRAMMAR_MAX_PHRASES,
+    ) -> str:
+        """
+        JSON phrase list for vosk.KaldiRecognizer(model, rate, grammar):
+        up to `limit` destination-worthy places in their spoken form,
+        ranked by GRAMMAR_KEY_RANK and then by distance from `near`,
+        plus `extra_phrases` and "[unk]" for anything else.
+        """
+        ids, ranks = [], []
+        for i, place in enumerate(self.places):
+            key, _, value = place.kind.partition("=")
+            rank = GRAMMAR_KEY_RANK.get(key)
+            if rank is None or not self.spoken[i]:
+                continue
+            if key == "highway" and value not in GRAMMAR_HIGHWAYS:
+                continue
+            ids.append(i)
+            ranks.append(rank)
+
+        if ids and near is not None:
+            idx = np.asarray(ids, dtype=np.int64)
+            dist = haversine_m(near[0], near[1], self.lat[idx], self.lon[idx])
+            order = np.lexsort((dist, ranks))
+        else:
+            order = np.argsort(ranks, kind="stable")
+
+        places: Set[str] = set()
+        for k in order:
+            if len(places) >= limit:
+                break
+            places.add(self.spoken[ids[k]])
+
+        phrases = sorted(places | {p for p in extra_phrases if p})
+        return json.dumps(phrases + ["[unk]"])
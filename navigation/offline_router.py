@@ -0,0 +1,320 @@
+import heapq
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+from navigation.osm_client import (
+    FLAG_FOOTWAY,
+    FLAG_MAJOR_ROAD,
+    FLAG_SIDEWALK,
+    FLAG_STAIRS,
+    PedestrianGraph,
+    haversine_m,
+)
+from utils.helpers import log
+
+# Cost multipliers (>= 1 so the straight-line heuristic stays admissible)
+MAJOR_ROAD_PENALTY = 2.0      # avoid_highways
+NON_FOOTWAY_PENALTY = 1.2     # prefer_footways / prefer_sidewalks
+STAIRS_PENALTY = 1.5          # stairs allowed but not free
+
+# Bearing change (degrees) that produces a turn instruction
+TURN_THRESHOLD_DEG = 30.0
+
+# Reroute trees: how far (m of walking) around the route they reach, and
+# how close a route vertex must be to a graph node to seed the tree
+CORRIDOR_M = 150.0
+SNAP_M = 20.0
+
+GH_SIGN_TEXT = {
+    -3: "Turn sharp left",
+    -2: "Turn left",
+    -1: "Turn slight left",
+    0: "Continue",
+    1: "Turn slight right",
+    2: "Turn right",
+    3: "Turn sharp right",
+    4: "Arrive at destination",
+}
+
+
+def _bearing(lat1, lon1, lat2, lon2) -> float:
+    lat1, lat2 = math.radians(lat1), math.radians(lat2)
+    dlon = math.radians(lon2 - lon1)
+    x = math.sin(dlon) * math.cos(lat2)
+    y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
+    return math.degrees(math.atan2(x, y)) % 360.0
+
+
+def _turn_delta(lats, lons, i: int) -> float:
+    """Signed bearing change (right > 0) at vertex i of a polyline."""
+    delta = _bearing(lats[i], lons[i], lats[i + 1], lons[i + 1]) - _bearing(
+        lats[i - 1], lons[i - 1], lats[i], lons[i]
+    )
+    return (delta + 180.0) % 360.0 - 180.0
+
+
+def _turn_sign(delta: float) -> int:
+    """GraphHopper instruction sign for a signed bearing change (right > 0)."""
+    mag = abs(delta)
+    if mag < TURN_THRESHOLD_DEG:
+        return 0
+    step = 1 if mag < 60 else 2 if mag < 135 else 3
+    return step if delta > 0 else -step
+
+
+def turn_step(lats, lons, vertex: int, name: str, distance: float) -> dict:
+    """
+    GraphHopper-style instruction for the manoeuvre at `vertex` of a
+    polyline (0 < vertex < len - 1), e.g. where a detour rejoins a route.
+    """
+    sign = _turn_sign(_turn_delta(lats, lons, vertex))
+    text = GH_SIGN_TEXT[sign]
+    if name:
+        text += f" onto {name}"
+    return {
+        "text": text,
+        "sign": sign,
+        "interval": [vertex, vertex],
+        "distance": distance,
+        "street_name": name,
+    }
+
+
+class RouteTree:
+    """
+    Shortest-path tree towards a route, computed once per route.
+
+    For every graph node in the corridor around the route it stores the
+    next node on the cheapest way back onto the route (`parent`) and the
+    route vertex where that way rejoins (`rejoin`). Rerouting is then a
+    walk up the tree instead of a search.
+    """
+
+    def __init__(self, parent: Dict[int, int], rejoin: Dict[int, int]):
+        self.parent = parent
+        self.rejoin = rejoin
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def path_from(self, node: int) -> Optional[Tuple[List[int], int]]:
+        """
+        (graph nodes from `node` to the route, route vertex index) or None
+        if `node` is outside the corridor.
+        """
+        if node not in self.parent:
+            return None
+        path = [node]
+        while self.parent[path[-1]] != -1:
+            path.append(self.parent[path[-1]])
+        return path, self.rejoin[node]
+
+
+class OfflineRouter:
+    """
+    In-process A* over the memory-mapped PedestrianGraph.
+
+    get_route() has the same signature and response shape as
+    GraphHopperNav.get_route, so RoutePlanner can use either.
+    """
+
+    def __init__(self, graph: Optional[PedestrianGraph] = None, preferences: dict = config.PEDESTRIAN_PREFERENCES):
+        self.graph = graph or PedestrianGraph()
+        self.preferences = preferences
+        self.profile = "offline-foot"
+        self._edge_cost = self._build_edge_costs()
+
+    def _build_edge_costs(self) -> np.ndarray:
+        g = self.graph
+        prefs = self.preferences
+        cost = np.array(g.length, dtype=np.float64)
+        flags = np.asarray(g.edge_flags)
+
+        if prefs.get("avoid_highways"):
+            cost[(flags & FLAG_MAJOR_ROAD) != 0] *= MAJOR_ROAD_PENALTY
+        if prefs.get("prefer_footways") or prefs.get("prefer_sidewalks"):
+            pedestrian = (flags & (FLAG_FOOTWAY | FLAG_SIDEWALK)) != 0
+            cost[~pedestrian] *= NON_FOOTWAY_PENALTY
+
+        stairs = (flags & FLAG_STAIRS) != 0
+        if prefs.get("avoid_stairs"):
+            cost[stairs] = np.inf
+        else:
+            cost[stairs] *= STAIRS_PENALTY
+
+        max_slope = prefs.get("max_slope")
+        if max_slope is not None:
+            # Unknown slope (NaN) compares False and is allowed
+            cost[np.asarray(g.edge_slope) > max_slope] = np.inf
+
+        return cost
+
+    def shortest_path(self, start: int, goal: int, allowed: Optional[np.ndarray] = None) -> Optional[List[int]]:
+        """
+        A* from `start` to `goal`. `allowed` optionally restricts the search
+        to a boolean node mask. Returns the node list or None.
+        """
+        g = self.graph
+        lat, lon = g.node_lat, g.node_lon
+        indptr, indices, cost = g.indptr, g.indices, self._edge_cost
+        goal_lat, goal_lon = float(lat[goal]), float(lon[goal])
+
+        def h(node: int) -> float:
+            return float(haversine_m(lat[node], lon[node], goal_lat, goal_lon))
+
+        best: Dict[int, float] = {start: 0.0}
+        parent: Dict[int, int] = {start: -1}
+        heap = [(h(start), 0.0, start)]
+
+        while heap:
+            _, dist, node = heapq.heappop(heap)
+            if node == goal:
+                path = [node]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                return path[::-1]
+            if dist > best.get(node, math.inf):
+                continue
+
+            for e in range(indptr[node], indptr[node + 1]):
+                nxt = int(indices[e])
+                if allowed is not None and not allowed[nxt]:
+                    continue
+                nd = dist + cost[e]
+                if nd < best.get(nxt, math.inf):
+                    best[nxt] = nd
+                    parent[nxt] = node
+                    heapq.heappush(heap, (nd + h(nxt), nd, nxt))
+
+        return None
+
+    def build_route_tree(
+        self,
+        lats: Sequence[float],
+        lons: Sequence[float],
+        cum_dist: Sequence[float],
+        node_ids: Optional[Sequence[int]] = None,
+        corridor_m: float = CORRIDOR_M,
+    ) -> RouteTree:
+        """
+        Multi-source Dijkstra seeded with every route vertex, keyed by
+        cost to the destination (detour + remaining route length), and
+        cut off `corridor_m` metres of detour away from the route.
+        The graph is symmetric, so the forward CSR serves as reverse graph.
+        """
+        g = self.graph
+        indptr, indices, cost, length = g.indptr, g.indices, self._edge_cost, g.length
+        total = float(cum_dist[-1])
+
+        seeds: Dict[int, Tuple[float, int]] = {}
+        for v in range(len(lats)):
+            if node_ids is not None:
+                node = int(node_ids[v])
+            else:
+                node = g.nearest_node(lats[v], lons[v])
+                if node is None or haversine_m(lats[v], lons[v], g.node_lat[node], g.node_lon[node]) > SNAP_M:
+                    continue
+            to_go = total - float(cum_dist[v])
+            if node not in seeds or to_go < seeds[node][0]:
+                seeds[node] = (to_go, v)
+
+        best: Dict[int, float] = {}
+        parent: Dict[int, int] = {}
+        rejoin: Dict[int, int] = {}
+        heap = []
+        for node, (to_go, v) in seeds.items():
+            best[node] = to_go
+            parent[node] = -1
+            rejoin[node] = v
+            heap.append((to_go, 0.0, node))
+        heapq.heapify(heap)
+
+        while heap:
+            key, detour, node = heapq.heappop(heap)
+            if key > best.get(node, math.inf):
+                continue
+            for e in range(indptr[node], indptr[node + 1]):
+                nxt = int(indices[e])
+                nd = key + cost[e]
+                nxt_detour = detour + float(length[e])
+                if nxt_detour > corridor_m or nd >= best.get(nxt, math.inf):
+                    continue
+                best[nxt] = nd
+                parent[nxt] = node
+                rejoin[nxt] = rejoin[node]
+                heapq.heappush(heap, (nd, nxt_detour, nxt))
+
+        return RouteTree(parent, rejoin)
+
+    def _edge_between(self, a: int, b: int) -> int:
+        g = self.graph
+        lo, hi = g.indptr[a], g.indptr[a + 1]
+        hits = np.nonzero(np.asarray(g.indices[lo:hi]) == b)[0]
+        return int(lo + hits[0])
+
+    def path_to_response(self, path: List[int]) -> dict:
+        """
+        GraphHopper-style response ({"paths": [...]}) for a node path.
+        """
+        g = self.graph
+        lats = [float(g.node_lat[n]) for n in path]
+        lons = [float(g.node_lon[n]) for n in path]
+        edges = [self._edge_between(a, b) for a, b in zip(path, path[1:])]
+        lengths = [float(g.length[e]) for e in edges]
+        names = [g.names[int(g.edge_name[e])] for e in edges]
+
+        instructions = []
+        start_idx = 0
+        step_sign = 0
+        for i in range(1, len(path) - 1):
+            sign = _turn_sign(_turn_delta(lats, lons, i))
+            if sign != 0 or names[i] != names[i - 1]:
+                instructions.append(self._instruction(step_sign, names[start_idx], start_idx, i, lengths))
+                start_idx, step_sign = i, sign
+
+        instructions.append(self._instruction(step_sign, names[start_idx] if names else "", start_idx, len(path) - 1, lengths))
+        last = len(path) - 1
+        instructions.append(
+            {"text": GH_SIGN_TEXT[4], "sign": 4, "interval": [last, last], "distance": 0.0, "street_name": ""}
+        )
+
+        return {
+            "paths": [
+                {
+                    "distance": sum(lengths),
+                    "node_ids": list(path),
+                    "points": {"coordinates": [[lo, la] for la, lo in zip(lats, lons)]},
+                    "instructions": instructions,
+                }
+            ]
+        }
+
+    @staticmethod
+    def _instruction(sign: int, name: str, start: int, end: int, lengths: List[float]) -> dict:
+        text = GH_SIGN_TEXT[sign]
+        if name:
+            text += f" onto {name}"
+        return {
+            "text": text,
+            "sign": sign,
+            "interval": [start, end],
+            "distance": sum(lengths[start:end]),
+            "street_name": name,
+        }
+
+    def get_route(self, start_lat, start_lon, end_lat, end_lon):
+        start = self.graph.nearest_node(start_lat, start_lon)
+        goal = self.graph.nearest_node(end_lat, end_lon)
+        if start is None or goal is None:
+            log("Offline router: start or destination outside the graph")
+            return None
+
+        path = self.shortest_path(start, goal)
+        if path is None or len(path) < 2:
+            log("Offline router: no pedestrian path found")
+            return None
+
+        return self.path_to_response(path)
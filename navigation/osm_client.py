@@ -0,0 +1,462 @@
+"""
+OSM extract -> compact pedestrian graph.
+
+Builds a CSR (compressed sparse row) adjacency graph of walkable ways
+inside config.MAP_BOUNDS and stores it as plain .npy arrays, which are
+memory-mapped on load so routing starts without parsing anything.
+
+    python -m navigation.osm_client india-latest.osm.pbf [out_dir]
+
+The same run writes places.json, the destination gazetteer
+(navigation/gazetteer.py).
+
+.osm / .osm.xml files are parsed with the standard library; .pbf needs
+the optional `osmium` package (pyosmium).
+"""
+
+import json
+import math
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import config
+
+GRAPH_DIR = Path(__file__).resolve().parent / "offline_graph"
+
+EARTH_RADIUS_M = 6371000.0
+
+# Ways a pedestrian may use
+WALKABLE_HIGHWAYS = {
+    "footway", "pedestrian", "path", "steps", "living_street", "residential",
+    "service", "unclassified", "tertiary", "tertiary_link", "secondary",
+    "secondary_link", "primary", "primary_link", "trunk", "trunk_link",
+    "track", "cycleway", "corridor", "crossing", "platform",
+}
+# Busy roads (avoid_highways)
+MAJOR_HIGHWAYS = {"trunk", "trunk_link", "primary", "primary_link"}
+# Dedicated pedestrian infrastructure (prefer_footways)
+FOOT_HIGHWAYS = {"footway", "pedestrian", "path", "living_street", "corridor", "crossing"}
+
+# edge_flags bits
+FLAG_STAIRS = 1
+FLAG_MAJOR_ROAD = 2
+FLAG_FOOTWAY = 4
+FLAG_SIDEWALK = 8
+
+# Node lookup grid (degrees), stored with the graph
+NODE_CELL_DEG = 0.002
+
+ARRAYS = (
+    "node_lat", "node_lon", "indptr", "indices", "length", "edge_flags",
+    "edge_slope", "edge_name", "cell_keys", "cell_order",
+)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres (works on scalars and arrays)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+class OsmWay(NamedTuple):
+    node_ids: List[int]
+    tags: Dict[str, str]
+
+
+def _in_bounds(lat: float, lon: float, bounds: dict) -> bool:
+    return (
+        bounds["min_lat"] <= lat <= bounds["max_lat"]
+        and bounds["min_lon"] <= lon <= bounds["max_lon"]
+    )
+
+
+def _is_walkable(tags: Dict[str, str]) -> bool:
+    if tags.get("highway") not in WALKABLE_HIGHWAYS:
+        return False
+    if tags.get("foot") == "no" or tags.get("access") in ("no", "private"):
+        return False
+    return True
+
+
+def read_osm_xml(path: Path, bounds: dict) -> Tuple[Dict[int, Tuple[float, float]], List[OsmWay]]:
+    """
+    Streams an .osm XML file. Returns node coordinates inside `bounds`
+    and every walkable way.
+    """
+    nodes: Dict[int, Tuple[float, float]] = {}
+    ways: List[OsmWay] = []
+
+    way_nodes: List[int] = []
+    tags: Dict[str, str] = {}
+
+    # elem.clear() empties an element but the root still lists it: clear
+    # the root after each top-level element so memory stays flat
+    root = None
+    for event, elem in ET.iterparse(str(path), events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if root is None:
+                root = elem
+            if tag == "way":
+                way_nodes, tags = [], {}
+            continue
+
+        if tag == "node":
+            lat, lon = float(elem.get("lat")), float(elem.get("lon"))
+            if _in_bounds(lat, lon, bounds):
+                nodes[int(elem.get("id"))] = (lat, lon)
+            elem.clear()
+        elif tag == "nd":
+            way_nodes.append(int(elem.get("ref")))
+        elif tag == "tag":
+            tags[elem.get("k")] = elem.get("v")
+        elif tag == "way":
+            if _is_walkable(tags):
+                ways.append(OsmWay(way_nodes, tags))
+            elem.clear()
+        elif tag == "relation":
+            elem.clear()
+        if tag in ("node", "way", "relation"):
+            root.clear()
+
+    return nodes, ways
+
+
+def read_osm_pbf(path: Path, bounds: dict) -> Tuple[Dict[int, Tuple[float, float]], List[OsmWay]]:
+    """
+    Same as read_osm_xml for .pbf files, via pyosmium.
+    """
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError("Reading .pbf files needs the 'osmium' package (pip install osmium)")
+
+    nodes: Dict[int, Tuple[float, float]] = {}
+    ways: List[OsmWay] = []
+
+    class Handler(osmium.SimpleHandler):
+        def way(self, w):
+            tags = {t.k: t.v for t in w.tags}
+            if not _is_walkable(tags):
+                return
+            ids = []
+            for n in w.nodes:
+                if n.location.valid():
+                    lat, lon = n.location.lat, n.location.lon
+                    if _in_bounds(lat, lon, bounds):
+                        nodes[n.ref] = (lat, lon)
+                ids.append(n.ref)
+            ways.append(OsmWay(ids, tags))
+
+    Handler().apply_file(str(path), locations=True)
+    return nodes, ways
+
+
+def read_osm(path, bounds: dict = config.MAP_BOUNDS):
+    path = Path(path)
+    if path.suffix == ".pbf":
+        return read_osm_pbf(path, bounds)
+    return read_osm_xml(path, bounds)
+
+
+class OsmPlace(NamedTuple):
+    name: str
+    lat: float
+    lon: float
+    kind: str  # e.g. "amenity=marketplace"
+
+
+# Tags that make a named feature worth speaking as a destination
+PLACE_KEYS = ("amenity", "shop", "tourism", "leisure", "place", "building", "railway", "public_transport", "highway")
+
+
+def _place_kind(tags: Dict[str, str]) -> Optional[str]:
+    for key in PLACE_KEYS:
+        if key in tags:
+            return f"{key}={tags[key]}"
+    return None
+
+
+def read_osm_places(path, bounds: dict = config.MAP_BOUNDS) -> List[OsmPlace]:
+    """
+    Named nodes and ways (at their centroid) inside `bounds`, for the
+    destination gazetteer.
+    """
+    path = Path(path)
+    places: List[OsmPlace] = []
+
+    if path.suffix == ".pbf":
+        try:
+            import osmium
+        except ImportError:
+            raise ImportError("Reading .pbf files needs the 'osmium' package (pip install osmium)")
+
+        class Handler(osmium.SimpleHandler):
+            def node(self, n):
+                name = n.tags.get("name")
+                kind = _place_kind({t.k: t.v for t in n.tags}) if name else None
+                if kind and n.location.valid() and _in_bounds(n.location.lat, n.location.lon, bounds):
+                    places.append(OsmPlace(name, n.location.lat, n.location.lon, kind))
+
+            def way(self, w):
+                name = w.tags.get("name")
+                kind = _place_kind({t.k: t.v for t in w.tags}) if name else None
+                if not kind:
+                    return
+                pts = [(n.location.lat, n.location.lon) for n in w.nodes if n.location.valid()]
+                if pts:
+                    lat = sum(p[0] for p in pts) / len(pts)
+                    lon = sum(p[1] for p in pts) / len(pts)
+                    if _in_bounds(lat, lon, bounds):
+                        places.append(OsmPlace(name, lat, lon, kind))
+
+        Handler().apply_file(str(path), locations=True)
+        return places
+
+    coords: Dict[int, Tuple[float, float]] = {}
+    way_nodes: List[int] = []
+    tags: Dict[str, str] = {}
+
+    root = None
+    for event, elem in ET.iterparse(str(path), events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if root is None:
+                root = elem
+            if tag in ("node", "way"):
+                way_nodes, tags = [], {}
+            continue
+
+        if tag == "tag":
+            tags[elem.get("k")] = elem.get("v")
+        elif tag == "nd":
+            way_nodes.append(int(elem.get("ref")))
+        elif tag == "node":
+            lat, lon = float(elem.get("lat")), float(elem.get("lon"))
+            if _in_bounds(lat, lon, bounds):
+                coords[int(elem.get("id"))] = (lat, lon)
+                kind = _place_kind(tags) if "name" in tags else None
+                if kind:
+                    places.append(OsmPlace(tags["name"], lat, lon, kind))
+            elem.clear()
+        elif tag == "way":
+            kind = _place_kind(tags) if "name" in tags else None
+            pts = [coords[n] for n in way_nodes if n in coords]
+            if kind and pts:
+                lat = sum(p[0] for p in pts) / len(pts)
+                lon = sum(p[1] for p in pts) / len(pts)
+                places.append(OsmPlace(tags["name"], lat, lon, kind))
+            elem.clear()
+        elif tag == "relation":
+            elem.clear()
+        if tag in ("node", "way", "relation"):
+            root.clear()
+
+    return places
+
+
+def _parse_incline(value: Optional[str]) -> float:
+    """OSM incline tag -> absolute slope in percent (NaN if unknown)."""
+    if not value:
+        return math.nan
+    value = value.strip().rstrip("%")
+    try:
+        return abs(float(value))
+    except ValueError:
+        return math.nan
+
+
+def _edge_flags(tags: Dict[str, str]) -> int:
+    highway = tags.get("highway")
+    flags = 0
+    if highway == "steps":
+        flags |= FLAG_STAIRS
+    if highway in MAJOR_HIGHWAYS:
+        flags |= FLAG_MAJOR_ROAD
+    if highway in FOOT_HIGHWAYS or tags.get("footway"):
+        flags |= FLAG_FOOTWAY
+    if tags.get("sidewalk") in ("both", "left", "right", "yes", "separate"):
+        flags |= FLAG_SIDEWALK
+    return flags
+
+
+def build_graph(
+    nodes: Dict[int, Tuple[float, float]],
+    ways: Iterable[OsmWay],
+    out_dir: Path = GRAPH_DIR,
+) -> Path:
+    """
+    Writes the CSR graph to `out_dir`. Every walkable way is split into
+    bidirectional edges between consecutive nodes inside the bounds.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    index: Dict[int, int] = {}
+    names: List[str] = [""]
+    name_ids: Dict[str, int] = {"": 0}
+
+    src, dst, flags, slopes, name_col = [], [], [], [], []
+
+    for way in ways:
+        f = _edge_flags(way.tags)
+        slope = _parse_incline(way.tags.get("incline"))
+        name = way.tags.get("name", "")
+        if name not in name_ids:
+            name_ids[name] = len(names)
+            names.append(name)
+        nid = name_ids[name]
+
+        for a, b in zip(way.node_ids, way.node_ids[1:]):
+            if a not in nodes or b not in nodes:
+                continue
+            ia = index.setdefault(a, len(index))
+            ib = index.setdefault(b, len(index))
+            # Both directions: pedestrians ignore oneway
+            src += (ia, ib)
+            dst += (ib, ia)
+            flags += (f, f)
+            slopes += (slope, slope)
+            name_col += (nid, nid)
+
+    n = len(index)
+    lat = np.empty(n, dtype=np.float64)
+    lon = np.empty(n, dtype=np.float64)
+    for osm_id, i in index.items():
+        lat[i], lon[i] = nodes[osm_id]
+
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int32)
+    order = np.argsort(src, kind="stable")
+    src, dst = src[order], dst[order]
+
+    arrays = {
+        "node_lat": lat,
+        "node_lon": lon,
+        "indptr": np.concatenate([[0], np.cumsum(np.bincount(src, minlength=n))]).astype(np.int64),
+        "indices": dst,
+        "length": haversine_m(lat[src], lon[src], lat[dst], lon[dst]).astype(np.float32),
+        "edge_flags": np.asarray(flags, dtype=np.uint8)[order],
+        "edge_slope": np.asarray(slopes, dtype=np.float32)[order],
+        "edge_name": np.asarray(name_col, dtype=np.int32)[order],
+    }
+
+    # Sorted cell -> node lookup, queried with searchsorted on load
+    keys = _cell_keys(lat, lon)
+    cell_order = np.argsort(keys, kind="stable").astype(np.int32)
+    arrays["cell_keys"] = keys[cell_order]
+    arrays["cell_order"] = cell_order
+
+    for name, arr in arrays.items():
+        np.save(out_dir / f"{name}.npy", arr)
+
+    meta = {"nodes": n, "edges": int(len(dst)), "bounds": config.MAP_BOUNDS, "names": names}
+    (out_dir / "meta.json").write_text(json.dumps(meta))
+    return out_dir
+
+
+def _cell_keys(lat, lon) -> np.ndarray:
+    row = np.floor(np.asarray(lat) / NODE_CELL_DEG).astype(np.int64)
+    col = np.floor(np.asarray(lon) / NODE_CELL_DEG).astype(np.int64)
+    return row * 1_000_000 + col
+
+
+class PedestrianGraph:
+    """
+    Memory-mapped CSR pedestrian graph written by build_graph().
+    """
+
+    def __init__(self, graph_dir: Path = GRAPH_DIR):
+        graph_dir = Path(graph_dir)
+        if not (graph_dir / "meta.json").exists():
+            raise FileNotFoundError(f"No offline graph at {graph_dir}; run navigation/osm_client.py first.")
+
+        for name in ARRAYS:
+            setattr(self, name, np.load(graph_dir / f"{name}.npy", mmap_mode="r"))
+
+        meta = json.loads((graph_dir / "meta.json").read_text())
+        self.names: List[str] = meta["names"]
+        self.num_nodes = meta["nodes"]
+
+    def neighbors(self, node: int):
+        lo, hi = self.indptr[node], self.indptr[node + 1]
+        return range(lo, hi)
+
+    def nearest_node(self, lat: float, lon: float, max_rings: int = 3) -> Optional[int]:
+        """
+        Closest graph node, searching the lookup grid ring by ring.
+
+        A node in ring k is not necessarily the closest one: a node just
+        across the cell edge, in ring k + 1, can be nearer. Once a node
+        is found the search keeps widening until everything outside the
+        rings searched so far is further away than it. `max_rings` only
+        bounds the search for the first hit.
+        """
+        row = int(math.floor(lat / NODE_CELL_DEG))
+        col = int(math.floor(lon / NODE_CELL_DEG))
+        # Metres per degree, to bound the distance to cells outside a ring
+        m_per_deg_lat = math.radians(1.0) * EARTH_RADIUS_M
+        m_per_deg_lon = m_per_deg_lat * math.cos(math.radians(lat))
+
+        best, best_d = None, math.inf
+        ring = 0
+        while ring <= max_rings or best is not None:
+            candidates = []
+            for r in range(row - ring, row + ring + 1):
+                # Each grid row is one contiguous run of sorted keys; inner
+                # rows only need the two cells at the ring's edges
+                cols = (
+                    [(col - ring, col + ring)]
+                    if r in (row - ring, row + ring)
+                    else [(col - ring, col - ring), (col + ring, col + ring)]
+                )
+                for c0, c1 in cols:
+                    lo = np.searchsorted(self.cell_keys, r * 1_000_000 + c0, "left")
+                    hi = np.searchsorted(self.cell_keys, r * 1_000_000 + c1, "right")
+                    if hi > lo:
+                        candidates.append(np.asarray(self.cell_order[lo:hi]))
+            if candidates:
+                ids = np.concatenate(candidates)
+                d = haversine_m(lat, lon, self.node_lat[ids], self.node_lon[ids])
+                k = int(np.argmin(d))
+                if d[k] < best_d:
+                    best, best_d = int(ids[k]), float(d[k])
+
+            if best is not None:
+                # Shortest distance from the query to any cell beyond this ring
+                outside = min(
+                    (lat - (row - ring) * NODE_CELL_DEG) * m_per_deg_lat,
+                    ((row + ring + 1) * NODE_CELL_DEG - lat) * m_per_deg_lat,
+                    (lon - (col - ring) * NODE_CELL_DEG) * m_per_deg_lon,
+                    ((col + ring + 1) * NODE_CELL_DEG - lon) * m_per_deg_lon,
+                )
+                if best_d <= outside:
+                    break
+            ring += 1
+
+        return best
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python -m navigation.osm_client <extract.osm|.osm.pbf> [out_dir]")
+        sys.exit(1)
+
+    from navigation.gazetteer import Gazetteer
+
+    out = Path(sys.argv[2]) if len(sys.argv) > 2 else GRAPH_DIR
+    osm_nodes, osm_ways = read_osm(sys.argv[1])
+    build_graph(osm_nodes, osm_ways, out)
+    print(f"Wrote pedestrian graph to {out}")
+
+    gazetteer = Gazetteer(read_osm_places(sys.argv[1]))
+    gazetteer.save(out / "places.json")
+    print(f"Wrote {len(gazetteer)} places to {out / 'places.json'}")
@@ -0,0 +1,145 @@
+import math
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from gps_reader import GPSFix
+
+EARTH_RADIUS_M = 6371000.0
+KNOTS_TO_MPS = 0.514444
+
+# Receiver error model: position sigma = HDOP * UERE
+UERE_M = 4.0
+MAX_HDOP = 5.0              # fixes worse than this are ignored
+SPEED_SIGMA_MPS = 0.5
+MIN_SPEED_FOR_COURSE = 0.5  # m/s; course from a near-stationary receiver is noise
+# Process noise: pedestrian acceleration spectral density (m^2/s^3)
+ACCEL_NOISE = 0.5
+# Innovation gate (chi-square, 2 dof, 99.9 %)
+GATE_CHI2 = 13.8
+# Stop dead reckoning this long after the last accepted fix (seconds)
+MAX_PREDICT_SEC = 5.0
+
+
+class PositionFilter:
+    """
+    Constant-velocity Kalman filter in a local east/north frame.
+
+    Fed with GPSFix objects (GPSReader.subscribe), it smooths position,
+    fuses speed/course as a velocity measurement and rejects outliers by
+    HDOP and an innovation gate. position() dead-reckons to "now", so the
+    navigation loop can poll it much faster than the receiver's 1 Hz.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin: Optional[Tuple[float, float]] = None
+        self._cos_lat0 = 1.0
+
+        self.x = np.zeros(4)          # e, n, ve, vn
+        self.P = np.eye(4) * 1e3
+        self._t: Optional[float] = None
+        self._last_fix_t: Optional[float] = None
+
+        self.rejected = 0
+
+    # --- coordinates ------------------------------------------------------
+
+    def _to_enu(self, lat: float, lon: float) -> np.ndarray:
+        lat0, lon0 = self._origin
+        e = math.radians(lon - lon0) * EARTH_RADIUS_M * self._cos_lat0
+        n = math.radians(lat - lat0) * EARTH_RADIUS_M
+        return np.array([e, n])
+
+    def _to_latlon(self, e: float, n: float) -> Tuple[float, float]:
+        lat0, lon0 = self._origin
+        lat = lat0 + math.degrees(n / EARTH_RADIUS_M)
+        lon = lon0 + math.degrees(e / (EARTH_RADIUS_M * self._cos_lat0))
+        return lat, lon
+
+    # --- filter -----------------------------------------------------------
+
+    def _predict(self, t: float):
+        dt = t - self._t
+        if dt <= 0:
+            return
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+
+        q = ACCEL_NOISE
+        Q = np.zeros((4, 4))
+        Q[0, 0] = Q[1, 1] = q * dt ** 3 / 3
+        Q[0, 2] = Q[2, 0] = Q[1, 3] = Q[3, 1] = q * dt ** 2 / 2
+        Q[2, 2] = Q[3, 3] = q * dt
+
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+        self._t = t
+
+    def _correct(self, z: np.ndarray, H: np.ndarray, R: np.ndarray, gate: bool) -> bool:
+        y = z - H @ self.x
+        S = H @ self.P @ H.T + R
+        S_inv = np.linalg.inv(S)
+        if gate and float(y @ S_inv @ y) > GATE_CHI2:
+            return False
+        K = self.P @ H.T @ S_inv
+        self.x = self.x + K @ y
+        self.P = (np.eye(4) - K @ H) @ self.P
+        return True
+
+    def update(self, fix: GPSFix):
+        hdop = fix.hdop if fix.hdop is not None else 1.0
+        if hdop > MAX_HDOP:
+            self.rejected += 1
+            return
+
+        with self._lock:
+            t = fix.timestamp
+            if self._origin is None:
+                self._origin = (fix.lat, fix.lon)
+                self._cos_lat0 = math.cos(math.radians(fix.lat))
+                self._t = t
+
+            self._predict(t)
+
+            sigma = hdop * UERE_M
+            H_pos = np.array([[1.0, 0, 0, 0], [0, 1.0, 0, 0]])
+            # Don't gate before the filter has converged on a position
+            gate = self._last_fix_t is not None and t - self._last_fix_t < MAX_PREDICT_SEC
+            if not self._correct(self._to_enu(fix.lat, fix.lon), H_pos, np.eye(2) * sigma ** 2, gate):
+                self.rejected += 1
+                return
+
+            speed = fix.speed_knots * KNOTS_TO_MPS
+            if speed >= MIN_SPEED_FOR_COURSE:
+                course = math.radians(fix.course_deg)
+                z_vel = np.array([speed * math.sin(course), speed * math.cos(course)])
+                H_vel = np.array([[0, 0, 1.0, 0], [0, 0, 0, 1.0]])
+                self._correct(z_vel, H_vel, np.eye(2) * SPEED_SIGMA_MPS ** 2, gate=False)
+
+            self._last_fix_t = t
+
+    def position(self, now: Optional[float] = None):
+        """
+        Returns:
+            (lat, lon, speed_knots, course_deg) predicted to `now`
+            OR None without a recent accepted fix
+        """
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+            if self._last_fix_t is None or now - self._last_fix_t > MAX_PREDICT_SEC:
+                return None
+
+            dt = max(0.0, now - self._t)
+            e, n, ve, vn = self.x
+            e += ve * dt
+            n += vn * dt
+            lat, lon = self._to_latlon(e, n)
+
+        speed = math.hypot(ve, vn)
+        course = math.degrees(math.atan2(ve, vn)) % 360.0
+        return lat, lon, speed / KNOTS_TO_MPS, course
@@ -0,0 +1,131 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (
+    key      TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    created  REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS geocodes (
+    query    TEXT PRIMARY KEY,
+    lat      REAL NOT NULL,
+    lon      REAL NOT NULL,
+    created  REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS routes_accessed ON routes (accessed);
+CREATE INDEX IF NOT EXISTS geocodes_accessed ON geocodes (accessed);
+"""
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def cell_of(lat: float, lon: float, cell_deg: float) -> Tuple[int, int]:
+    return math.floor(lat / cell_deg), math.floor(lon / cell_deg)
+
+
+class RouteCache:
+    """
+    On-disk (SQLite) cache of routing responses and geocoded destinations.
+
+    Routes are keyed by (profile, quantized origin cell, quantized
+    destination cell), so the daily walk from home hits the same entry
+    even though GPS never gives the same start point twice. Both tables
+    are LRU-bounded and entries expire after a TTL; expired routes can
+    still be served when the routing backend is unreachable.
+    """
+
+    def __init__(self, path=None, settings: dict = config.ROUTE_CACHE):
+        self.settings = settings
+        self.path = Path(path or settings["path"])
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- routes -------------------------------------------------------------
+
+    def route_key(self, origin, dest, profile: str) -> str:
+        cell = self.settings["cell_deg"]
+        o = cell_of(origin[0], origin[1], cell)
+        d = cell_of(dest[0], dest[1], cell)
+        return f"{profile}|{o[0]}:{o[1]}|{d[0]}:{d[1]}"
+
+    def get_route(self, origin, dest, profile: str, allow_stale: bool = False) -> Optional[dict]:
+        key = self.route_key(origin, dest, profile)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created FROM routes WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (not allow_stale and now - row[1] > self.settings["route_ttl_sec"]):
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE routes SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put_route(self, origin, dest, profile: str, response: dict):
+        key = self.route_key(origin, dest, profile)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO routes (key, response, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response, separators=(",", ":")), now, now),
+            )
+            self._evict("routes", self.settings["max_routes"])
+            self._db.commit()
+
+    # --- geocodes -----------------------------------------------------------
+
+    def get_geocode(self, query: str) -> Optional[Tuple[float, float]]:
+        query = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT lat, lon, created FROM geocodes WHERE query = ?", (query,)
+            ).fetchone()
+            if row is None or now - row[2] > self.settings["geocode_ttl_sec"]:
+                return None
+            self._db.execute("UPDATE geocodes SET accessed = ? WHERE query = ?", (now, query))
+            self._db.commit()
+        return row[0], row[1]
+
+    def put_geocode(self, query: str, lat: float, lon: float):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocodes (query, lat, lon, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (normalize_query(query), lat, lon, now, now),
+            )
+            self._evict("geocodes", self.settings["max_geocodes"])
+            self._db.commit()
+
+    # --- maintenance --------------------------------------------------------
+
+    def _evict(self, table: str, max_rows: int):
+        # Least recently accessed rows beyond the limit
+        self._db.execute(
+            f"DELETE FROM {table} WHERE rowid IN ("
+            f"SELECT rowid FROM {table} ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (max_rows,),
+        )
@@ -1,14 +1,212 @@
+import math
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 import config
+from navigation.route_cache import RouteCache
+from utils.helpers import log
+from utils.metrics import METRICS
+
+EARTH_RADIUS_M = 6371000.0
+
+# Spatial index cell size (m); a few times the typical segment length
+GRID_CELL_M = 25.0
+# Segments ahead/behind the last match that are checked before the grid
+LOCAL_SEARCH_WINDOW = 8
+# Beyond this distance from the route the local search gives up (m)
+MATCH_RADIUS_M = 30.0
+# Off-route: further than this from the route (m) continuously for this
+# long (s), i.e. several 1 Hz fixes, not one bad fix or dead-reckoned overshoot
+OFF_ROUTE_DISTANCE_M = 25.0
+OFF_ROUTE_CONFIRM_SEC = 5.0
+# A step that was never announced stays current until the user is this far
+# past it (m), so e.g. the opening "Continue onto ..." is not skipped
+STEP_PASSED_M = 10.0
+
+
+class RouteStep(NamedTuple):
+    index: int
+    instruction: str
+    sign: int               # GraphHopper turn sign (-2 left, 2 right, 4 arrive, ...)
+    point_index: int        # first polyline vertex of the step
+    lat: float
+    lon: float
+    distance_along: float   # metres from the route start to the manoeuvre
+    length: float           # metres covered by this step
+    street_name: str = ""
+
+
+class RouteMatch(NamedTuple):
+    segment: int            # polyline segment index
+    progress: float         # metres along the route
+    offset: float           # perpendicular distance to the route (m)
+
+
+class Route:
+    """
+    Array-backed route polyline.
+
+    lat/lon:   (N,) vertex coordinates
+    xy:        (N, 2) local east/north metres (equirectangular around vertex 0)
+    cum_dist:  (N,) metres from the start to each vertex
+    steps:     instructions, ordered by distance_along
+    """
+
+    def __init__(
+        self,
+        lats: Sequence[float],
+        lons: Sequence[float],
+        steps_raw: List[dict],
+        node_ids: Optional[Sequence[int]] = None,
+    ):
+        # Offline-graph node of each vertex, when the route came from OfflineRouter
+        self.node_ids = list(node_ids) if node_ids is not None else None
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lon = np.asarray(lons, dtype=np.float64)
+        if len(self.lat) < 2:
+            raise ValueError("Route needs at least two points")
+
+        self._lat0 = float(self.lat[0])
+        self._lon0 = float(self.lon[0])
+        self._cos_lat0 = math.cos(math.radians(self._lat0))
+        self.xy = self.to_xy(self.lat, self.lon)
+
+        seg = np.diff(self.xy, axis=0)
+        self.seg_len = np.hypot(seg[:, 0], seg[:, 1])
+        self.cum_dist = np.concatenate([[0.0], np.cumsum(self.seg_len)])
+        self.total_distance = float(self.cum_dist[-1])
+
+        self.steps = self._build_steps(steps_raw)
+        self.grid = SegmentGrid(self.xy)
+
+    @classmethod
+    def from_graphhopper(cls, response: dict) -> "Route":
+        path = response["paths"][0]
+        coords = path["points"]["coordinates"]  # [[lon, lat], ...]
+        lons = [c[0] for c in coords]
+        lats = [c[1] for c in coords]
+        return cls(lats, lons, path.get("instructions", []), path.get("node_ids"))
+
+    def to_xy(self, lat, lon) -> np.ndarray:
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        x = np.radians(lon - self._lon0) * EARTH_RADIUS_M * self._cos_lat0
+        y = np.radians(lat - self._lat0) * EARTH_RADIUS_M
+        return np.stack([x, y], axis=-1)
+
+    def _build_steps(self, steps_raw: List[dict]) -> List[RouteStep]:
+        last = len(self.lat) - 1
+        steps = []
+        for i, raw in enumerate(steps_raw):
+            start = min(int(raw.get("interval", [0, 0])[0]), last)
+            steps.append(
+                RouteStep(
+                    index=i,
+                    instruction=raw.get("text", ""),
+                    sign=int(raw.get("sign", 0)),
+                    point_index=start,
+                    lat=float(self.lat[start]),
+                    lon=float(self.lon[start]),
+                    distance_along=float(self.cum_dist[start]),
+                    length=float(raw.get("distance", 0.0)),
+                    street_name=raw.get("street_name", ""),
+                )
+            )
+        return steps
+
+    def steps_from(self, vertex: int, shift: int) -> List[dict]:
+        """
+        Raw (GraphHopper-style) steps starting at or after `vertex`, with
+        vertex indices moved by `shift`. Used to splice routes.
+        """
+        return [
+            {
+                "text": step.instruction,
+                "sign": step.sign,
+                "interval": [step.point_index + shift, step.point_index + shift],
+                "distance": step.length,
+                "street_name": step.street_name,
+            }
+            for step in self.steps
+            if step.point_index >= vertex
+        ]
+
+    def project(self, x: float, y: float, segments: np.ndarray) -> Optional[RouteMatch]:
+        """
+        Closest point on any of `segments` (vectorized over the candidates).
+        """
+        if len(segments) == 0:
+            return None
+
+        a = self.xy[segments]
+        b = self.xy[segments + 1]
+        ab = b - a
+        denom = np.maximum((ab * ab).sum(axis=1), 1e-9)
+        t = np.clip(((np.array([x, y]) - a) * ab).sum(axis=1) / denom, 0.0, 1.0)
+        proj = a + ab * t[:, None]
+        d = np.hypot(proj[:, 0] - x, proj[:, 1] - y)
+
+        best = int(np.argmin(d))
+        seg = int(segments[best])
+        progress = float(self.cum_dist[seg] + t[best] * self.seg_len[seg])
+        return RouteMatch(seg, progress, float(d[best]))
+
+
+class SegmentGrid:
+    """
+    Uniform-grid spatial hash over polyline segments: each segment is
+    registered in every cell its bounding box touches, so a radius query
+    only looks at a handful of segments regardless of route length.
+    """
+
+    def __init__(self, xy: np.ndarray, cell: float = GRID_CELL_M):
+        self.cell = cell
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        lo = np.minimum(xy[:-1], xy[1:]) // cell
+        hi = np.maximum(xy[:-1], xy[1:]) // cell
+        for seg, ((cx0, cy0), (cx1, cy1)) in enumerate(zip(lo.astype(int), hi.astype(int))):
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    self.cells.setdefault((cx, cy), []).append(seg)
+
+    def query(self, x: float, y: float, radius: float) -> np.ndarray:
+        cx0, cy0 = int((x - radius) // self.cell), int((y - radius) // self.cell)
+        cx1, cy1 = int((x + radius) // self.cell), int((y + radius) // self.cell)
+        found = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                found.update(self.cells.get((cx, cy), ()))
+        return np.fromiter(sorted(found), dtype=np.int64, count=len(found))
+
 
 class GraphHopperNav:
     def __init__(self):
         self.url = "http://localhost:8989"  # Direct URL since config might not have GRAPHHOPPER_URL
+        self.profile = 'pedestrian'  # ✅ CHANGED from 'foot' to 'pedestrian'
+
+        # One pooled keep-alive session: reroutes skip the TCP handshake,
+        # and transient server errors are retried with backoff
+        retry = Retry(
+            total=config.MAX_RETRIES,
+            backoff_factor=0.2,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(max_retries=retry, pool_maxsize=2))
+        self.session.mount("https://", HTTPAdapter(max_retries=retry, pool_maxsize=2))
 
     def get_route(self, start_lat, start_lon, end_lat, end_lon):
         params = {
             'point': [f'{start_lat},{start_lon}', f'{end_lat},{end_lon}'],
-            'profile': 'pedestrian',  # ✅ CHANGED from 'foot' to 'pedestrian'
+            'profile': self.profile,
             'points_encoded': 'false',  # Added this for better coordinate format
             'instructions': 'true',
             'elevation': 'false',
@@ -16,18 +214,378 @@ class GraphHopperNav:
         }
 
         try:
-            response = requests.get(f'{self.url}/route', params=params, timeout=10)  # Increased timeout
+            response = self.session.get(f'{self.url}/route', params=params, timeout=10)  # Increased timeout
 
             if response.status_code == 200:
                 try:
                     return response.json()
                 except ValueError:
-                    print("GraphHopper Error: Invalid JSON response")
+                    log("GraphHopper Error: Invalid JSON response")
                     return None
             else:
-                print(f"GraphHopper API Error: {response.status_code} - {response.text}")
+                log(f"GraphHopper API Error: {response.status_code} - {response.text}")
                 return None
 
         except requests.exceptions.RequestException as e:
-            print(f"GraphHopper Client Error: {e} (Ensure local server is running on {self.url})")
-            return None
\ No newline at end of file
+            log(f"GraphHopper Client Error: {e} (Ensure local server is running on {self.url})")
+            return None
+
+
+def make_router():
+    """
+    Routing backend selected by config.ROUTING_ENGINE.
+    """
+    if config.ROUTING_ENGINE == "offline":
+        from navigation.offline_router import OfflineRouter
+
+        return OfflineRouter()
+    return GraphHopperNav()
+
+
+def load_local_router():
+    """
+    OfflineRouter over the prebuilt graph if one exists, else None.
+    Used for local reroutes even when GraphHopper plans the route.
+    """
+    from navigation.offline_router import OfflineRouter
+    from navigation.osm_client import GRAPH_DIR
+
+    if not (GRAPH_DIR / "meta.json").exists():
+        return None
+    try:
+        return OfflineRouter()
+    except Exception as e:
+        log(f"RoutePlanner: offline graph unavailable ({e})")
+        return None
+
+
+class RoutePlanner:
+    """
+    Plans a route with GraphHopper and tracks the user's progress along it.
+
+    Matching is incremental: each tick first checks the few segments
+    around the previous match, and only falls back to the spatial grid
+    when that fails (start, GPS jump, user left the route). Step lookup
+    moves a forward-only pointer, so per-tick work is O(1) amortized.
+
+    Leaving the route is confirmed after OFF_ROUTE_CONFIRM_SEC off the
+    route. reroute() first walks a shortest-path tree precomputed around
+    the route on the offline graph (no search, no server), and only asks
+    the routing backend when the user is outside that corridor.
+    """
+
+    def __init__(
+        self,
+        nav=None,
+        turn_warning_distance: float = config.AUDIO_GUIDANCE['turn_warning_distance'],
+        local_router=None,
+        cache: Optional[RouteCache] = None,
+        use_cache: bool = True,
+        geocoder=None,
+    ):
+        self.nav = nav or make_router()
+        self.profile = getattr(self.nav, "profile", config.GRAPHHOPPER_PROFILE)
+        self.turn_warning_distance = turn_warning_distance
+
+        # geocoder(text, near_pos) -> (lat, lon) or None
+        self.geocoder = geocoder
+        if cache is None and use_cache:
+            try:
+                cache = RouteCache()
+            except Exception as e:
+                log(f"RoutePlanner: route cache disabled ({e})")
+        self.cache = cache
+
+        if local_router is None:
+            if hasattr(self.nav, "build_route_tree"):
+                local_router = self.nav
+            else:
+                local_router = load_local_router()
+        self.local_router = local_router
+
+        self.route: Optional[Route] = None
+        self.destination: Optional[Tuple[float, float]] = None
+        self.match: Optional[RouteMatch] = None
+        self._match_pos = None
+        self._step_idx = 0
+        self._announced: set = set()
+        self._off_route_since: Optional[float] = None
+        self._tree = None
+
+        self.reroutes_local = 0
+        self.reroutes_remote = 0
+
+    @staticmethod
+    def parse_destination(destination) -> Optional[Tuple[float, float]]:
+        """
+        Accepts (lat, lon) or a "lat, lon" string.
+        """
+        if isinstance(destination, (tuple, list)) and len(destination) >= 2:
+            return float(destination[0]), float(destination[1])
+        if isinstance(destination, str):
+            parts = destination.replace(",", " ").split()
+            if len(parts) == 2:
+                try:
+                    return float(parts[0]), float(parts[1])
+                except ValueError:
+                    return None
+        return None
+
+    def resolve_destination(self, destination, near=None) -> Optional[Tuple[float, float]]:
+        """
+        Coordinates for `destination`: literal coordinates, then the
+        persistent geocode cache, then the geocoder (result is cached).
+        """
+        dest = self.parse_destination(destination)
+        if dest is not None or not isinstance(destination, str):
+            return dest
+
+        if self.cache is not None:
+            dest = self.cache.get_geocode(destination)
+            if dest is not None:
+                return dest
+
+        if self.geocoder is None:
+            return None
+        with METRICS.timer("geocode"):
+            dest = self.geocoder(destination, near)
+        if dest is not None and self.cache is not None:
+            self.cache.put_geocode(destination, dest[0], dest[1])
+        return dest
+
+    def plan_route(self, current_pos, destination) -> Optional[Route]:
+        """
+        current_pos: (lat, lon, ...) from GPSReader / PositionFilter
+        destination: (lat, lon), a "lat, lon" string or a place name
+                     (resolved through the geocode cache / geocoder)
+        Returns the Route, or None if the destination is unknown or
+        routing failed.
+        """
+        dest = self.resolve_destination(destination, current_pos)
+        if dest is None:
+            log(f"RoutePlanner: cannot resolve destination '{destination}'")
+            return None
+
+        route = self._request_route(current_pos, dest)
+        if route is None:
+            return None
+
+        self.destination = dest
+        self.set_route(route)
+        return route
+
+    def _request_route(self, pos, dest) -> Optional[Route]:
+        cache = self.cache
+        response = None
+        if cache is not None:
+            response = cache.get_route(pos, dest, self.profile)
+
+        if response is None:
+            with METRICS.timer("route_request", profile=self.profile):
+                response = self.nav.get_route(pos[0], pos[1], dest[0], dest[1])
+            if response and response.get("paths"):
+                if cache is not None:
+                    cache.put_route(pos, dest, self.profile, response)
+            elif cache is not None:
+                # Backend down: an expired route beats no route
+                response = cache.get_route(pos, dest, self.profile, allow_stale=True)
+
+        if not response or not response.get("paths"):
+            return None
+
+        try:
+            return Route.from_graphhopper(response)
+        except (KeyError, IndexError, ValueError) as e:
+            log(f"RoutePlanner: invalid route response ({e})")
+            return None
+
+    def set_route(self, route: Route):
+        self.route = route
+        self.match = None
+        self._match_pos = None
+        self._step_idx = 0
+        self._announced = set()
+        self._off_route_since = None
+        self._tree = None
+
+        if self.local_router is not None:
+            threading.Thread(target=self._build_tree, args=(route,), daemon=True).start()
+
+    def _build_tree(self, route: Route):
+        try:
+            tree = self.local_router.build_route_tree(
+                route.lat, route.lon, route.cum_dist, route.node_ids
+            )
+        except Exception as e:
+            log(f"RoutePlanner: could not precompute reroute tree ({e})")
+            return
+        # Ignore the result if the route changed meanwhile
+        if self.route is route:
+            self._tree = tree
+
+    def is_off_route(self, now: Optional[float] = None) -> bool:
+        if self._off_route_since is None:
+            return False
+        if now is None:
+            now = time.monotonic()
+        return now - self._off_route_since >= OFF_ROUTE_CONFIRM_SEC
+
+    def reroute(self, pos) -> Optional[Route]:
+        """
+        New route from `pos` to the current destination: locally from the
+        reroute tree when possible, else from the routing backend.
+        """
+        if self.destination is None or not pos:
+            return None
+
+        with METRICS.timer("reroute_local"):
+            route = self._reroute_locally(pos)
+        if route is not None:
+            self.reroutes_local += 1
+            METRICS.counter("reroutes", kind="local").inc()
+        else:
+            route = self._request_route(pos, self.destination)
+            if route is None:
+                return None
+            self.reroutes_remote += 1
+            METRICS.counter("reroutes", kind="remote").inc()
+
+        self.set_route(route)
+        return route
+
+    def _reroute_locally(self, pos) -> Optional[Route]:
+        from navigation.offline_router import SNAP_M, turn_step
+        from navigation.osm_client import haversine_m
+
+        tree, old = self._tree, self.route
+        if tree is None or old is None:
+            return None
+
+        graph = self.local_router.graph
+        node = graph.nearest_node(pos[0], pos[1])
+        if node is None or haversine_m(pos[0], pos[1], graph.node_lat[node], graph.node_lon[node]) > SNAP_M:
+            return None
+
+        found = tree.path_from(node)
+        if found is None:
+            return None
+        detour, vertex = found
+
+        # Detour up the tree, then the old route from the rejoin vertex on
+        lats = [float(graph.node_lat[n]) for n in detour] + old.lat[vertex + 1:].tolist()
+        lons = [float(graph.node_lon[n]) for n in detour] + old.lon[vertex + 1:].tolist()
+        if len(lats) < 2:
+            return None
+
+        rejoin = len(detour) - 1
+        steps_raw = []
+        if len(detour) >= 2:
+            response = self.local_router.path_to_response(detour)
+            steps_raw = response["paths"][0]["instructions"][:-1]  # drop "arrive"
+
+            # Turn from the detour onto the old route, unless an old step
+            # already starts at the rejoin vertex
+            if rejoin + 1 < len(lats) and all(step.point_index != vertex for step in old.steps):
+                current = [step for step in old.steps if step.point_index < vertex]
+                name = current[-1].street_name if current else ""
+                ahead = [step for step in old.steps if step.point_index > vertex]
+                end = ahead[0].point_index if ahead else len(old.lat) - 1
+                distance = float(old.cum_dist[end] - old.cum_dist[vertex])
+                steps_raw.append(turn_step(lats, lons, rejoin, name, distance))
+        steps_raw += old.steps_from(vertex, rejoin - vertex)
+
+        node_ids = None
+        if old.node_ids is not None:
+            node_ids = list(detour) + old.node_ids[vertex + 1:]
+
+        return Route(lats, lons, steps_raw, node_ids)
+
+    @METRICS.timed("route_match")
+    def update_position(self, pos) -> Optional[RouteMatch]:
+        """
+        Map-matches `pos` onto the route and advances progress.
+        """
+        if self.route is None or not pos:
+            return None
+
+        route = self.route
+        x, y = route.to_xy(pos[0], pos[1])
+        n_seg = len(route.seg_len)
+
+        match = None
+        if self.match is not None:
+            lo = max(0, self.match.segment - 2)
+            hi = min(n_seg, self.match.segment + LOCAL_SEARCH_WINDOW)
+            match = route.project(x, y, np.arange(lo, hi))
+            if match is not None and match.offset > MATCH_RADIUS_M:
+                match = None
+
+        if match is None:
+            radius = MATCH_RADIUS_M
+            candidates = route.grid.query(x, y, radius)
+            # Far off the route: widen the search until something turns up
+            while len(candidates) == 0 and radius < route.total_distance + MATCH_RADIUS_M:
+                radius *= 4
+                candidates = route.grid.query(x, y, radius)
+            match = route.project(x, y, candidates)
+
+        self.match = match
+        self._match_pos = pos
+        return match
+
+    def _match_for(self, pos) -> Optional[RouteMatch]:
+        """The match for `pos`, map-matching only if it is a new position."""
+        if self.match is not None and pos == self._match_pos:
+            return self.match
+        return self.update_position(pos)
+
+    def get_next_instruction(self, pos, now: Optional[float] = None) -> Optional[RouteStep]:
+        """
+        The next step whose manoeuvre is still ahead of the user. A step
+        that was not announced (is_approaching_turn) is only passed once
+        the user is STEP_PASSED_M beyond it.
+        """
+        if self.route is None:
+            return None
+
+        match = self._match_for(pos)
+        steps = self.route.steps
+
+        if match is not None and match.offset > OFF_ROUTE_DISTANCE_M:
+            if self._off_route_since is None:
+                self._off_route_since = time.monotonic() if now is None else now
+        else:
+            self._off_route_since = None
+
+        if match is not None:
+            while self._step_idx < len(steps) - 1 and self._passed(steps[self._step_idx], match):
+                self._step_idx += 1
+
+        return steps[self._step_idx] if steps else None
+
+    def _passed(self, step: RouteStep, match: RouteMatch) -> bool:
+        behind = match.progress - step.distance_along
+        if step.index in self._announced:
+            return behind >= 0
+        return behind > STEP_PASSED_M
+
+    def distance_to_step(self, pos, step: RouteStep) -> Optional[float]:
+        match = self._match_for(pos)
+        if match is None:
+            return None
+        return step.distance_along - match.progress
+
+    def is_approaching_turn(self, pos, step: RouteStep) -> bool:
+        """
+        True once per step, when the user is within turn_warning_distance
+        of it (AUDIO_GUIDANCE['turn_warning_distance']).
+        """
+        if step is None or step.index in self._announced:
+            return False
+
+        remaining = self.distance_to_step(pos, step)
+        if remaining is None or remaining > self.turn_warning_distance:
+            return False
+
+        self._announced.add(step.index)
+        return True
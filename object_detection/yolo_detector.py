@@ -1,7 +1,15 @@
 import cv2
+import numpy as np
+import shutil
+import torch
 from ultralytics import YOLO
 from pathlib import Path
-from typing import List, NamedTuple
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from utils.helpers import log
+from utils.metrics import METRICS
+
+from utils.frame_buffer import PreprocessedFrame
 
 
 class Detection(NamedTuple):
@@ -11,6 +19,55 @@ class Detection(NamedTuple):
     bbox: tuple  # (x1, y1, x2, y2)
 
 
+# Compact per-frame detection record; Detection objects are built on demand
+DETECTION_DTYPE = np.dtype(
+    [
+        ("bbox", np.float32, (4,)),  # (x1, y1, x2, y2)
+        ("confidence", np.float32),
+        ("class_id", np.int16),
+    ]
+)
+
+
+class DetectionList(Sequence):
+    """
+    Read-only sequence of Detection backed by a DETECTION_DTYPE array.
+    Detection objects are only created for the items actually accessed.
+    """
+
+    __slots__ = ("array", "_names", "_cache")
+
+    def __init__(self, array: np.ndarray, names: Dict[int, str]):
+        self.array = array
+        self._names = names
+        self._cache: Dict[int, Detection] = {}
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return DetectionList(self.array[index], self._names)
+
+        if index < 0:
+            index += len(self.array)
+        det = self._cache.get(index)
+        if det is None:
+            row = self.array[index]
+            cls_id = int(row["class_id"])
+            det = Detection(
+                class_name=self._names[cls_id],
+                class_id=cls_id,
+                confidence=float(row["confidence"]),
+                bbox=tuple(row["bbox"].tolist()),
+            )
+            self._cache[index] = det
+        return det
+
+    def __repr__(self) -> str:
+        return f"DetectionList({list(self)!r})"
+
+
 # Model path relative to this file:
 # blind_navigation/
 #   object_detection/
@@ -21,44 +78,186 @@ MODEL_PATH = Path(__file__).resolve().parent / "models" / "yolov11n.pt"
 
 CONFIDENCE_THRESHOLD = 0.7
 
+RELEVANT_CLASSES = ("person", "car", "bus", "truck", "bicycle", "motorcycle")
+
+# Inference engine: "pytorch" (eager), "onnx" (ONNX Runtime), "openvino", "ncnn"
+BACKEND = "pytorch"
+# Fixed (height, width) the model is exported for. Matches the 320x240
+# camera frame padded to stride 32, so PreprocessedFrame tensors fit as-is.
+INPUT_SIZE = (256, 320)
+
+# ultralytics export format -> suffix of the file/directory it produces
+EXPORT_SUFFIXES = {
+    "onnx": ".onnx",
+    "openvino": "_openvino_model",
+    "ncnn": "_ncnn_model",
+}
+
+
+def _round_to_stride(value: float, stride: int = 32) -> int:
+    return max(stride, int(round(value / stride)) * stride)
+
+
+def exported_model_path(backend: str, input_size: Tuple[int, int], int8: bool) -> Path:
+    """
+    Cache location of an exported model, e.g. models/yolov11n_256x320_int8.onnx.
+    Size and precision are part of the name so changing them re-exports.
+    """
+    h, w = input_size
+    tag = f"{MODEL_PATH.stem}_{h}x{w}{'_int8' if int8 else ''}"
+    return MODEL_PATH.with_name(tag + EXPORT_SUFFIXES[backend])
+
+
+def export_model(
+    backend: str,
+    input_size: Tuple[int, int] = INPUT_SIZE,
+    int8: bool = False,
+    calib_data: str | None = None,
+) -> Path:
+    """
+    Exports MODEL_PATH to `backend` once and returns the cached path.
+
+    INT8: OpenVINO and NCNN quantize during export (OpenVINO calibrates on
+    `calib_data`, an ultralytics dataset yaml); ONNX is dynamically
+    quantized afterwards with onnxruntime.quantization.
+    """
+    if backend not in EXPORT_SUFFIXES:
+        raise ValueError(f"Unknown YOLO backend: {backend}")
+
+    target = exported_model_path(backend, input_size, int8)
+    if target.exists():
+        return target
+
+    log(f"Exporting {MODEL_PATH.name} to {backend} ({input_size[0]}x{input_size[1]}, int8={int8})...")
+
+    export_args = {"format": backend, "imgsz": list(input_size), "dynamic": False}
+    if int8 and backend != "onnx":
+        export_args["int8"] = True
+        if calib_data is not None:
+            export_args["data"] = calib_data
+
+    exported = Path(YOLO(str(MODEL_PATH)).export(**export_args))
+
+    if int8 and backend == "onnx":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(exported), str(target), weight_type=QuantType.QUInt8)
+        exported.unlink()
+    else:
+        shutil.move(str(exported), str(target))
+
+    return target
+
 
 class YOLODetector:
-    def __init__(self, conf_threshold: float = CONFIDENCE_THRESHOLD):
+    def __init__(
+        self,
+        conf_threshold: float = CONFIDENCE_THRESHOLD,
+        backend: str = BACKEND,
+        input_size: Tuple[int, int] = INPUT_SIZE,
+        int8: bool = False,
+        calib_data: str | None = None,
+    ):
         if not MODEL_PATH.exists():
             raise FileNotFoundError(f"YOLO model not found at {MODEL_PATH}.")
 
-        self.model = YOLO(str(MODEL_PATH))
-        self.model.fuse()
+        self.backend = backend
+        self.input_size = tuple(input_size)
+
+        if backend == "pytorch":
+            self.model = YOLO(str(MODEL_PATH))
+            self.model.fuse()
+        else:
+            path = export_model(backend, self.input_size, int8, calib_data)
+            self.model = YOLO(str(path), task="detect")
 
-        self.relevant_classes = ["person", "car", "bus", "truck", "bicycle", "motorcycle"]
+        self.relevant_classes = list(RELEVANT_CLASSES)
         self.conf_threshold = conf_threshold
 
-    def detect(self, frame) -> List[Detection]:
+        # Class ids resolved once; the model's NMS only keeps these classes
+        self.names: Dict[int, str] = dict(self.model.names)
+        self.relevant_class_ids = [
+            cls_id for cls_id, name in self.names.items() if name in self.relevant_classes
+        ]
+        self._relevant_ids_t = torch.tensor(self.relevant_class_ids, dtype=torch.float32)
+
+    def warmup(self, frame):
+        """
+        One untimed inference (e.g. on a black frame), so the first real
+        frame does not pay for lazy initialisation and allocations.
+        """
+        self.detect_array(frame)
+
+    @METRICS.timed("yolo_detect")
+    def detect(self, frame, scale: float = 1.0) -> Sequence[Detection]:
+        """
+        frame: NumPy image (BGR from OpenCV) or a PreprocessedFrame,
+               whose ready-made RGB tensor skips ultralytics' own
+               letterbox/normalisation
+        scale: run the model at a reduced input resolution (PyTorch
+               backend only; exported models have a fixed input size).
+               Boxes are always returned in frame coordinates.
+        Returns: sequence of Detection (created lazily, see DetectionList)
         """
-        frame: NumPy image (BGR from OpenCV or Picamera2)
-        Returns: list of Detection
+        return DetectionList(self.detect_array(frame, scale), self.names)
+
+    def detect_array(self, frame, scale: float = 1.0) -> np.ndarray:
         """
-        results = self.model(frame, conf=self.conf_threshold, verbose=False)
-
-        detections: List[Detection] = []
-
-        for result in results:
-            for box in result.boxes:
-                cls_id = int(box.cls)
-                cls_name = self.model.names[cls_id]
-                if cls_name not in self.relevant_classes:
-                    continue
-
-                conf = float(box.conf)
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-
-                detections.append(
-                    Detection(
-                        class_name=cls_name,
-                        class_id=cls_id,
-                        confidence=conf,
-                        bbox=(x1, y1, x2, y2),
-                    )
-                )
-
-        return detections
+        Same as detect() but returns the raw DETECTION_DTYPE array.
+        """
+        if self.backend != "pytorch":
+            scale = 1.0
+        # PyTorch at full scale keeps ultralytics' default input size; the
+        # size is only pinned when scaling or for fixed-shape exports
+        imgsz = None
+        if self.backend != "pytorch" or scale != 1.0:
+            imgsz = [_round_to_stride(side * scale) for side in self.input_size]
+
+        source, box_gain = self._model_input(frame, imgsz)
+        size_args = {} if imgsz is None else {"imgsz": imgsz}
+        results = self.model(
+            source,
+            conf=self.conf_threshold,
+            classes=self.relevant_class_ids,
+            verbose=False,
+            **size_args,
+        )
+
+        # boxes.data rows: x1, y1, x2, y2, conf, cls
+        data = torch.cat([r.boxes.data for r in results]) if results else torch.empty((0, 6))
+        if data.device.type != "cpu":
+            data = data.cpu()
+
+        # Exported backends may ignore `classes=`; one mask covers both cases
+        keep = torch.isin(data[:, 5], self._relevant_ids_t) & (data[:, 4] >= self.conf_threshold)
+        data = data[keep].numpy()
+
+        out = np.empty(len(data), dtype=DETECTION_DTYPE)
+        out["bbox"] = data[:, :4] * box_gain
+        out["confidence"] = data[:, 4]
+        out["class_id"] = data[:, 5]
+        return out
+
+    def _model_input(self, frame, imgsz: Optional[List[int]]):
+        """
+        Returns (model input, factor mapping model boxes to frame pixels).
+        ultralytics rescales boxes itself for NumPy inputs, not for tensors.
+        imgsz None: no fixed size, a PreprocessedFrame tensor is used as-is.
+        """
+        if not isinstance(frame, PreprocessedFrame):
+            return frame, 1.0
+
+        tensor = frame.yolo_input
+        if imgsz is None or tuple(tensor.shape[2:]) == tuple(imgsz):
+            return tensor, 1.0
+
+        if self.backend == "pytorch":
+            h, w = tensor.shape[2:]
+            small = torch.nn.functional.interpolate(
+                tensor, size=tuple(imgsz), mode="bilinear", align_corners=False
+            )
+            return small, np.array([w / imgsz[1], h / imgsz[0]] * 2, dtype=np.float32)
+
+        # Exported models have a fixed input shape: let ultralytics
+        # letterbox a BGR view of the frame instead
+        return cv2.cvtColor(frame.rgb, cv2.COLOR_RGB2BGR), 1.0
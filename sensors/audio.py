@@ -0,0 +1,87 @@
+import json
+import time
+import wave
+from pathlib import Path
+from typing import Optional
+
+from sensors.clock import ReplayClock
+
+AUDIO_FILE = "audio.wav"
+AUDIO_META_FILE = "audio.json"
+
+
+class RecordingStream:
+    """
+    PyAudio input-stream wrapper for VoiceInput that writes everything it
+    reads to a 16-bit mono WAV file (plus its start time).
+    """
+
+    def __init__(self, stream, directory, rate: int):
+        self.stream = stream
+        self.directory = Path(directory)
+        self._wav = wave.open(str(self.directory / AUDIO_FILE), "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(rate)
+        self._started: Optional[float] = None
+        self.rate = rate
+
+    def read(self, frames: int, exception_on_overflow: bool = True) -> bytes:
+        data = self.stream.read(frames, exception_on_overflow=exception_on_overflow)
+        if self._started is None:
+            # Time of the first sample in this chunk
+            self._started = time.time() - frames / self.rate
+        self._wav.writeframes(data)
+        return data
+
+    def start_stream(self):
+        self.stream.start_stream()
+
+    def stop_stream(self):
+        self.stream.stop_stream()
+
+    def close(self):
+        self.stream.close()
+        self._wav.close()
+        meta = {"start": self._started, "rate": self.rate}
+        (self.directory / AUDIO_META_FILE).write_text(json.dumps(meta))
+
+
+class WavReplayStream:
+    """
+    Input-stream stand-in that plays a recorded WAV at the pace given by
+    `clock`, then silence.
+    """
+
+    def __init__(self, directory, clock: Optional[ReplayClock] = None):
+        directory = Path(directory)
+        meta = json.loads((directory / AUDIO_META_FILE).read_text())
+        self.start = meta["start"] or 0.0
+        self._wav = wave.open(str(directory / AUDIO_FILE), "rb")
+        self.rate = self._wav.getframerate()
+        self.clock = clock
+        self.position = 0   # frames handed out so far
+
+    @property
+    def finished(self) -> bool:
+        return self.position >= self._wav.getnframes()
+
+    def read(self, frames: int, exception_on_overflow: bool = True) -> bytes:
+        due = self.start + (self.position + frames) / self.rate
+        if self.clock is not None:
+            self.clock.wait_until(due)
+        elif self.finished:
+            # Unpaced and exhausted: do not spin the capture thread
+            time.sleep(frames / self.rate)
+        data = self._wav.readframes(frames)
+        self.position += frames
+        return data + b"\x00\x00" * (frames - len(data) // 2)
+
+    def start_stream(self):
+        pass
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        self._wav.close()
@@ -0,0 +1,124 @@
+import json
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from sensors.clock import ReplayClock
+from utils.frame_buffer import FrameRing, PreprocessedFrame
+
+FRAMES_FILE = "frames.u8"
+META_FILE = "camera.json"
+
+
+class FrameSource:
+    """
+    Camera interface used by BlindNavigationSystem and the benchmarks.
+
+    capture() copies the next frame into a free FrameRing slot and
+    returns it, or None when every slot is still in use (frame dropped);
+    it raises EOFError when a finite source (a replay) is exhausted.
+    """
+
+    width = 0
+    height = 0
+
+    def capture(self, frames: FrameRing) -> Optional[PreprocessedFrame]:
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class PicameraSource(FrameSource):
+    def __init__(self, width: int = 320, height: int = 240):
+        from picamera2 import MappedArray, Picamera2
+
+        self._mapped_array = MappedArray
+        self.width, self.height = width, height
+        self.camera = Picamera2()
+        # libcamera's "BGR888" is R, G, B in memory, i.e. what the models
+        # want, so no colour conversion is needed after capture.
+        config = self.camera.create_preview_configuration(
+            main={"size": (width, height), "format": "BGR888"}
+        )
+        self.camera.configure(config)
+        self.camera.start()
+
+    def capture(self, frames: FrameRing) -> Optional[PreprocessedFrame]:
+        # Copy straight out of the mapped camera buffer into a ring slot
+        request = self.camera.capture_request()
+        try:
+            with self._mapped_array(request, "main") as mapped:
+                return frames.write(mapped.array)
+        finally:
+            request.release()
+
+    def stop(self):
+        self.camera.stop()
+
+
+class RecordingCamera(FrameSource):
+    """
+    Passes frames through from `source` and appends them, raw RGB, to
+    `directory`/frames.u8 with their capture times.
+    """
+
+    def __init__(self, source: FrameSource, directory):
+        self.source = source
+        self.width, self.height = source.width, source.height
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.directory / FRAMES_FILE, "wb")
+        self.times: List[float] = []
+
+    def capture(self, frames: FrameRing) -> Optional[PreprocessedFrame]:
+        frame = self.source.capture(frames)
+        if frame is None:
+            return None
+        self.times.append(time.time())
+        self._file.write(frame.rgb.tobytes())
+        return frame
+
+    def stop(self):
+        self.source.stop()
+        self._file.close()
+        meta = {"width": self.width, "height": self.height, "times": self.times}
+        (self.directory / META_FILE).write_text(json.dumps(meta))
+
+
+class ReplayCamera(FrameSource):
+    """
+    Plays back a RecordingCamera directory from a memory map, paced by
+    `clock` (or as fast as possible without one).
+    """
+
+    def __init__(self, directory, clock: Optional[ReplayClock] = None, loop: bool = False):
+        directory = Path(directory)
+        meta = json.loads((directory / META_FILE).read_text())
+        self.width, self.height = meta["width"], meta["height"]
+        self.times = np.asarray(meta["times"], dtype=np.float64)
+        self.frames = np.memmap(
+            directory / FRAMES_FILE,
+            dtype=np.uint8,
+            mode="r",
+            shape=(len(self.times), self.height, self.width, 3),
+        )
+        self.clock = clock
+        self.loop = loop
+        self.index = 0
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def capture(self, frames: FrameRing) -> Optional[PreprocessedFrame]:
+        if self.index >= len(self.times):
+            if not self.loop or not len(self.times):
+                raise EOFError("camera replay finished")
+            self.index = 0
+        if self.clock is not None:
+            self.clock.wait_until(self.times[self.index])
+        frame = frames.write(self.frames[self.index])
+        self.index += 1
+        return frame
@@ -0,0 +1,41 @@
+import threading
+import time
+from typing import Optional
+
+
+class ReplayClock:
+    """
+    Maps recording timestamps (time.time() at capture) to playback time.
+
+    Shared by every replay driver of one walk so camera, GPS and audio stay
+    in sync. speed=2.0 plays twice as fast; speed=0 disables pacing (as
+    fast as the consumers can go, for benchmarks).
+    """
+
+    def __init__(self, start: float, speed: float = 1.0):
+        self.start = start
+        self.speed = speed
+        self._real_start: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _anchor(self) -> float:
+        with self._lock:
+            if self._real_start is None:
+                self._real_start = time.monotonic()
+            return self._real_start
+
+    def wait_until(self, recorded_at: float):
+        """Sleeps until the moment `recorded_at` is due in playback."""
+        real_start = self._anchor()
+        if self.speed <= 0:
+            return
+        due = real_start + (recorded_at - self.start) / self.speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def now(self) -> float:
+        """Current playback position as a recording timestamp."""
+        if self.speed <= 0:
+            return float("inf")
+        return self.start + (time.monotonic() - self._anchor()) * self.speed
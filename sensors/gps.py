@@ -0,0 +1,88 @@
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from sensors.clock import ReplayClock
+
+# One NMEA sentence per line: "<time.time()>\t<sentence>"
+NMEA_FILE = "gps.nmea"
+
+
+def read_nmea_log(path) -> List[Tuple[float, str]]:
+    entries = []
+    for raw in Path(path).read_text(errors="replace").splitlines():
+        stamp, _, line = raw.partition("\t")
+        if not line:
+            continue
+        try:
+            entries.append((float(stamp), line))
+        except ValueError:
+            continue
+    return entries
+
+
+class RecordingSerial:
+    """
+    Serial-port wrapper for GPSReader that logs every NMEA line it passes
+    through, with its arrival time.
+    """
+
+    def __init__(self, ser, path):
+        self.ser = ser
+        self._file = open(path, "w")
+        self._partial = b""
+
+    @property
+    def in_waiting(self) -> int:
+        return self.ser.in_waiting
+
+    def read(self, size: int = 1) -> bytes:
+        data = self.ser.read(size)
+        if data:
+            now = time.time()
+            *lines, self._partial = (self._partial + data).split(b"\n")
+            for line in lines:
+                text = line.decode("ascii", errors="replace").strip()
+                if text:
+                    self._file.write(f"{now:.3f}\t{text}\n")
+        return data
+
+    def close(self):
+        self.ser.close()
+        self._file.close()
+
+
+class NmeaReplaySerial:
+    """
+    Serial-port stand-in that returns a recorded NMEA log, line by line,
+    at the pace given by `clock`. Behaves like a timed-out read once the
+    log is exhausted.
+    """
+
+    def __init__(self, path, clock: Optional[ReplayClock] = None, timeout: float = 1.0):
+        self.entries = read_nmea_log(path)
+        self.clock = clock
+        self.timeout = timeout
+        self.index = 0
+        self.closed = False
+
+    @property
+    def finished(self) -> bool:
+        return self.index >= len(self.entries)
+
+    @property
+    def in_waiting(self) -> int:
+        return 0
+
+    def read(self, size: int = 1) -> bytes:
+        if self.closed or self.finished:
+            time.sleep(self.timeout)
+            return b""
+        stamp, line = self.entries[self.index]
+        if self.clock is not None:
+            self.clock.wait_until(stamp)
+        self.index += 1
+        return line.encode("ascii", errors="replace") + b"\r\n"
+
+    def close(self):
+        self.closed = True
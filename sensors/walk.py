@@ -0,0 +1,73 @@
+import json
+import time
+from pathlib import Path
+from typing import Optional
+
+from sensors.audio import AUDIO_META_FILE, RecordingStream, WavReplayStream
+from sensors.camera import META_FILE, FrameSource, RecordingCamera, ReplayCamera
+from sensors.clock import ReplayClock
+from sensors.gps import NMEA_FILE, NmeaReplaySerial, RecordingSerial, read_nmea_log
+
+WALK_FILE = "walk.json"
+
+
+class WalkRecorder:
+    """
+    Records one walk into a directory: camera frames, NMEA lines and
+    microphone audio, all stamped with time.time() so they replay in sync.
+    Wrap each real device with the matching method.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / WALK_FILE).write_text(json.dumps({"started": time.time()}))
+
+    def camera(self, source: FrameSource) -> RecordingCamera:
+        return RecordingCamera(source, self.directory)
+
+    def gps_serial(self, ser) -> RecordingSerial:
+        return RecordingSerial(ser, self.directory / NMEA_FILE)
+
+    def audio_stream(self, stream, rate: int) -> RecordingStream:
+        return RecordingStream(stream, self.directory, rate)
+
+
+class WalkReplay:
+    """
+    Replay drivers for a recorded walk, sharing one ReplayClock.
+    Each factory returns None when the walk has no data for that sensor.
+    """
+
+    def __init__(self, directory, speed: float = 1.0):
+        self.directory = Path(directory)
+        meta_path = self.directory / WALK_FILE
+        if meta_path.exists():
+            start = json.loads(meta_path.read_text())["started"]
+        else:
+            start = self._earliest_timestamp()
+        self.clock = ReplayClock(start, speed)
+
+    def _earliest_timestamp(self) -> float:
+        stamps = []
+        if (self.directory / META_FILE).exists():
+            times = json.loads((self.directory / META_FILE).read_text())["times"]
+            stamps.extend(times[:1])
+        if (self.directory / NMEA_FILE).exists():
+            stamps.extend(stamp for stamp, _ in read_nmea_log(self.directory / NMEA_FILE)[:1])
+        return min(stamps) if stamps else 0.0
+
+    def camera(self, loop: bool = False) -> Optional[ReplayCamera]:
+        if not (self.directory / META_FILE).exists():
+            return None
+        return ReplayCamera(self.directory, self.clock, loop=loop)
+
+    def gps_serial(self) -> Optional[NmeaReplaySerial]:
+        if not (self.directory / NMEA_FILE).exists():
+            return None
+        return NmeaReplaySerial(self.directory / NMEA_FILE, self.clock)
+
+    def audio_stream(self) -> Optional[WavReplayStream]:
+        if not (self.directory / AUDIO_META_FILE).exists():
+            return None
+        return WavReplayStream(self.directory, self.clock)
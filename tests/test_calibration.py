@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from distance_estimation.calibration import (
+    MAX_DEPTH_M,
+    MIN_DEPTH_M,
+    fit_depth_alignment,
+    to_metric,
+)
+
+DISTANCES = [0.8, 1.5, 2.5, 4.0, 7.0]
+
+
+def test_relative_fit_recovers_inverse_depth_alignment():
+    scale, shift = 0.004, 0.05
+    raw = [(1.0 / d - shift) / scale for d in DISTANCES]
+
+    fitted = fit_depth_alignment(raw, DISTANCES, metric=False)
+
+    assert fitted == pytest.approx((scale, shift))
+    assert to_metric(raw, fitted, metric=False) == pytest.approx(DISTANCES, rel=1e-4)
+
+
+def test_metric_fit_corrects_scale_and_shift():
+    raw = [d / 1.1 - 0.2 for d in DISTANCES]
+
+    fitted = fit_depth_alignment(raw, DISTANCES, metric=True)
+
+    assert to_metric(raw, fitted, metric=True) == pytest.approx(DISTANCES, rel=1e-4)
+
+
+def test_fit_needs_two_samples():
+    with pytest.raises(ValueError):
+        fit_depth_alignment([1.0], [2.0], metric=True)
+
+
+def test_relative_depth_is_clipped_to_range():
+    depth = to_metric(np.array([-1.0, 0.0, 1e6]), (1.0, 0.0), metric=False)
+
+    assert depth[0] == pytest.approx(MAX_DEPTH_M)
+    assert depth[1] == pytest.approx(MAX_DEPTH_M)
+    assert depth[2] == pytest.approx(MIN_DEPTH_M)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+# The slots hold torch tensors; as_rgb needs OpenCV
+pytest.importorskip("torch")
+pytest.importorskip("cv2")
+
+from utils.frame_buffer import FrameRing
+
+H, W = 4, 6
+
+
+def image(value):
+    return np.full((H, W, 3), value, dtype=np.uint8)
+
+
+def test_write_hands_out_distinct_slots_until_full():
+    ring = FrameRing(H, W, size=3, preprocess=False)
+
+    frames = [ring.write(image(i)) for i in range(3)]
+
+    assert len({frame.slot for frame in frames}) == 3
+    assert [frame.frame_id for frame in frames] == [1, 2, 3]
+    assert ring.available == 0
+    assert ring.write(image(9)) is None
+    assert ring.dropped == 1
+    # A held frame is never overwritten
+    assert [int(frame.rgb[0, 0, 0]) for frame in frames] == [0, 1, 2]
+
+
+def test_release_returns_the_slot():
+    ring = FrameRing(H, W, size=2, preprocess=False)
+    first = ring.write(image(1))
+    ring.write(image(2))
+
+    ring.release(first)
+    ring.release(first)
+
+    assert ring.available == 1
+    again = ring.write(image(3))
+    assert again.slot == first.slot
+    assert again.frame_id == 3
+    assert ring.available == 0
+
+
+def test_write_uses_the_first_three_channels():
+    ring = FrameRing(H, W, size=1, preprocess=False)
+    rgbx = np.zeros((H + 2, W + 2, 4), dtype=np.uint8)
+    rgbx[..., :3] = (10, 20, 30)
+    rgbx[..., 3] = 255
+
+    frame = ring.write(rgbx)
+
+    assert frame.rgb.shape == (H, W, 3)
+    assert (frame.rgb == (10, 20, 30)).all()
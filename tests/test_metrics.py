@@ -0,0 +1,64 @@
+import socket
+import threading
+
+from utils.metrics import MetricsServer, Registry
+
+
+def test_counter_sums_across_threads():
+    registry = Registry()
+    counter = registry.counter("frames")
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert counter.value == 4000
+
+
+def test_prometheus_exposition():
+    registry = Registry()
+    registry.counter("drops", "Dropped frames", stage="depth").inc(3)
+    registry.gauge("temp").set(61.5)
+    hist = registry.histogram("detect")
+    for ms in (0.4, 3.0, 3.0, 700.0):
+        hist.observe(ms)
+
+    lines = registry.render_prometheus().splitlines()
+
+    assert "# HELP blindnav_drops_total Dropped frames" in lines
+    assert "# TYPE blindnav_drops_total counter" in lines
+    assert 'blindnav_drops_total{stage="depth"} 3' in lines
+    assert "blindnav_temp 61.5" in lines
+    assert 'blindnav_detect_ms_bucket{le="0.5"} 1' in lines
+    assert 'blindnav_detect_ms_bucket{le="5"} 3' in lines
+    assert 'blindnav_detect_ms_bucket{le="+Inf"} 4' in lines
+    assert "blindnav_detect_ms_count 4" in lines
+    assert hist.quantile(0.5) == 5
+
+
+def test_unix_socket_serves_metrics(tmp_path):
+    registry = Registry()
+    registry.counter("fixes").inc()
+    path = str(tmp_path / "metrics.sock")
+    server = MetricsServer(registry, port=None, unix_path=path)
+    try:
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(path)
+            data = b"".join(iter(lambda: sock.recv(4096), b""))
+    finally:
+        server.close()
+
+    assert b"blindnav_fixes_total 1" in data
+
+
+def test_unusable_unix_socket_is_skipped(tmp_path):
+    server = MetricsServer(Registry(), port=None, unix_path=str(tmp_path / "missing" / "m.sock"))
+
+    assert server.unix_path is None
+    server.close()
@@ -0,0 +1,52 @@
+import math
+
+import pytest
+
+from navigation.osm_client import NODE_CELL_DEG, OsmWay, PedestrianGraph, build_graph, haversine_m
+
+LAT = 12.9711
+
+
+@pytest.fixture
+def edge_lon():
+    # A cell boundary in longitude, as the lookup grid computes it
+    return (math.floor(77.6 / NODE_CELL_DEG) + 1) * NODE_CELL_DEG
+
+
+def make_graph(tmp_path, nodes):
+    ids = list(nodes)
+    build_graph(nodes, [OsmWay(ids, {"highway": "footway"})], tmp_path)
+    return PedestrianGraph(tmp_path)
+
+
+def test_nearest_node_checks_across_the_cell_edge(tmp_path, edge_lon):
+    query = (LAT, edge_lon - 1e-5)
+    nodes = {
+        1: (LAT, edge_lon - 0.0019),   # same cell, ~200 m away
+        2: (LAT, edge_lon + 1e-5),     # next cell, ~2 m away
+    }
+    graph = make_graph(tmp_path, nodes)
+
+    node = graph.nearest_node(*query)
+
+    assert (graph.node_lat[node], graph.node_lon[node]) == nodes[2]
+    assert haversine_m(*query, graph.node_lat[node], graph.node_lon[node]) < 5.0
+
+
+def test_nearest_node_in_own_cell(tmp_path, edge_lon):
+    nodes = {
+        1: (LAT, edge_lon - 0.001),
+        2: (LAT + 0.01, edge_lon + 0.01),
+    }
+    graph = make_graph(tmp_path, nodes)
+
+    node = graph.nearest_node(LAT, edge_lon - 0.0011)
+
+    assert (graph.node_lat[node], graph.node_lon[node]) == nodes[1]
+
+
+def test_nearest_node_outside_the_search_rings(tmp_path, edge_lon):
+    nodes = {1: (LAT, edge_lon), 2: (LAT + 0.0001, edge_lon)}
+    graph = make_graph(tmp_path, nodes)
+
+    assert graph.nearest_node(LAT + 1.0, edge_lon, max_rings=3) is None
@@ -0,0 +1,82 @@
+import pytest
+
+# gps_reader (GPSFix) needs the serial and NMEA packages
+pytest.importorskip("serial")
+pytest.importorskip("pynmea2")
+
+from gps_reader import GPSFix
+from navigation.position_filter import (
+    KNOTS_TO_MPS,
+    MAX_HDOP,
+    MAX_PREDICT_SEC,
+    PositionFilter,
+)
+from navigation.osm_client import haversine_m
+
+LAT, LON = 12.97, 77.59
+DLAT = 1.0 / 111195.0
+DLON = DLAT / 0.9745
+
+
+def fix(t, east_m=0.0, north_m=0.0, speed_mps=0.0, course=0.0, hdop=1.0):
+    return GPSFix(
+        lat=LAT + north_m * DLAT,
+        lon=LON + east_m * DLON,
+        speed_knots=speed_mps / KNOTS_TO_MPS,
+        course_deg=course,
+        hdop=hdop,
+        timestamp=t,
+    )
+
+
+def distance(pos, east_m=0.0, north_m=0.0):
+    return float(haversine_m(pos[0], pos[1], LAT + north_m * DLAT, LON + east_m * DLON))
+
+
+def test_no_position_before_first_fix():
+    assert PositionFilter().position(now=0.0) is None
+
+
+def test_first_fix_is_taken_as_is():
+    pf = PositionFilter()
+    pf.update(fix(10.0))
+
+    assert distance(pf.position(now=10.0)) < 0.5
+
+
+def test_poor_hdop_is_rejected():
+    pf = PositionFilter()
+    pf.update(fix(10.0, hdop=MAX_HDOP + 1))
+
+    assert pf.rejected == 1
+    assert pf.position(now=10.0) is None
+
+
+def test_outlier_is_gated():
+    pf = PositionFilter()
+    for t in range(10):
+        pf.update(fix(float(t)))
+    pf.update(fix(10.0, east_m=500.0))
+
+    assert pf.rejected == 1
+    assert distance(pf.position(now=10.0)) < 2.0
+
+
+def test_dead_reckons_between_fixes():
+    pf = PositionFilter()
+    speed = 1.4
+    for t in range(10):
+        pf.update(fix(float(t), east_m=speed * t, speed_mps=speed, course=90.0))
+
+    pos = pf.position(now=11.0)
+
+    assert distance(pos, east_m=speed * 11.0) < 1.0
+    assert pos[2] * KNOTS_TO_MPS == pytest.approx(speed, abs=0.2)
+    assert pos[3] == pytest.approx(90.0, abs=5.0)
+
+
+def test_stops_predicting_without_fixes():
+    pf = PositionFilter()
+    pf.update(fix(10.0))
+
+    assert pf.position(now=10.0 + MAX_PREDICT_SEC + 0.1) is None
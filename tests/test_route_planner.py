@@ -0,0 +1,112 @@
+import pytest
+
+from navigation import route_planner
+from navigation.route_planner import (
+    OFF_ROUTE_CONFIRM_SEC,
+    STEP_PASSED_M,
+    Route,
+    RoutePlanner,
+)
+
+LAT, LON = 12.97, 77.59
+# ~1 m in each direction at this latitude
+DLAT = 1.0 / 111195.0
+DLON = DLAT / 0.9745
+
+
+def point(east_m: float, north_m: float = 0.0):
+    return (LAT + north_m * DLAT, LON + east_m * DLON, 0.0, 0.0)
+
+
+class StraightRoute:
+    """Routing backend: 200 m due east, a turn at 100 m."""
+
+    profile = "test"
+
+    def get_route(self, start_lat, start_lon, end_lat, end_lon):
+        coords = [[LON + e * DLON, LAT] for e in (0, 50, 100, 150, 200)]
+        return {
+            "paths": [
+                {
+                    "points": {"coordinates": coords},
+                    "instructions": [
+                        {"text": "Continue onto A", "sign": 0, "interval": [0, 2], "distance": 100.0},
+                        {"text": "Turn left onto B", "sign": -2, "interval": [2, 4], "distance": 100.0},
+                        {"text": "Arrive at destination", "sign": 4, "interval": [4, 4], "distance": 0.0},
+                    ],
+                }
+            ]
+        }
+
+
+@pytest.fixture
+def planner(monkeypatch):
+    monkeypatch.setattr(route_planner, "load_local_router", lambda: None)
+    planner = RoutePlanner(nav=StraightRoute(), use_cache=False)
+    assert planner.plan_route(point(0), (LAT, LON + 200 * DLON)) is not None
+    return planner
+
+
+def test_route_geometry():
+    route = Route.from_graphhopper(StraightRoute().get_route(0, 0, 0, 0))
+    assert route.total_distance == pytest.approx(200.0, rel=0.01)
+    assert [step.point_index for step in route.steps] == [0, 2, 4]
+
+
+def test_first_step_is_announced_before_it_is_passed(planner):
+    step = planner.get_next_instruction(point(0.5))
+    assert step.instruction == "Continue onto A"
+
+    assert planner.is_approaching_turn(point(0.5), step)
+    assert not planner.is_approaching_turn(point(0.5), step)
+    assert planner.get_next_instruction(point(1.0)).instruction == "Turn left onto B"
+
+
+def test_unannounced_step_is_passed_after_margin(planner):
+    assert planner.get_next_instruction(point(STEP_PASSED_M / 2)).index == 0
+    assert planner.get_next_instruction(point(STEP_PASSED_M + 5)).index == 1
+
+
+def test_turn_announced_within_warning_distance(planner):
+    planner.get_next_instruction(point(20))
+    step = planner.get_next_instruction(point(50))
+    assert step.index == 1
+
+    assert not planner.is_approaching_turn(point(50), step)
+    pos = point(100 - planner.turn_warning_distance + 5)
+    assert planner.distance_to_step(pos, step) == pytest.approx(planner.turn_warning_distance - 5, abs=0.5)
+    assert planner.is_approaching_turn(pos, step)
+
+    assert planner.get_next_instruction(point(101)).instruction == "Arrive at destination"
+
+
+def test_position_is_matched_once_per_tick(planner):
+    calls = []
+    update = planner.update_position
+
+    def counting(pos):
+        calls.append(pos)
+        return update(pos)
+
+    planner.update_position = counting
+    pos = point(30)
+    step = planner.get_next_instruction(pos)
+    planner.is_approaching_turn(pos, step)
+    planner.distance_to_step(pos, step)
+
+    assert calls == [pos]
+
+
+def test_off_route_needs_confirmation_time(planner):
+    away = point(60, north_m=40)
+    planner.get_next_instruction(away, now=100.0)
+    assert not planner.is_off_route(now=100.0)
+    planner.get_next_instruction(point(61, north_m=40), now=100.0 + OFF_ROUTE_CONFIRM_SEC / 2)
+    assert not planner.is_off_route(now=100.0 + OFF_ROUTE_CONFIRM_SEC / 2)
+    assert planner.is_off_route(now=100.0 + OFF_ROUTE_CONFIRM_SEC)
+
+
+def test_returning_to_route_resets_off_route(planner):
+    planner.get_next_instruction(point(60, north_m=40), now=0.0)
+    planner.get_next_instruction(point(62), now=1.0)
+    assert not planner.is_off_route(now=OFF_ROUTE_CONFIRM_SEC + 1.0)
@@ -0,0 +1,201 @@
+import itertools
+import math
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from object_detection.yolo_detector import Detection
+
+# Association
+IOU_MATCH_THRESHOLD = 0.3
+MAX_MISSED_UPDATES = 5      # detector updates a track may miss before it is dropped
+ALERT_MAX_MISSED = 1        # ... and may miss while still alerting on prediction
+
+# Alpha-beta filter gains for distance (m) and approach velocity (m/s)
+DISTANCE_ALPHA = 0.5
+DISTANCE_BETA = 0.15
+# Smoothing of the bbox velocity used to predict boxes between detections
+BOX_VELOCITY_ALPHA = 0.5
+
+# Alerts: time-to-collision first, distance only as a last-resort floor
+# for things that are already very close but not approaching
+TTC_STOP_SEC = 2.0
+TTC_WARN_SEC = 4.0
+STOP_DISTANCE_M = 0.7
+WARN_DISTANCE_M = 1.5
+MIN_APPROACH_SPEED = 0.1    # m/s, slower closing speeds are treated as static
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU between (N, 4) and (M, 4) xyxy boxes.
+    """
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class Track:
+    """One tracked object with smoothed distance and approach velocity."""
+
+    def __init__(self, track_id: int, det: Detection, distance: float, now: float):
+        self.track_id = track_id
+        self.detection = det
+        self.class_id = det.class_id
+        self.bbox = np.asarray(det.bbox, dtype=np.float32)
+        self._measured_bbox = self.bbox
+        self.bbox_velocity = np.zeros(4, dtype=np.float32)  # px/s
+        self.distance = distance
+        self.velocity = 0.0  # m/s, negative = approaching
+        self.last_update = now
+        self.last_predict = now
+        self.hits = 1
+        self.missed = 0
+
+    @property
+    def ttc(self) -> float:
+        """Seconds until contact at the current closing speed (inf if not approaching)."""
+        if self.velocity > -MIN_APPROACH_SPEED:
+            return math.inf
+        return max(0.0, self.distance / -self.velocity)
+
+    def predict(self, now: float):
+        dt = now - self.last_predict
+        if dt <= 0:
+            return
+        self.bbox = self.bbox + self.bbox_velocity * dt
+        self.distance = max(0.0, self.distance + self.velocity * dt)
+        self.last_predict = now
+
+    def correct(self, det: Detection, distance: float, now: float):
+        dt = max(now - self.last_update, 1e-3)
+        self.predict(now)
+
+        # Alpha-beta update on the predicted distance
+        residual = distance - self.distance
+        self.distance = max(0.0, self.distance + DISTANCE_ALPHA * residual)
+        self.velocity += DISTANCE_BETA * residual / dt
+
+        new_bbox = np.asarray(det.bbox, dtype=np.float32)
+        observed_velocity = (new_bbox - self._measured_bbox) / dt
+        self.bbox_velocity += BOX_VELOCITY_ALPHA * (observed_velocity - self.bbox_velocity)
+        self.bbox = new_bbox
+        self._measured_bbox = new_bbox
+
+        self.detection = det
+        self.last_update = now
+        self.hits += 1
+        self.missed = 0
+
+    @property
+    def stale(self) -> bool:
+        """No fresh measurement for more than ALERT_MAX_MISSED detector updates."""
+        return self.missed > ALERT_MAX_MISSED
+
+    def alert_level(self) -> Optional[str]:
+        """'stop', 'warn' or None; stale tracks are kept for matching but never alert."""
+        if self.stale:
+            return None
+        ttc = self.ttc
+        if ttc < TTC_STOP_SEC or self.distance < STOP_DISTANCE_M:
+            return "stop"
+        if ttc < TTC_WARN_SEC or self.distance < WARN_DISTANCE_M:
+            return "warn"
+        return None
+
+
+class ObjectTracker:
+    """
+    IoU tracker with an alpha-beta filter per track.
+
+    update() takes the (Detection, distance, is_obstacle) tuples from
+    DistanceEstimator; predict() advances all tracks when the detector is
+    skipped for a frame. Both may be called from different threads.
+    """
+
+    def __init__(self, iou_threshold: float = IOU_MATCH_THRESHOLD, max_missed: int = MAX_MISSED_UPDATES):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks: List[Track] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def predict(self, now: float) -> List[Track]:
+        with self._lock:
+            for track in self.tracks:
+                track.predict(now)
+            return list(self.tracks)
+
+    def update(self, obstacle_info: List[Tuple[Detection, float, bool]], now: float) -> List[Track]:
+        with self._lock:
+            for track in self.tracks:
+                track.predict(now)
+
+            det_boxes = np.array([det.bbox for det, _, _ in obstacle_info], dtype=np.float32).reshape(-1, 4)
+            track_boxes = np.array([t.bbox for t in self.tracks], dtype=np.float32).reshape(-1, 4)
+            ious = iou_matrix(track_boxes, det_boxes)
+
+            # Only same-class pairs may match
+            if ious.size:
+                track_cls = np.array([t.class_id for t in self.tracks])
+                det_cls = np.array([det.class_id for det, _, _ in obstacle_info])
+                ious[track_cls[:, None] != det_cls[None, :]] = 0.0
+
+            # Greedy assignment, best IoU first
+            matched_tracks = set()
+            matched_dets = set()
+            if ious.size:
+                order = np.argsort(ious, axis=None)[::-1]
+                for flat in order:
+                    ti, di = divmod(int(flat), ious.shape[1])
+                    if ious[ti, di] < self.iou_threshold:
+                        break
+                    if ti in matched_tracks or di in matched_dets:
+                        continue
+                    det, dist, _ = obstacle_info[di]
+                    self.tracks[ti].correct(det, dist, now)
+                    matched_tracks.add(ti)
+                    matched_dets.add(di)
+
+            survivors = []
+            for ti, track in enumerate(self.tracks):
+                if ti not in matched_tracks:
+                    track.missed += 1
+                    if track.missed > self.max_missed:
+                        continue
+                survivors.append(track)
+
+            for di, (det, dist, _) in enumerate(obstacle_info):
+                if di not in matched_dets:
+                    survivors.append(Track(next(self._ids), det, dist, now))
+
+            self.tracks = survivors
+            return list(self.tracks)
+
+    def most_urgent(self) -> Optional[Track]:
+        """Track with the lowest time-to-collision, ties broken by distance."""
+        with self._lock:
+            if not self.tracks:
+                return None
+            return min(self.tracks, key=lambda t: (t.ttc, t.distance))
+
+    def needs_detection(self) -> bool:
+        """
+        True when the detector must not be skipped: no tracks to predict
+        from, or something is already inside the alert envelope.
+        """
+        with self._lock:
+            if not self.tracks:
+                return True
+            return any(t.alert_level() is not None for t in self.tracks)
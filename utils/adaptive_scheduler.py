@@ -0,0 +1,131 @@
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from utils.helpers import log
+
+KNOTS_TO_MPS = 0.514444
+
+# Vision frame-rate bounds (frames per second)
+MIN_FPS = 3.0           # standing still, empty scene
+MAX_FPS = 20.0
+HAZARD_MIN_FPS = 10.0   # never go below this while something is close
+FPS_PER_MPS = 8.0       # extra fps per m/s of walking speed
+FPS_PER_TRACK = 1.0     # extra fps per tracked object (busy scenes)
+STILL_SPEED_MPS = 0.2   # below this the user is treated as standing
+
+# Low-resolution inference when nothing is going on (YOLO input scale)
+LOW_RES_SCALE = 0.5
+
+# Thermal management (Raspberry Pi)
+THERMAL_ZONE = Path("/sys/class/thermal/thermal_zone0/temp")
+THROTTLED_FLAG = Path("/sys/devices/platform/soc/soc:firmware/get_throttled")
+THERMAL_POLL_SEC = 5.0
+SOFT_TEMP_C = 70.0      # start backing off
+HARD_TEMP_C = 80.0      # Pi firmware throttles at ~80-85 C
+THROTTLED_MAX_FPS = 6.0
+
+# Navigation tick interval (seconds)
+NAV_INTERVAL_MOVING = 0.2
+NAV_INTERVAL_STILL = 1.0
+
+
+class VisionPlan(NamedTuple):
+    frame_interval: float   # seconds between captures
+    detect_every: int       # run the detector on every Nth frame
+    resolution_scale: float # YOLO input scale (1.0 = full)
+    reason: str
+
+
+class AdaptiveScheduler:
+    """
+    Chooses vision frame rate and model resolution from walking speed,
+    scene activity and CPU temperature.
+
+    Safety rule: while any track is inside the alert envelope the plan is
+    at least HAZARD_MIN_FPS, detector on every frame, full resolution,
+    regardless of speed or temperature.
+    """
+
+    def __init__(self):
+        self.speed_mps = 0.0
+        self.track_count = 0
+        self.hazard = False
+
+        self.temp_c: Optional[float] = None
+        self.throttled = False
+        self._last_thermal_poll = 0.0
+        self._last_reason = ""
+
+    # --- inputs -------------------------------------------------------------
+
+    def update_speed(self, speed_knots: Optional[float]):
+        if speed_knots is not None:
+            self.speed_mps = max(0.0, float(speed_knots) * KNOTS_TO_MPS)
+
+    def update_scene(self, track_count: int, hazard: bool):
+        self.track_count = track_count
+        self.hazard = hazard
+
+    def _poll_thermal(self):
+        now = time.monotonic()
+        if now - self._last_thermal_poll < THERMAL_POLL_SEC:
+            return
+        self._last_thermal_poll = now
+
+        try:
+            self.temp_c = int(THERMAL_ZONE.read_text().strip()) / 1000.0
+        except (OSError, ValueError):
+            self.temp_c = None
+
+        try:
+            # Bit 2: currently throttled, bit 1: arm frequency capped
+            self.throttled = bool(int(THROTTLED_FLAG.read_text().strip(), 16) & 0x6)
+        except (OSError, ValueError):
+            self.throttled = False
+
+    # --- outputs ------------------------------------------------------------
+
+    def vision_plan(self) -> VisionPlan:
+        self._poll_thermal()
+
+        if self.hazard:
+            fps = max(HAZARD_MIN_FPS, min(MAX_FPS, MIN_FPS + self.speed_mps * FPS_PER_MPS))
+            plan = VisionPlan(1.0 / fps, 1, 1.0, "hazard")
+            self._log_change(plan)
+            return plan
+
+        fps = MIN_FPS + self.speed_mps * FPS_PER_MPS + self.track_count * FPS_PER_TRACK
+        fps = min(MAX_FPS, fps)
+        reason = "moving" if self.speed_mps >= STILL_SPEED_MPS else "still"
+
+        temp = self.temp_c or 0.0
+        if self.throttled or temp >= HARD_TEMP_C:
+            fps = min(fps, THROTTLED_MAX_FPS)
+            reason = "throttled"
+        elif temp >= SOFT_TEMP_C:
+            # Linear back-off between the soft and hard limits
+            headroom = (HARD_TEMP_C - temp) / (HARD_TEMP_C - SOFT_TEMP_C)
+            fps = min(fps, THROTTLED_MAX_FPS + headroom * (MAX_FPS - THROTTLED_MAX_FPS))
+            reason = "warm"
+
+        idle = self.speed_mps < STILL_SPEED_MPS and self.track_count == 0
+        scale = LOW_RES_SCALE if idle or reason == "throttled" else 1.0
+        detect_every = 1 if self.track_count == 0 else 2
+
+        plan = VisionPlan(1.0 / max(fps, MIN_FPS), detect_every, scale, reason)
+        self._log_change(plan)
+        return plan
+
+    def navigation_interval(self) -> float:
+        if self.speed_mps >= STILL_SPEED_MPS:
+            return NAV_INTERVAL_MOVING
+        return NAV_INTERVAL_STILL
+
+    def _log_change(self, plan: VisionPlan):
+        if plan.reason != self._last_reason:
+            log(
+                f"Vision schedule: {plan.reason}, {1.0 / plan.frame_interval:.1f} fps, "
+                f"detect every {plan.detect_every}, scale {plan.resolution_scale}"
+            )
+            self._last_reason = plan.reason
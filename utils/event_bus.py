@@ -0,0 +1,207 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from utils.helpers import log
+from utils.metrics import METRICS
+
+# Pause before a supervised task is started again (seconds)
+TASK_RESTART_DELAY_SEC = 1.0
+
+
+# --- events -----------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Event:
+    """Base class; subscribers receive instances of the type they asked for and its subclasses."""
+
+
+@dataclass(frozen=True)
+class FrameProcessed(Event):
+    packet: Any                     # utils.pipeline.FramePacket after the decision stage
+
+
+@dataclass(frozen=True)
+class GPSFixEvent(Event):
+    fix: Any                        # gps_reader.GPSFix
+
+
+@dataclass(frozen=True)
+class VoiceCommand(Event):
+    command: str                    # feedback.voice_input.COMMANDS value
+    timestamp: float
+
+
+@dataclass(frozen=True)
+class ObstacleAlert(Event):
+    level: str                      # "stop" or "warn"
+    track_ids: Tuple[int, ...] = field(default_factory=tuple)
+
+
+# --- bus --------------------------------------------------------------------
+
+
+class Subscription:
+    """
+    One subscriber's queue.
+
+    policy "latest": a full queue drops its oldest event (frames, fixes);
+    policy "block": publishers wait for room (commands, alerts).
+
+    Usable as a context manager, so a task that ends or crashes does not
+    leave a queue behind that publishers keep filling (or block on).
+    """
+
+    def __init__(self, bus: "EventBus", types: Tuple[Type[Event], ...], maxsize: int, policy: str):
+        if policy not in ("latest", "block"):
+            raise ValueError(f"Unknown subscription policy: {policy}")
+        self.bus = bus
+        self.types = types
+        self.policy = policy
+        self.queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue(maxsize=max(1, maxsize))
+        self.dropped = 0
+        self.closed = False
+
+    async def _deliver(self, event: Event):
+        if self.closed:
+            return
+        if self.policy == "block":
+            await self.queue.put(event)
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """
+        Next event; None on timeout or once the subscription is closed.
+        """
+        if self.closed and self.queue.empty():
+            return None
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Event:
+        event = await self.queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.bus._unsubscribe(self)
+        # Wake a consumer blocked in get()/async for
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class EventBus:
+    """
+    Typed publish/subscribe on an asyncio loop.
+
+    Every subscriber has its own bounded queue, so a slow consumer only
+    delays itself (policy "latest") or, deliberately, its publishers
+    (policy "block"). Threads (camera pipeline, GPS reader, recognizer)
+    publish with publish_threadsafe().
+    """
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop or asyncio.get_running_loop()
+        self._subs: List[Subscription] = []
+        self.published: Dict[str, int] = {}
+
+    def subscribe(self, *types: Type[Event], maxsize: int = 8, policy: str = "latest") -> Subscription:
+        sub = Subscription(self, types or (Event,), maxsize, policy)
+        self._subs.append(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription):
+        if sub in self._subs:
+            self._subs.remove(sub)
+
+    async def publish(self, event: Event):
+        name = type(event).__name__
+        self.published[name] = self.published.get(name, 0) + 1
+        for sub in list(self._subs):
+            if isinstance(event, sub.types):
+                await sub._deliver(event)
+
+    def publish_threadsafe(self, event: Event, timeout: Optional[float] = None) -> bool:
+        """
+        Publishes from another thread. With `timeout`, waits up to that long
+        for "block" subscribers to accept the event (backpressure on the
+        producing thread); returns False if it did not get through.
+        """
+        if self.loop.is_closed():
+            return False
+        try:
+            future = asyncio.run_coroutine_threadsafe(self.publish(event), self.loop)
+        except RuntimeError:
+            return False
+        if timeout is None:
+            return True
+        try:
+            future.result(timeout)
+            return True
+        except Exception:
+            future.cancel()
+            return False
+
+    def close(self):
+        for sub in list(self._subs):
+            sub.close()
+
+    def summary(self) -> str:
+        drops = {f"{'/'.join(t.__name__ for t in s.types)}": s.dropped for s in self._subs if s.dropped}
+        text = "Events: " + ", ".join(f"{k}={v}" for k, v in sorted(self.published.items()))
+        if drops:
+            text += " | dropped: " + ", ".join(f"{k}={v}" for k, v in drops.items())
+        return text
+
+
+async def cancel_tasks(tasks, timeout: float = 2.0):
+    """Cancels tasks and waits (bounded) for them to finish."""
+    for task in tasks:
+        task.cancel()
+    if not tasks:
+        return
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in done:
+        if not task.cancelled() and task.exception() is not None:
+            log(f"Task {task.get_name()} failed: {task.exception()!r}")
+    for task in pending:
+        log(f"Task {task.get_name()} did not stop within {timeout}s")
+
+
+async def supervise(name: str, factory: Callable[[], Awaitable], delay: float = TASK_RESTART_DELAY_SEC):
+    """
+    Runs `factory()` until cancelled, starting it again after `delay`
+    whenever it raises or returns. For tasks whose failure must not end
+    the run.
+    """
+    while True:
+        try:
+            await factory()
+            log(f"Task {name} returned; restarting")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log(f"Task {name} crashed: {e!r}; restarting")
+        METRICS.counter("task_restarts", task=name).inc()
+        await asyncio.sleep(delay)
@@ -0,0 +1,195 @@
+import threading
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+import torch
+
+# YOLO needs input sides that are a multiple of its largest stride
+YOLO_STRIDE = 32
+# Frames that can be in flight at once (held by a stage, a queue or a
+# worker process); capture drops frames while every slot is in use
+FRAME_RING_SIZE = 8
+
+
+def _round_up(value: int, multiple: int) -> int:
+    return (value + multiple - 1) // multiple * multiple
+
+
+class PreprocessedFrame:
+    """
+    One camera frame, converted once and shared by every model.
+
+    rgb:        uint8 (H, W, 3) RGB pixels (preallocated, reused)
+    yolo_input: float32 (1, 3, Hp, Wp) in [0, 1], zero padded on the
+                bottom/right to a multiple of YOLO_STRIDE, so bbox
+                coordinates are the same as in `rgb`
+    """
+
+    __slots__ = ("frame_id", "slot", "rgb", "yolo_input", "_depth_input", "_depth_ready")
+
+    def __init__(self, height: int, width: int, rgb: Optional[np.ndarray] = None):
+        self.frame_id = -1
+        # Index in the owning FrameRing
+        self.slot = -1
+        self.rgb = np.empty((height, width, 3), dtype=np.uint8) if rgb is None else rgb
+        self.yolo_input = torch.zeros(
+            (1, 3, _round_up(height, YOLO_STRIDE), _round_up(width, YOLO_STRIDE)),
+            dtype=torch.float32,
+        )
+        self._depth_input = torch.empty((3, height, width), dtype=torch.float32)
+        self._depth_ready = False
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.rgb.shape
+
+    def _preprocess(self):
+        h, w = self.rgb.shape[:2]
+        # torch.from_numpy shares memory with the slot: no copy until the
+        # single uint8 -> float conversion into the preallocated tensor
+        chw = torch.from_numpy(self.rgb).permute(2, 0, 1)
+        unit = self.yolo_input[0, :, :h, :w]
+        unit.copy_(chw)
+        unit.div_(255.0)
+        self._depth_ready = False
+
+    def depth_input(self) -> torch.Tensor:
+        """
+        (3, H, W) tensor normalised like the Depth Pro transform ([-1, 1]).
+        Derived from `yolo_input` on first use, once per frame.
+        """
+        if not self._depth_ready:
+            h, w = self.rgb.shape[:2]
+            torch.mul(self.yolo_input[0, :, :h, :w], 2.0, out=self._depth_input)
+            self._depth_input.sub_(1.0)
+            self._depth_ready = True
+        return self._depth_input
+
+
+class FrameRing:
+    """
+    Fixed pool of PreprocessedFrame slots, so the capture path does no
+    per-frame allocation.
+
+    write() takes a free slot and the frame stays the caller's until it
+    is handed back with release(); a slot is never overwritten while a
+    stage (or worker process) still reads it. With every slot in use,
+    write() drops the new frame instead.
+    """
+
+    def __init__(
+        self,
+        height: int,
+        width: int,
+        size: int = FRAME_RING_SIZE,
+        pixels: Optional[np.ndarray] = None,
+        preprocess: bool = True,
+    ):
+        """
+        pixels: optional (size, height, width, 3) uint8 storage for the slots.
+        preprocess: fill the model tensors on write(); off when only worker
+        processes read the frames (they preprocess their own view).
+        """
+        self.slots = [
+            PreprocessedFrame(height, width, None if pixels is None else pixels[i])
+            for i in range(size)
+        ]
+        for i, slot in enumerate(self.slots):
+            slot.slot = i
+        self._free = deque(range(size))
+        self._in_use = [False] * size
+        self._lock = threading.Lock()
+        self._frame_id = 0
+        self.preprocess = preprocess
+        self.dropped = 0
+
+    @property
+    def available(self) -> int:
+        return len(self._free)
+
+    def write(self, src: np.ndarray) -> Optional[PreprocessedFrame]:
+        """
+        Copies an RGB(X) image (e.g. a mapped camera buffer) into a free
+        slot and preprocesses it (if enabled). `src` may have an extra alpha/padding
+        channel; only the first three are used. Returns None (frame
+        dropped) when no slot is free.
+        """
+        with self._lock:
+            if not self._free:
+                self.dropped += 1
+                return None
+            index = self._free.popleft()
+            self._in_use[index] = True
+            self._frame_id += 1
+            frame_id = self._frame_id
+        slot = self.slots[index]
+
+        h, w = slot.rgb.shape[:2]
+        np.copyto(slot.rgb, src[:h, :w, :3])
+        if self.preprocess:
+            slot._preprocess()
+
+        slot.frame_id = frame_id
+        return slot
+
+    def release(self, frame: PreprocessedFrame):
+        """Returns a frame's slot to the pool; releasing twice is harmless."""
+        with self._lock:
+            if 0 <= frame.slot < len(self._in_use) and self._in_use[frame.slot]:
+                self._in_use[frame.slot] = False
+                self._free.append(frame.slot)
+
+
+class SharedFrameRing(FrameRing):
+    """
+    FrameRing whose RGB pixels live in one multiprocessing.shared_memory
+    block. Worker processes attach by name and read a frame by its slot
+    index; pixels are never pickled or copied between processes.
+
+    The tensors are per process: each side preprocesses its own view.
+    Only the creating process unlinks the block; attach from processes
+    started with multiprocessing, which share its resource tracker.
+    """
+
+    def __init__(
+        self,
+        height: int,
+        width: int,
+        size: int = FRAME_RING_SIZE,
+        name: Optional[str] = None,
+        preprocess: bool = True,
+    ):
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=self.owner, size=size * height * width * 3 if self.owner else 0
+        )
+        self.height, self.width, self.size = height, width, size
+        pixels = np.ndarray((size, height, width, 3), dtype=np.uint8, buffer=self.shm.buf)
+        super().__init__(height, width, size, pixels=pixels, preprocess=preprocess)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self):
+        # Views into the block must be gone before it can be closed
+        self.slots = []
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+        if self.owner:
+            self.shm.unlink()
+
+
+def as_rgb(frame) -> np.ndarray:
+    """
+    RGB uint8 array for either a PreprocessedFrame (no copy) or a plain
+    BGR array as returned by OpenCV.
+    """
+    if isinstance(frame, PreprocessedFrame):
+        return frame.rgb
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -1,5 +1,7 @@
 import logging
 
+import numpy as np
+
 # Initialize a simple logger
 logging.basicConfig(level=logging.INFO)
 
@@ -28,3 +30,25 @@ def get_relative_position(bbox: tuple, frame_width: int) -> str:
     elif center_x > 2 * frame_width / 3:
         return "right"
     return "center"
+
+
+def position_bins(bboxes: np.ndarray, frame_width: int, min_overlap: float = 0.25) -> np.ndarray:
+    """
+    Vectorized left/center/right membership for (N, 4) xyxy boxes.
+
+    Returns an (N, 3) boolean array: a box belongs to the third that holds
+    its center (as in get_relative_position) and to any other third it
+    covers by at least `min_overlap` of that third's width, so a wide
+    obstacle shows up on several motors.
+    """
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    third = frame_width / 3
+    edges = np.array([0.0, third, 2 * third], dtype=np.float32)
+
+    overlap = np.minimum(bboxes[:, 2:3], edges + third) - np.maximum(bboxes[:, 0:1], edges)
+    covered = np.clip(overlap, 0, None) >= min_overlap * third
+
+    center_x = (bboxes[:, 0] + bboxes[:, 2]) / 2
+    center_bin = np.clip((center_x // third).astype(np.int64), 0, 2)
+    covered[np.arange(len(bboxes)), center_bin] = True
+    return covered
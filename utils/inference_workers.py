@@ -0,0 +1,296 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, Sequence, Tuple
+
+from utils.helpers import log
+from utils.metrics import METRICS
+
+if TYPE_CHECKING:
+    from utils.frame_buffer import SharedFrameRing
+
+# Cores for each model process on a 4-core Pi; cores 0-1 are left to the
+# main process (capture, Vosk, TTS, event loop)
+WORKER_CORES = {"yolo": (2,), "depth": (3,)}
+
+# A request not answered in time counts as a hung worker (seconds)
+WORKER_TIMEOUT_SEC = {"yolo": 2.0, "depth": 20.0}
+# Model load and warm-up in a fresh process
+WORKER_START_TIMEOUT_SEC = 300.0
+# Delay before restarting a failed worker, doubled per failed attempt
+RESTART_BACKOFF_SEC = 0.5
+MAX_RESTART_BACKOFF_SEC = 30.0
+
+# Spawned, not forked: the parent runs threads (audio, GPS, loader) that
+# a fork would copy in an undefined state
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class WorkerUnavailable(RuntimeError):
+    """The worker process is restarting, or did not answer in time."""
+
+
+def pin_to_cores(cores: Sequence[int]) -> Tuple[int, ...]:
+    """
+    Restricts the calling thread (and threads it starts later) to the
+    `cores` this machine has. Returns the cores actually used.
+    """
+    usable = tuple(c for c in cores if c < (os.cpu_count() or 1))
+    if not usable or not hasattr(os, "sched_setaffinity"):
+        return ()
+    try:
+        os.sched_setaffinity(0, usable)
+    except OSError:
+        return ()
+    return usable
+
+
+def _load_model(kind: str):
+    if kind == "yolo":
+        from object_detection.yolo_detector import YOLODetector
+
+        return YOLODetector()
+    if kind == "depth":
+        from distance_estimation.distance_estimator import DistanceEstimator
+
+        return DistanceEstimator()
+    raise ValueError(f"Unknown worker kind: {kind}")
+
+
+def _worker_main(kind: str, conn, ring_name: str, height: int, width: int, size: int, cores):
+    """
+    Model process: pin, load and warm up, then answer (slot, args)
+    requests with ("ok", result) or ("error", message) until told to stop.
+    """
+    # Ctrl-C reaches the whole process group; the parent shuts us down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Before torch starts its thread pool, so every thread inherits it
+    used = pin_to_cores(cores)
+
+    import torch
+
+    from utils.frame_buffer import PreprocessedFrame, SharedFrameRing
+
+    if used:
+        torch.set_num_threads(len(used))
+
+    frames = SharedFrameRing(height, width, size, name=ring_name)
+    model = _load_model(kind)
+
+    # Private frame: the shared slots belong to the camera
+    blank = PreprocessedFrame(height, width)
+    blank.rgb[:] = 0
+    blank._preprocess()
+    model.warmup(blank)
+    conn.send(("ready", dict(model.names) if kind == "yolo" else None))
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        slot, args = request
+        frame = frames.slots[slot]
+        frame._preprocess()
+        try:
+            if kind == "yolo":
+                result = model.detect_array(frame, *args)
+            else:
+                result = model.estimate_distance(frame, *args)
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+            continue
+        conn.send(("ok", result))
+
+    frames.close()
+
+
+class InferenceWorker:
+    """
+    One model in a dedicated process pinned to `cores`.
+
+    call() passes a frame by its slot in the shared ring plus small
+    arguments over a pipe, and returns the model's result. A worker that
+    dies or stops answering is killed and restarted in the background;
+    calls fail fast with WorkerUnavailable until it is back.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        frames: "SharedFrameRing",
+        cores: Optional[Sequence[int]] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.kind = kind
+        self.frames = frames
+        self.cores = tuple(WORKER_CORES.get(kind, ()) if cores is None else cores)
+        self.timeout = WORKER_TIMEOUT_SEC.get(kind, 5.0) if timeout is None else timeout
+
+        # Sent by the worker once ready (YOLO: class names)
+        self.info = None
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._closed = False
+        self._backoff = RESTART_BACKOFF_SEC
+
+        # The first start blocks (model load); a failure raises here
+        self._start()
+
+    def _start(self):
+        conn, child_conn = _CONTEXT.Pipe()
+        process = _CONTEXT.Process(
+            target=_worker_main,
+            args=(
+                self.kind,
+                child_conn,
+                self.frames.name,
+                self.frames.height,
+                self.frames.width,
+                self.frames.size,
+                self.cores,
+            ),
+            name=f"{self.kind}-worker",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+
+        try:
+            if not conn.poll(WORKER_START_TIMEOUT_SEC):
+                raise WorkerUnavailable(f"{self.kind} worker did not start")
+            _, self.info = conn.recv()
+        except (EOFError, WorkerUnavailable) as e:
+            process.kill()
+            process.join()
+            conn.close()
+            if isinstance(e, EOFError):
+                raise WorkerUnavailable(
+                    f"{self.kind} worker exited during startup (code {process.exitcode})"
+                ) from e
+            raise
+
+        self._process, self._conn = process, conn
+        self._ready.set()
+        log(f"{self.kind} worker running (pid {process.pid}, cores {self.cores or 'any'})")
+
+    def call(self, frame, *args):
+        """
+        Runs the model on `frame` (a slot of the shared ring) in the worker.
+
+        The worker reads the slot's pixels until it answers, so the caller
+        must keep the slot acquired until call() returns. That also holds
+        on failure: a worker that timed out is killed, and reaped, before
+        WorkerUnavailable is raised.
+        """
+        if not self._ready.is_set():
+            raise WorkerUnavailable(f"{self.kind} worker is restarting")
+
+        with self._lock:
+            try:
+                self._conn.send((frame.slot, args))
+                if not self._conn.poll(self.timeout):
+                    raise TimeoutError(f"no answer in {self.timeout:.1f}s")
+                status, result = self._conn.recv()
+            except (EOFError, OSError, TimeoutError) as e:
+                reason = str(e) or "process exited"
+                self._fail(reason)
+                raise WorkerUnavailable(f"{self.kind} worker failed: {reason}") from e
+
+        if status == "error":
+            raise RuntimeError(result)
+        self._backoff = RESTART_BACKOFF_SEC
+        return result
+
+    def _fail(self, reason: str):
+        self._ready.clear()
+        METRICS.counter("worker_restarts", worker=self.kind).inc()
+        log(f"{self.kind} worker failed ({reason}); restarting")
+        self._kill()
+        threading.Thread(target=self._restart, name=f"{self.kind}-restart", daemon=True).start()
+
+    def _kill(self):
+        if self._conn is not None:
+            self._conn.close()
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.kill()
+            # SIGKILL cannot be ignored: once joined, it reads no more frames
+            self._process.join()
+
+    def _restart(self):
+        while not self._closed:
+            time.sleep(self._backoff)
+            self._backoff = min(self._backoff * 2.0, MAX_RESTART_BACKOFF_SEC)
+            try:
+                self._start()
+            except Exception as e:
+                log(f"{self.kind} worker restart failed: {e}")
+                continue
+            if self._closed:
+                self._kill()
+            return
+
+    def close(self, timeout: float = 2.0):
+        self._closed = True
+        self._ready.clear()
+        with self._lock:
+            if self._conn is None or self._process is None:
+                return
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._process.join(timeout)
+            self._kill()
+
+
+class RemoteDetector:
+    """YOLODetector running in an InferenceWorker; same detect() interface."""
+
+    def __init__(self, frames: "SharedFrameRing", cores: Optional[Sequence[int]] = None):
+        self.worker = InferenceWorker("yolo", frames, cores)
+        self.names = self.worker.info
+
+    @METRICS.timed("yolo_detect")
+    def detect(self, frame, scale: float = 1.0):
+        """frame: a slot of the worker's SharedFrameRing."""
+        from object_detection.yolo_detector import DetectionList
+
+        return DetectionList(self.detect_array(frame, scale), self.names)
+
+    def detect_array(self, frame, scale: float = 1.0):
+        return self.worker.call(frame, scale)
+
+    def close(self):
+        self.worker.close()
+
+
+class RemoteDistanceEstimator:
+    """DistanceEstimator running in an InferenceWorker; its depth cache lives there too."""
+
+    def __init__(self, frames: "SharedFrameRing", cores: Optional[Sequence[int]] = None):
+        self.worker = InferenceWorker("depth", frames, cores)
+
+    @METRICS.timed("depth_estimate")
+    def estimate_distance(
+        self,
+        frame,
+        detections,
+        max_detections: Optional[int] = None,
+        prefer_geometry: bool = False,
+    ):
+        if not detections:
+            return []
+        return self.worker.call(frame, list(detections), max_detections, prefer_geometry)
+
+    def close(self):
+        self.worker.close()
@@ -0,0 +1,304 @@
+import bisect
+import functools
+import http.server
+import os
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from utils.helpers import log
+
+# Histogram bucket upper bounds (milliseconds), Prometheus "le" labels
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+METRIC_PREFIX = "blindnav_"
+# Local endpoint: http://127.0.0.1:9108/metrics
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, str]) -> LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Shards:
+    """
+    Per-thread storage for one metric. Each thread writes only its own
+    shard (no lock on the hot path); readers sum all shards.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._all: List[list] = []
+        self._lock = threading.Lock()
+
+    def mine(self) -> list:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0] * self.size
+            self._local.shard = shard
+            with self._lock:
+                self._all.append(shard)
+        return shard
+
+    def total(self) -> list:
+        with self._lock:
+            shards = list(self._all)
+        out = [0] * self.size
+        for shard in shards:
+            for i, v in enumerate(shard):
+                out[i] += v
+        return out
+
+
+class Counter:
+    def __init__(self, name: str, labels: Tuple[Tuple[str, str], ...], help_text: str = ""):
+        self.name, self.labels, self.help = name, labels, help_text
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1):
+        self._shards.mine()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._shards.total()[0]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (ms); shards hold counts, then sum."""
+
+    def __init__(self, name: str, labels: Tuple[Tuple[str, str], ...], help_text: str = ""):
+        self.name, self.labels, self.help = name, labels, help_text
+        self._shards = _Shards(len(BUCKETS_MS) + 1)
+
+    def observe(self, ms: float):
+        shard = self._shards.mine()
+        shard[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        shard[-1] += ms
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        totals = self._shards.total()
+        return totals[:-1], totals[-1]
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound holding the q-quantile (0..1); 0 when empty."""
+        counts, _ = self.snapshot()
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return BUCKETS_MS[-1]
+
+
+class Gauge:
+    def __init__(self, name: str, labels: Tuple[Tuple[str, str], ...], help_text: str = ""):
+        self.name, self.labels, self.help = name, labels, help_text
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Registry:
+    """All metrics of the process, by (name, labels)."""
+
+    def __init__(self):
+        self._metrics: Dict[LabelKey, object] = {}
+        self._lock = threading.Lock()
+        self.enabled = True
+
+    def _get(self, cls, name: str, help_text: str, labels: Dict[str, str]):
+        key = _key(name, labels)
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = cls(name, key[1], help_text)
+                    self._metrics[key] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        return self._get(Counter, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str = "", **labels) -> Histogram:
+        return self._get(Histogram, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str = "", **labels) -> Gauge:
+        return self._get(Gauge, name, help_text, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """`with METRICS.timer("detect"):` records the block's duration in ms."""
+        if not self.enabled:
+            yield
+            return
+        hist = self.histogram(name, **labels)
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            hist.observe((time.perf_counter_ns() - start) / 1e6)
+
+    def timed(self, name: str, **labels):
+        """Decorator form of timer(); the histogram is looked up once."""
+
+        def decorate(fn):
+            hist = self.histogram(name, **labels)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    hist.observe((time.perf_counter_ns() - start) / 1e6)
+
+            return wrapper
+
+        return decorate
+
+    # --- export -------------------------------------------------------------
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: (m.name, m.labels))
+
+        lines = []
+        declared = set()
+        for m in metrics:
+            full = METRIC_PREFIX + m.name
+            if isinstance(m, Histogram):
+                kind, full = "histogram", full + "_ms"
+            elif isinstance(m, Counter):
+                kind, full = "counter", full + "_total"
+            else:
+                kind = "gauge"
+            if full not in declared:
+                declared.add(full)
+                if m.help:
+                    lines.append(f"# HELP {full} {m.help}")
+                lines.append(f"# TYPE {full} {kind}")
+
+            if isinstance(m, Histogram):
+                counts, total_ms = m.snapshot()
+                cumulative = 0
+                for bound, count in zip(BUCKETS_MS, counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    labels = _label_text(m.labels, 'le="%s"' % le)
+                    lines.append(f"{full}_bucket{labels} {cumulative}")
+                lines.append(f"{full}_sum{_label_text(m.labels)} {total_ms:.3f}")
+                lines.append(f"{full}_count{_label_text(m.labels)} {cumulative}")
+            else:
+                lines.append(f"{full}{_label_text(m.labels)} {m.value:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """One log line: p50/p95 of every timer and all non-zero counters."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: (m.name, m.labels))
+
+        parts = []
+        for m in metrics:
+            label = m.name + "".join(f"[{v}]" for _, v in m.labels)
+            if isinstance(m, Histogram):
+                counts, _ = m.snapshot()
+                if sum(counts):
+                    parts.append(f"{label} p50<={m.quantile(0.5):g}ms p95<={m.quantile(0.95):g}ms")
+            elif isinstance(m, Counter) and m.value:
+                parts.append(f"{label}={m.value:g}")
+        return "Metrics: " + ", ".join(parts)
+
+
+# Process-wide registry used by the instrumented modules
+METRICS = Registry()
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry: Registry = METRICS
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UnixMetricsHandler(socketserver.StreamRequestHandler):
+    registry: Registry = METRICS
+
+    def handle(self):
+        self.wfile.write(self.registry.render_prometheus().encode("utf-8"))
+
+
+class MetricsServer:
+    """
+    Serves the registry in Prometheus text format on a local HTTP port
+    and/or a Unix socket (`socat - UNIX-CONNECT:path`), on daemon threads.
+    """
+
+    def __init__(
+        self,
+        registry: Registry = METRICS,
+        host: str = METRICS_HOST,
+        port: Optional[int] = METRICS_PORT,
+        unix_path: Optional[str] = None,
+    ):
+        self._servers = []
+
+        if port is not None:
+            handler = type("Handler", (_MetricsHandler,), {"registry": registry})
+            try:
+                self._servers.append(http.server.ThreadingHTTPServer((host, port), handler))
+            except OSError as e:
+                log(f"Metrics HTTP endpoint disabled ({e})")
+
+        if unix_path is not None:
+            handler = type("Handler", (_UnixMetricsHandler,), {"registry": registry})
+            try:
+                if os.path.exists(unix_path):
+                    os.unlink(unix_path)
+                self._servers.append(socketserver.ThreadingUnixStreamServer(unix_path, handler))
+            except OSError as e:
+                log(f"Metrics socket disabled ({e})")
+                unix_path = None
+        self.unix_path = unix_path
+
+        for server in self._servers:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+
+    def close(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
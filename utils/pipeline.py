@@ -0,0 +1,294 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.helpers import log
+from utils.metrics import METRICS
+
+# Recent samples kept per stage for percentiles
+STATS_WINDOW = 1000
+
+
+class PipelineClosed(Exception):
+    """Raised by LatestQueue.get once the queue has been closed."""
+
+
+class LatestQueue:
+    """
+    Bounded hand-off between two pipeline stages.
+
+    When the queue is full the OLDEST item is discarded, so the consumer
+    always works on the most recent frame instead of a backlog. Items
+    for which `low_priority(item)` is true never evict one that is not;
+    they are discarded themselves instead.
+    """
+
+    def __init__(self, maxsize: int = 1, low_priority: Optional[Callable[[Any], bool]] = None):
+        self._items: deque = deque(maxlen=max(1, maxsize))
+        self._cond = threading.Condition()
+        self._closed = False
+        self.low_priority = low_priority
+        self.dropped = 0
+
+    def put(self, item: Any) -> Optional[Any]:
+        """
+        Adds an item. Returns the item that was discarded (the evicted
+        stale one, or `item` itself if it yielded), if any.
+        """
+        with self._cond:
+            stale = None
+            if len(self._items) == self._items.maxlen:
+                low = self.low_priority
+                if low is not None and low(item) and not low(self._items[0]):
+                    self.dropped += 1
+                    return item
+                stale = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+            return stale
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Blocks until an item is available.
+        Raises PipelineClosed after close(), TimeoutError on timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise TimeoutError
+            if self._closed:
+                raise PipelineClosed
+            return self._items.popleft()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._items.clear()
+            self._cond.notify_all()
+
+
+@dataclass
+class FramePacket:
+    """One frame travelling through the vision pipeline."""
+
+    frame_id: int
+    frame: Any
+    captured_at: float
+    detections: Optional[list] = field(default_factory=list)  # None: detector skipped
+    obstacle_info: list = field(default_factory=list)
+    tracks: list = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)  # stage -> ms
+
+
+class StageStats:
+    """Rolling timing statistics for one pipeline stage."""
+
+    def __init__(self, name: str, smoothing: float = 0.1):
+        self.name = name
+        self.smoothing = smoothing
+        self.count = 0
+        self.dropped = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+        self.samples: deque = deque(maxlen=STATS_WINDOW)
+
+    def record(self, elapsed_ms: float):
+        self.count += 1
+        self.samples.append(elapsed_ms)
+        self.last_ms = elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if self.count == 1:
+            self.avg_ms = elapsed_ms
+        else:
+            self.avg_ms += self.smoothing * (elapsed_ms - self.avg_ms)
+
+    def percentile(self, q: float) -> float:
+        """q-th percentile (0..100) of the last STATS_WINDOW samples."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, max(0, round(q / 100.0 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "dropped": self.dropped,
+            "last_ms": self.last_ms,
+            "avg_ms": self.avg_ms,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+        }
+
+
+class StagedPipeline:
+    """
+    Runs a capture source and a chain of stages on one worker thread each.
+
+    source: callable returning the next FramePacket (blocks on the camera),
+            or None to skip; raising EOFError ends capture
+    stages: [(name, fn)] where fn(packet) -> packet, or None to drop it
+    sink: optional callable receiving every packet that leaves the last stage
+    release: optional callable receiving every packet once the pipeline is
+             done with it (after the sink, or when it was dropped or
+             evicted), e.g. to return its frame to a FrameRing
+    low_priority: optional predicate for packets that must not evict a
+                  pending one in a full queue (see LatestQueue)
+
+    Stages are connected by LatestQueue hand-offs, so a slow stage never
+    builds up latency: it simply skips to the newest frame.
+    """
+
+    def __init__(
+        self,
+        source: Callable[[], FramePacket],
+        stages: List[Tuple[str, Callable[[FramePacket], Optional[FramePacket]]]],
+        queue_size: int = 1,
+        sink: Optional[Callable[[FramePacket], None]] = None,
+        release: Optional[Callable[[FramePacket], None]] = None,
+        low_priority: Optional[Callable[[FramePacket], bool]] = None,
+    ):
+        self.source = source
+        self.stages = stages
+        self.sink = sink
+        self.release = release
+
+        self._queues = [LatestQueue(queue_size, low_priority) for _ in stages]
+        self._threads: List[threading.Thread] = []
+        self._running = threading.Event()
+        self.source_finished = threading.Event()
+
+        self.stats: Dict[str, StageStats] = {"capture": StageStats("capture")}
+        for name, _ in stages:
+            self.stats[name] = StageStats(name)
+        self.latency = StageStats("end_to_end")
+
+    def start(self):
+        if self._running.is_set():
+            return
+        self._running.set()
+
+        workers = [("capture", self._capture_worker, ())]
+        for idx, (name, fn) in enumerate(self.stages):
+            workers.append((name, self._stage_worker, (idx, name, fn)))
+
+        for name, target, args in workers:
+            t = threading.Thread(target=target, args=args, name=f"pipeline-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 1.0):
+        self._running.clear()
+        for q in self._queues:
+            q.close()
+        for t in self._threads:
+            if t is not threading.current_thread():
+                t.join(timeout)
+        self._threads.clear()
+
+    def _capture_worker(self):
+        first_stage = self.stages[0][0] if self.stages else None
+        dropped = METRICS.counter("frames_dropped", stage=first_stage)
+        while self._running.is_set():
+            start = time.perf_counter()
+            try:
+                packet = self.source()
+            except EOFError:
+                # Finite source (replay) exhausted
+                log("Pipeline source finished")
+                self.source_finished.set()
+                break
+            except Exception as e:
+                log(f"Pipeline capture error: {e}")
+                time.sleep(0.05)
+                continue
+
+            if packet is None:
+                continue
+
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            packet.timings["capture"] = elapsed_ms
+            self.stats["capture"].record(elapsed_ms)
+
+            if first_stage is None:
+                self._release(packet)
+                continue
+            stale = self._queues[0].put(packet)
+            if stale is not None:
+                self.stats[first_stage].dropped += 1
+                dropped.inc()
+                self._release(stale)
+
+    def _stage_worker(self, idx: int, name: str, fn: Callable):
+        inbox = self._queues[idx]
+        is_last = idx == len(self.stages) - 1
+        next_name = None if is_last else self.stages[idx + 1][0]
+        timings = METRICS.histogram("pipeline_stage", stage=name)
+        dropped = METRICS.counter("frames_dropped", stage=next_name)
+
+        while self._running.is_set():
+            try:
+                packet = inbox.get(timeout=0.5)
+            except TimeoutError:
+                continue
+            except PipelineClosed:
+                return
+
+            start = time.perf_counter()
+            received = packet
+            try:
+                packet = fn(packet)
+            except Exception as e:
+                log(f"Pipeline stage '{name}' error: {e}")
+                packet = None
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            self.stats[name].record(elapsed_ms)
+            timings.observe(elapsed_ms)
+
+            if packet is None:
+                self._release(received)
+                continue
+            packet.timings[name] = elapsed_ms
+
+            if is_last:
+                self.latency.record((time.perf_counter() - packet.captured_at) * 1000.0)
+                if self.sink is not None:
+                    try:
+                        self.sink(packet)
+                    except Exception as e:
+                        log(f"Pipeline sink error: {e}")
+                self._release(packet)
+                continue
+
+            stale = self._queues[idx + 1].put(packet)
+            if stale is not None:
+                self.stats[next_name].dropped += 1
+                dropped.inc()
+                self._release(stale)
+
+    def _release(self, packet: FramePacket):
+        if self.release is None:
+            return
+        try:
+            self.release(packet)
+        except Exception as e:
+            log(f"Pipeline release error: {e}")
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage timing plus end-to-end latency, safe to read any time."""
+        snap = {name: s.as_dict() for name, s in self.stats.items()}
+        snap["end_to_end"] = self.latency.as_dict()
+        return snap
+
+    def summary(self) -> str:
+        parts = [
+            f"{name}={s.avg_ms:.1f}ms(drop {s.dropped})"
+            for name, s in self.stats.items()
+        ]
+        parts.append(f"e2e={self.latency.avg_ms:.1f}ms")
+        return "Vision pipeline: " + ", ".join(parts)
@@ -0,0 +1,115 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Set
+
+from utils.helpers import log
+from utils.metrics import METRICS
+
+# Reference point for startup milestones: when this module was first
+# imported, i.e. before main.py's project imports (interpreter start-up
+# and numpy are not included)
+BOOT_TIME = time.perf_counter()
+
+# Model loads run concurrently: YOLO, depth and Vosk (plus spare)
+LOAD_WORKERS = 4
+# How long close() waits for loads that are already running (seconds)
+LOAD_CLOSE_TIMEOUT_SEC = 2.0
+
+
+def milestone(name: str) -> float:
+    """
+    Records seconds since boot as the `startup_seconds{stage=name}` gauge
+    and logs it. Returns the elapsed time.
+    """
+    elapsed = time.perf_counter() - BOOT_TIME
+    METRICS.gauge("startup_seconds", "Seconds from boot to each startup stage", stage=name).set(elapsed)
+    log(f"Startup: {name} after {elapsed:.2f}s")
+    return elapsed
+
+
+class StagedLoader:
+    """
+    Builds slow components (models, recognizers, devices) concurrently on
+    a thread pool. A component is ready once its factory returned and its
+    optional warm-up ran; load time is recorded per component.
+
+    Threads rather than processes: the models are used in this process,
+    and torch/onnx/vosk release the GIL while loading and running.
+    """
+
+    def __init__(self, max_workers: int = LOAD_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="loader")
+        self._futures: Dict[str, Future] = {}
+        # Still loading when close() gave up on them; never handed out
+        self._abandoned: Set[str] = set()
+
+    def submit(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        warmup: Optional[Callable[[Any], None]] = None,
+    ) -> Future:
+        def load():
+            start = time.perf_counter()
+            component = factory()
+            if warmup is not None:
+                warmup(component)
+            elapsed = time.perf_counter() - start
+            METRICS.gauge("startup_load_seconds", "Load plus warm-up time", component=name).set(elapsed)
+            log(f"Loaded {name} in {elapsed:.2f}s")
+            return component
+
+        future = self._pool.submit(load)
+        self._futures[name] = future
+        return future
+
+    def result(self, name: str, timeout: Optional[float] = None) -> Any:
+        """Blocks until `name` is ready; re-raises its load error."""
+        return self._futures[name].result(timeout)
+
+    async def wait(self, name: str) -> Any:
+        return await asyncio.wrap_future(self._futures[name])
+
+    def loaded(self, name: str) -> Optional[Any]:
+        """The component if it finished loading successfully, else None."""
+        future = self._futures.get(name)
+        if name in self._abandoned:
+            return None
+        if future is None or not future.done() or future.cancelled() or future.exception():
+            return None
+        return future.result()
+
+    def close(
+        self,
+        cleanup: Optional[Callable[[str, Any], None]] = None,
+        timeout: float = LOAD_CLOSE_TIMEOUT_SEC,
+    ):
+        """
+        Drops loads that have not started and waits up to `timeout` for
+        running ones. A load still running after that is abandoned:
+        loaded() returns None for it, and `cleanup(name, component)` is
+        called on the loader thread once it finishes.
+        """
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        running = [future for future in self._futures.values() if not future.done()]
+        if running:
+            wait(running, timeout)
+
+        for name, future in self._futures.items():
+            if future.done():
+                continue
+            log(f"{name} still loading at shutdown; closing it when done")
+            self._abandoned.add(name)
+            if cleanup is not None:
+                future.add_done_callback(functools.partial(self._cleanup, cleanup, name))
+
+    @staticmethod
+    def _cleanup(cleanup: Callable[[str, Any], None], name: str, future: Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            cleanup(name, future.result())
+        except Exception as e:
+            log(f"Closing late {name} failed: {e}")